@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Apply NIP-09 deletion requests to the embedding store.
+
+Reads the kind 5 events that fetch_notes.py --deletions wrote and records a
+deletion request for every note id in their "e" tags (embedding_store.py).
+A request removes the stored note when it comes from the note's author, as
+NIP-09 requires, or from one of the --moderators (admins deleting other
+users' channel messages). Requests for notes not stored yet are kept, so a
+note deleted in the same run it was fetched, or fetched again later, is
+never embedded.
+
+The next generate_embeddings.py export leaves the removed notes out, and
+build_index.py --prune and build_segments.py --prune tombstone their labels.
+"a" tags (addressable events) are ignored: no replaceable kind is indexed.
+"""
+
+import argparse
+
+from embedding_store import EmbeddingStore
+from note_metadata import DELETION
+from notes_io import iter_notes
+
+
+def deletion_requests(deletions_path: str, moderators: set[str] = frozenset()) -> list[tuple[str, str | None, int]]:
+    """(deleted event id, required author or None for any, deleted_at) for each "e" tag of each kind 5 event."""
+    requests = []
+    for event in iter_notes(deletions_path):
+        if event.get('kind') != DELETION:
+            continue
+        author = None if event.get('pubkey') in moderators else event.get('pubkey')
+        for tag in event.get('tags') or []:
+            if len(tag) > 1 and tag[0] == 'e' and len(tag[1]) == 64:
+                requests.append((tag[1], author, int(event.get('created_at', 0))))
+    return requests
+
+
+def apply_deletions(deletions_path: str, store_path: str, model_name: str, moderators: list[str] | None = None) -> int:
+    """Record deletion requests in the store; returns stored notes removed."""
+    requests = deletion_requests(deletions_path, set(moderators or []))
+    store = EmbeddingStore(store_path, model_name)
+    try:
+        removed = store.record_deletions(requests)
+        print(f"{len(requests)} deletion requests: removed {removed} stored notes, "
+              f"{store.count()} left, {store.deletion_count()} requests on record")
+    finally:
+        store.close()
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply NIP-09 deletion requests to the embedding store')
+    parser.add_argument('--deletions', required=True, help='NDJSON file of kind 5 events from fetch_notes.py')
+    parser.add_argument('--store', required=True, help='SQLite embedding store')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2',
+                        help='Model whose stored notes are counted')
+    parser.add_argument('--moderators', nargs='*', default=[],
+                        help="Pubkeys whose deletion requests apply to any author's notes")
+
+    args = parser.parse_args()
+
+    apply_deletions(args.deletions, args.store, args.model, args.moderators)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compare compact code tiers (binary, product quantization) with int8 search.
+
+Encodes the same embedding-like corpus as int8 per-dim rows, binary sign
+codes and PQ codes, then reports bytes per vector, recall@k against float32
+ground truth and single-query latency for code-only search and for two-stage
+search (shortlist on codes, re-rank with int8) at a few shortlist sizes.
+
+Usage:
+    python benchmarks/bench_compact_codes.py --corpus 50000 --pq-subvectors 48 96
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compact_codes import BinaryCodes, ProductQuantizer, two_stage_search  # noqa: E402
+from exact_search import ExactIndex  # noqa: E402
+from quantization import quantize_int8  # noqa: E402
+from tune_index import exact_top_k, recall_at_k  # noqa: E402
+
+DIMENSIONS = 384
+
+
+def embedding_like(rng, count: int, outlier_dims: int, outlier_scale: float) -> np.ndarray:
+    centers = rng.standard_normal((max(count // 150, 1), DIMENSIONS)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.6 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    outliers = rng.choice(DIMENSIONS, outlier_dims, replace=False)
+    vectors[:, outliers] = outlier_scale * (1 + 0.5 * rng.standard_normal((count, outlier_dims)))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def measure(search, queries: np.ndarray, truth: np.ndarray, k: int) -> tuple[float, float]:
+    """(recall@k, p50 ms) for a single-query search function returning labels."""
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        labels = search(query)
+        latencies.append(time.perf_counter() - start)
+        found.append(labels[:k])
+    return recall_at_k(np.array(found), truth), float(np.median(latencies) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare binary and PQ code tiers with int8 search')
+    parser.add_argument('--corpus', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--pq-subvectors', type=int, nargs='+', default=[48, 96])
+    parser.add_argument('--shortlist', type=int, nargs='+', default=[50, 100, 200, 400])
+    parser.add_argument('--outlier-dims', type=int, default=4)
+    parser.add_argument('--outlier-scale', type=float, default=8.0)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    vectors = embedding_like(rng, args.corpus + args.queries, args.outlier_dims, args.outlier_scale)
+    vectors, queries = vectors[:args.corpus], vectors[args.corpus:]
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"{args.corpus:,} vectors, {args.queries} held-out queries, k={args.k}\n")
+
+    quantized, vmin, scale = quantize_int8(vectors, 'per-dim')
+    exact = ExactIndex(quantized, 'per-dim', vmin, scale)
+    tiers = {'binary': BinaryCodes.fit(vectors)}
+    for subvectors in args.pq_subvectors:
+        start = time.perf_counter()
+        tiers[f'pq{subvectors}'] = ProductQuantizer.fit(vectors, subvectors)
+        print(f"pq{subvectors}: trained and encoded in {time.perf_counter() - start:.1f}s")
+
+    print(f"\n{'tier':<10}{'search':<16}{'B/vector':>9}{'recall':>9}{'p50 ms':>9}")
+    recall, p50 = measure(lambda q: exact.search(q, args.k)[0][0], queries, truth, args.k)
+    print(f"{'int8':<10}{'exact':<16}{exact.dimensions + 4:>9}{recall:>9.4f}{p50:>9.2f}")
+    for name, codes in tiers.items():
+        recall, p50 = measure(lambda q: codes.search(q, args.k), queries, truth, args.k)
+        print(f"{name:<10}{'codes only':<16}{codes.bytes_per_vector:>9}{recall:>9.4f}{p50:>9.2f}")
+        for shortlist in args.shortlist:
+            recall, p50 = measure(lambda q: two_stage_search(codes, exact, q, args.k, shortlist)[0],
+                                  queries, truth, args.k)
+            print(f"{'':<10}{f'+ int8 top {shortlist}':<16}{codes.bytes_per_vector:>9}{recall:>9.4f}{p50:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Time NIP-09 deletion propagation end to end against a local mock relay.
+
+Runs the nightly pipeline stages in-process: fetch_notes.py --deletions,
+apply_deletions.py, the embedding store (with a seeded random encoder in
+place of the model), build_index.py --prune as an HNSW index and
+build_segments.py --prune. The mock relay keeps serving deleted notes, the
+worst case for the pipeline.
+
+  1. initial     - every fetched note is indexed
+  2. deletions   - notes deleted by their author or a moderator, including
+                   some fetched in the same run, plus requests signed by
+                   someone else; the index stays incremental
+  3. moderation  - a mass deletion above --compact-threshold rebuilds the
+                   index and rewrites the segments
+
+Prints per-stage timings for each run. tests/test_deletions.py runs the same
+pipeline on a small corpus and checks what each run leaves behind.
+
+Usage:
+    python benchmarks/bench_deletions.py --events 20000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from apply_deletions import apply_deletions  # noqa: E402
+from build_index import build_index, hnswlib, labels_path_for, tombstone_ratio  # noqa: E402
+from embedding_store import EmbeddingStore  # noqa: E402
+from fetch_notes import fetch_notes  # noqa: E402
+from generate_embeddings import embed_incremental, hash_prefixes, iter_note_texts  # noqa: E402
+from label_table import LabelTable  # noqa: E402
+from mock_relay import MockRelay, event_for, relay_url  # noqa: E402
+from note_metadata import NoteMetadata  # noqa: E402
+from segments import SegmentSet, update_segments  # noqa: E402
+
+MODEL = 'synthetic'
+DIMENSIONS = 64
+MODERATOR = hashlib.sha256(b'moderator').hexdigest()
+FORGER = hashlib.sha256(b'forger').hexdigest()
+
+
+class RandomEncoder:
+    """Unit vectors seeded by each text, standing in for the model."""
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little'))
+            .standard_normal(DIMENSIONS) for text in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def nightly(url: str, workdir: Path, night: int, compact_threshold: float) -> dict:
+    """One pipeline run; returns stage timings."""
+    notes, deletions = workdir / f'notes-{night}.ndjson', workdir / f'deletions-{night}.ndjson'
+    embeddings = workdir / 'embeddings.npz'
+    timings = {}
+
+    started = time.perf_counter()
+    await fetch_notes([url], str(notes), state_path=str(workdir / 'state.json'), deletions_path=str(deletions))
+    timings['fetch'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    apply_deletions(str(deletions), str(workdir / 'store.sqlite'), MODEL, [MODERATOR])
+    timings['apply'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store = EmbeddingStore(str(workdir / 'store.sqlite'), MODEL)
+    for ids, texts, metadata in iter_note_texts(str(notes), 50_000):
+        embed_incremental(store, MODEL, ids, texts, RandomEncoder(), metadata)
+    ids, hashes, vectors = store.export()
+    metadata = NoteMetadata.from_notes(store.export_metadata())
+    store.close()
+    np.savez(embeddings, ids=np.array(ids), content_hashes=hash_prefixes(hashes), vectors=vectors,
+             quantize_type='float32', model=MODEL, dimensions=DIMENSIONS, **metadata.fields())
+    timings['embed'] = time.perf_counter() - started
+
+    index_path = str(workdir / 'index.bin')
+    started = time.perf_counter()
+    build_index(str(embeddings), index_path, index_path, m=16, ef_construction=100, prune=True, mode='hnsw',
+                compact_threshold=compact_threshold)
+    timings['index'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    update_segments(str(embeddings), str(workdir / 'segments'), prune=True)
+    segments = SegmentSet(str(workdir / 'segments'))
+    segments.compact(compact_threshold=compact_threshold)
+    segments.save()
+    timings['segments'] = time.perf_counter() - started
+    return timings
+
+
+def indexed(workdir: Path) -> dict:
+    """Live ids in the store, label table and segments, plus index tombstone state."""
+    store = EmbeddingStore(str(workdir / 'store.sqlite'), MODEL)
+    stored = set(store.export()[0])
+    store.close()
+    table = LabelTable.load(labels_path_for(str(workdir / 'index.bin')))
+    index = hnswlib.Index(space='cosine', dim=DIMENSIONS)
+    index.load_index(str(workdir / 'index.bin'))
+    segments = SegmentSet(str(workdir / 'segments'))
+    return {
+        "store": stored,
+        "table": {table.event_id(label) for label in table.live_labels()},
+        "segments": {raw.hex() for raw in segments.locate()},
+        "ratio": tombstone_ratio(table),
+        "graph_slots": index.get_current_count(),
+        "live": len(table),
+        "segment_deletes": sum(segment['count'] - segment['live'] for segment in segments.segments),
+        "index": index,
+        "table_obj": table,
+    }
+
+
+def pick(rng, serials: list[int], fraction: float) -> list[int]:
+    return [int(serial) for serial in rng.choice(serials, size=int(len(serials) * fraction), replace=False)]
+
+
+def describe(state: dict) -> str:
+    return (f"{len(state['store']):,} live notes, tombstone ratio {state['ratio']:.1%}, "
+            f"{state['graph_slots']:,} graph slots, {state['segment_deletes']} segment deletes")
+
+
+async def run(args):
+    rng = np.random.default_rng(0)
+    relay = MockRelay()
+    relay.seed(args.events, 30 * 86400)
+    workdir = Path(tempfile.mkdtemp(prefix='deletions-bench-'))
+    rows = []
+
+    async with relay.serve() as server:
+        url = relay_url(server)
+        print(f"{args.events:,} events on {url}, compact threshold {args.compact_threshold:.0%}\n")
+
+        rows.append(("initial", await nightly(url, workdir, 1, args.compact_threshold)))
+        state = indexed(workdir)
+        print(f"initial:    {describe(state)}")
+        serial_of = {event_for(serial, 0, 1)["id"]: int(serial) for serial in relay.serial}
+
+        now = int(relay.created_at.max()) + 60
+        indexed_serials = sorted(serial_of[event_id] for event_id in state["store"])
+        by_author = pick(rng, indexed_serials, args.deleted)
+        rest = sorted(set(indexed_serials) - set(by_author))
+        forged = pick(rng, rest, 0.01)
+        moderated = pick(rng, sorted(set(rest) - set(forged)), 0.01)
+        first_new = len(relay.serial)
+        relay.add(now + np.arange(args.new_events), np.ones(args.new_events, dtype=np.int16))
+        same_run = [serial for serial in range(first_new, first_new + args.new_events)
+                    if event_for(serial, 0, 1)["content"].strip()][:args.new_events // 10]
+        # One request a second: the mock relay caps events per created_at like real relays
+        at = now + args.new_events
+        requests = [(by_author + same_run, None), (moderated, MODERATOR), (forged, FORGER)]
+        for serials, pubkey in requests:
+            relay.delete(serials, at + np.arange(len(serials)), pubkey=pubkey)
+            at += len(serials)
+        rows.append(("deletions", await nightly(url, workdir, 2, args.compact_threshold)))
+        state = indexed(workdir)
+        print(f"deletions:  {describe(state)}")
+
+        mass = pick(rng, sorted(serial_of[event_id] for event_id in state["store"] if event_id in serial_of),
+                    args.mass_deleted)
+        relay.delete(mass, at + np.arange(len(mass)), pubkey=MODERATOR)
+        rows.append(("moderation", await nightly(url, workdir, 3, args.compact_threshold)))
+        print(f"moderation: {describe(indexed(workdir))}")
+
+    print(f"\n{'run':<12}" + ''.join(f"{stage:>10}" for stage in rows[0][1]))
+    for name, timings in rows:
+        print(f"{name:<12}" + ''.join(f"{seconds:>9.2f}s" for seconds in timings.values()))
+    print(f"\nOutput in {workdir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time deletion propagation against a mock relay')
+    parser.add_argument('--events', type=int, default=20_000)
+    parser.add_argument('--new-events', type=int, default=500)
+    parser.add_argument('--deleted', type=float, default=0.05, help='Share of notes their authors delete')
+    parser.add_argument('--mass-deleted', type=float, default=0.3, help='Share of notes a moderator deletes')
+    parser.add_argument('--compact-threshold', type=float, default=0.2)
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark exact int8/float16 search against HNSW across corpus sizes.
+
+For each corpus size, builds an exact index (int8 and float16 rows) and an
+HNSW index over the same clustered synthetic vectors, then reports index
+bytes, build time, single-query p50/p95 latency, batched per-query latency
+and recall@k against float32 ground truth. The largest size whose exact int8
+single-query p50 fits --budget-ms is the basis for build_index.EXACT_THRESHOLD.
+
+Usage:
+    python benchmarks/bench_exact_search.py --sizes 10000 30000 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import hnswlib  # noqa: E402
+from exact_search import ExactIndex  # noqa: E402
+from quantization import quantize_int8  # noqa: E402
+from tune_index import exact_top_k, recall_at_k  # noqa: E402
+
+DIMENSIONS = 384
+
+
+def clustered_vectors(rng, count: int) -> np.ndarray:
+    centers = rng.standard_normal((max(count // 150, 1), DIMENSIONS)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.6 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def single_query_ms(search, queries: np.ndarray) -> tuple[float, float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return float(p50), float(p95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exact search against HNSW')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 30_000, 100_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=256, help='Queries per batched exact search')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--ef', type=int, default=50)
+    parser.add_argument('--budget-ms', type=float, default=25.0,
+                        help='Single-query latency budget used to suggest the exact threshold')
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    workdir = Path(tempfile.mkdtemp(prefix='exact-bench-'))
+
+    print(f"{'vectors':>9} {'engine':<8}{'MB':>8}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'batch ms/q':>12}{'recall':>8}")
+    suggested = None
+    for size in args.sizes:
+        # Held-out queries from the same clusters as the corpus
+        vectors = clustered_vectors(rng, size + args.queries)
+        vectors, queries = vectors[:size], vectors[size:]
+        truth = exact_top_k(vectors, queries, args.k)
+
+        engines = {}
+
+        start = time.perf_counter()
+        quantized, vmin, scale = quantize_int8(vectors, 'per-dim')
+        engines['int8'] = ExactIndex(quantized, 'per-dim', vmin, scale)
+        int8_build = time.perf_counter() - start
+        start = time.perf_counter()
+        engines['float16'] = ExactIndex(vectors.astype(np.float16), 'float16')
+        float16_build = time.perf_counter() - start
+
+        for name, build_seconds in (('int8', int8_build), ('float16', float16_build)):
+            engine = engines[name]
+            p50, p95 = single_query_ms(lambda q: engine.search(q, args.k), queries)
+            start = time.perf_counter()
+            found = np.concatenate([engine.search(queries[i:i + args.batch], args.k)[0]
+                                    for i in range(0, len(queries), args.batch)])
+            batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            print(f"{size:>9} {name:<8}{engine.nbytes / 1e6:>8.1f}{build_seconds:>9.1f}{p50:>9.2f}{p95:>9.2f}"
+                  f"{batch_ms:>12.3f}{recall_at_k(found, truth):>8.4f}")
+            if name == 'int8' and p50 <= args.budget_ms:
+                suggested = size
+
+        index = hnswlib.Index(space='cosine', dim=DIMENSIONS)
+        index.init_index(max_elements=size * 2, M=16, ef_construction=200)
+        start = time.perf_counter()
+        index.add_items(vectors, np.arange(size))
+        build_seconds = time.perf_counter() - start
+        index.set_ef(args.ef)
+        path = workdir / f'hnsw_{size}.bin'
+        index.save_index(str(path))
+        p50, p95 = single_query_ms(lambda q: index.knn_query(q, k=args.k, num_threads=1), queries)
+        start = time.perf_counter()
+        found = index.knn_query(queries, k=args.k)[0]
+        batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{size:>9} {'hnsw':<8}{os.path.getsize(path) / 1e6:>8.1f}{build_seconds:>9.1f}{p50:>9.2f}"
+              f"{p95:>9.2f}{batch_ms:>12.3f}{recall_at_k(found, truth):>8.4f}")
+
+    if suggested:
+        print(f"\nLargest size with exact int8 p50 <= {args.budget_ms} ms: {suggested:,}")
+
+
+if __name__ == '__main__':
+    main()
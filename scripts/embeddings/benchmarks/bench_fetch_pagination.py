@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Check and time the paginated fetch_notes.py against a local mock relay.
+
+Seeds the mock relay (default 500k events, with bursts of events sharing one
+created_at and a relay-side limit cap), then:
+
+  1. full fetch     - every kind 1/9/42 note with content is written exactly once
+  2. incremental    - new events, including some at exactly the persisted
+                      high-water second, are the only ones fetched
+  3. no-op          - a rerun with nothing new writes nothing
+
+Exits non-zero if any check fails. tests/test_fetch_pagination.py runs the
+same checks on a small corpus in CI; this script is for timing at scale.
+
+Usage:
+    python benchmarks/bench_fetch_pagination.py --events 500000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fetch_notes import fetch_notes  # noqa: E402
+from notes_io import iter_notes  # noqa: E402
+from mock_relay import MockRelay, relay_url  # noqa: E402
+
+
+def written_ids(path: Path) -> tuple[list[str], set[str]]:
+    ids = [note['id'] for note in iter_notes(str(path))]
+    return ids, set(ids)
+
+
+def check(name: str, path: Path, expected: set[str]) -> bool:
+    ids, unique = written_ids(path)
+    ok = len(ids) == len(unique) and unique == expected
+    print(f"  {name}: wrote {len(ids):,}, expected {len(expected):,}, "
+          f"duplicates {len(ids) - len(unique)}, missing {len(expected - unique)}, "
+          f"extra {len(unique - expected)} -> {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def run(args) -> bool:
+    relay = MockRelay(max_limit=args.max_limit)
+    relay.seed(args.events, args.span_days * 86400)
+    workdir = Path(tempfile.mkdtemp(prefix='fetch-bench-'))
+    state = workdir / 'state.json'
+    ok = True
+
+    async with relay.serve() as server:
+        url = relay_url(server)
+        capped = sum(1 for _ in relay.query({"kinds": [1, 9], "limit": 10000}))
+        print(f"{args.events:,} events on {url}, relay caps limit at {args.max_limit}")
+        print(f"A single capped REQ returns {capped:,} events\n")
+
+        print("1. full fetch")
+        start = time.perf_counter()
+        await fetch_notes([url], str(workdir / 'full.ndjson'), state_path=str(state),
+                          page_size=args.page_size)
+        elapsed = time.perf_counter() - start
+        pages = relay.requests
+        ok &= check("full", workdir / 'full.ndjson', relay.expected())
+        print(f"  {elapsed:.1f}s, {pages} pages, {args.events / elapsed:,.0f} events/s\n")
+
+        with open(state) as f:
+            high_water = json.load(f)['high_water_created_at']
+        before = relay.expected()
+        print(f"2. incremental (high water {high_water})")
+        new_times = np.concatenate([
+            np.full(50, high_water),
+            high_water + 1 + np.arange(args.new_events)
+        ])
+        relay.add(new_times, np.where(np.arange(len(new_times)) % 3 == 0, 9, 1))
+        requests = relay.requests
+        start = time.perf_counter()
+        await fetch_notes([url], str(workdir / 'incremental.ndjson'), state_path=str(state),
+                          page_size=args.page_size)
+        elapsed = time.perf_counter() - start
+        ok &= check("incremental", workdir / 'incremental.ndjson', relay.expected() - before)
+        print(f"  {elapsed:.2f}s, {relay.requests - requests} pages\n")
+
+        print("3. no-op rerun")
+        await fetch_notes([url], str(workdir / 'noop.ndjson'), state_path=str(state),
+                          page_size=args.page_size)
+        ok &= check("no-op", workdir / 'noop.ndjson', set())
+
+    print(f"\n{'All checks passed' if ok else 'CHECKS FAILED'} (output in {workdir})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check paginated relay fetch against a mock relay')
+    parser.add_argument('--events', type=int, default=500_000)
+    parser.add_argument('--new-events', type=int, default=2000)
+    parser.add_argument('--span-days', type=int, default=90)
+    parser.add_argument('--max-limit', type=int, default=500, help='Relay-side cap on limit')
+    parser.add_argument('--page-size', type=int, default=500)
+
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == '__main__':
+    main()
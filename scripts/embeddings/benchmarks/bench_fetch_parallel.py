@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Wall-clock benchmark for multi-relay, time-sharded fetch_notes.py.
+
+Starts one or more mirror mock relays holding the same events, each adding
+artificial per-event latency, and fetches the full history with different
+--shards settings. Checks that every run writes each expected note exactly
+once, with mirror duplicates dropped before the output.
+
+Usage:
+    python benchmarks/bench_fetch_parallel.py --events 100000 --event-latency-ms 0.2
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fetch_notes import fetch_notes  # noqa: E402
+from notes_io import iter_notes  # noqa: E402
+from mock_relay import MockRelay, relay_url  # noqa: E402
+
+
+async def run(args) -> bool:
+    span = args.span_days * 86400
+    start = int(time.time()) - span
+    relays = []
+    for _ in range(max(args.relays)):
+        relay = MockRelay(max_limit=args.page_size, event_latency=args.event_latency_ms / 1000)
+        relay.seed(args.events, span, start=start)
+        relays.append(relay)
+    expected = relays[0].expected()
+    workdir = Path(tempfile.mkdtemp(prefix='fetch-parallel-'))
+
+    async with AsyncExitStack() as stack:
+        urls = [relay_url(await stack.enter_async_context(relay.serve())) for relay in relays]
+        print(f"{args.events:,} events per mirror relay, {args.event_latency_ms}ms per event, "
+              f"{args.page_size} per page, concurrency {args.concurrency}\n")
+
+        results = []
+        for relay_count in args.relays:
+            for shards in args.shards:
+                output = workdir / f"r{relay_count}-s{shards}.ndjson"
+                begin = time.perf_counter()
+                await fetch_notes(urls[:relay_count], str(output), page_size=args.page_size,
+                                  shards=shards, concurrency=args.concurrency,
+                                  backfill_days=args.span_days)
+                elapsed = time.perf_counter() - begin
+                ids = [note['id'] for note in iter_notes(str(output))]
+                ok = len(ids) == len(set(ids)) and set(ids) == expected
+                results.append((relay_count, shards, elapsed, len(ids), ok))
+
+    base = results[0][2]
+    print(f"\n{'relays':>7}{'shards':>8}{'seconds':>9}{'speedup':>9}{'notes':>10}  output")
+    for relay_count, shards, elapsed, notes, ok in results:
+        print(f"{relay_count:>7}{shards:>8}{elapsed:>9.1f}{base / elapsed:>8.1f}x{notes:>10,}  "
+              f"{'complete, no duplicates' if ok else 'MISMATCH'}")
+    return all(result[-1] for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel multi-relay fetching')
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--span-days', type=int, default=90)
+    parser.add_argument('--event-latency-ms', type=float, default=0.2)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--relays', type=int, nargs='+', default=[1, 2],
+                        help='Mirror relay counts to test')
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--concurrency', type=int, default=8)
+
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == '__main__':
+    main()
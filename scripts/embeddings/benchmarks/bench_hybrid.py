@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmark the BM25 lexical index and hybrid (fused) ranking.
+
+Scale: builds lexical.bin over a generated corpus of themed sentences mixed
+with hashtags and names drawn from a long-tailed vocabulary, and reports
+build time, file size against uncompressed postings, and single-query
+latency for BM25 alone, exact int8 vector search and both fused.
+
+Quality: on the synthetic themed corpus (output/synthetic_events.json and
+output/embeddings.npz from generate_synthetic_data.py) runs exact-term
+queries (names, places, channel slugs; relevant = notes containing the
+term) and topical queries (relevant = notes of the theme), and reports
+MRR@k and recall@k for BM25, semantic, reciprocal rank fusion and weighted
+fusion. Semantic rankings need the sentence-transformers model to embed the
+queries; without it only BM25 is scored.
+
+Usage:
+    python benchmarks/bench_hybrid.py --docs 200000 --queries 200
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from exact_search import ExactIndex  # noqa: E402
+from generate_synthetic_data import CHANNEL_NAMES, OUTPUT_DIR, THEMES  # noqa: E402
+from lexical_index import (LexicalIndex, LexicalIndexBuilder, reciprocal_rank_fusion,  # noqa: E402
+                           tokenize, weighted_fusion)
+from quantization import quantize_int8  # noqa: E402
+
+DIMENSIONS = 384
+
+TERM_QUERIES = ["Burlington", "Patanjali", "kitchari", "ashwagandha", "Jyotish", "Sthapatya",
+                "Gandharva", "Des Moines", "Panchakarma", "Guru Purnima", "orange tabby",
+                "Sidhis", "carpool", "Diwali", "Sanskrit"]
+TOPIC_QUERIES = {
+    "meditation": "my experience during group meditation today",
+    "community": "local neighbourhood news and help needed",
+    "education": "university courses and classes to enrol in",
+    "wellness": "ayurvedic health treatments and healthy food",
+    "events": "upcoming celebrations and festivals",
+}
+
+
+def themed_corpus(rng, docs: int) -> list[str]:
+    """Themed sentences plus long-tailed hashtags, names and channel slugs."""
+    sentences = [message for messages in THEMES.values() for message in messages]
+    slugs = [name for name, _ in CHANNEL_NAMES]
+    vocab = max(docs // 5, 100)
+    texts = []
+    for _ in range(docs):
+        parts = [sentences[i] for i in rng.integers(0, len(sentences), rng.integers(1, 4))]
+        parts.append(f"#tag{int(rng.zipf(1.3)) % vocab}")
+        parts.append(f"with member{int(rng.zipf(1.2)) % (vocab * 5)}")
+        if rng.random() < 0.2:
+            parts.append(f"in {slugs[rng.integers(0, len(slugs))]}")
+        texts.append(' '.join(parts))
+    return texts
+
+
+def percentiles(times: list[float]) -> str:
+    return f"{np.percentile(times, 50) * 1000:>9.3f}{np.percentile(times, 99) * 1000:>9.3f}"
+
+
+def bench_scale(args):
+    rng = np.random.default_rng(0)
+    texts = themed_corpus(rng, args.docs)
+    ids = [f"{i:064x}" for i in range(args.docs)]
+    raw_bytes = sum(len(text.encode('utf-8')) for text in texts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'lexical.bin')
+        start = time.perf_counter()
+        builder = LexicalIndexBuilder()
+        builder.add_many(ids, texts)
+        tokenized = time.perf_counter() - start
+        stats = builder.write(path)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = LexicalIndex(path)
+        opened = time.perf_counter() - start
+
+        print(f"{args.docs:,} docs, {raw_bytes / 1e6:.1f} MB of text: {stats['terms']:,} terms, "
+              f"{stats['postings']:,} postings")
+        print(f"  build {built:.1f}s (tokenize {tokenized:.1f}s), open {opened * 1000:.2f} ms")
+        print(f"  lexical.bin {stats['bytes'] / 1e6:.1f} MB ({stats['bytes'] / args.docs:.1f} B/doc); "
+              f"postings {stats['postings_bytes'] / stats['postings']:.2f} B each varint vs 8 as raw u32 pairs")
+
+        # Queries: a common themed word, a slug, and rare hashtags/names
+        words = sorted({token for text in texts[:2000] for token in tokenize(text)})
+        queries = [' '.join(rng.choice(words, rng.integers(1, 4))) for _ in range(args.queries)]
+        vectors = rng.standard_normal((args.docs, DIMENSIONS)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        exact = ExactIndex(quantize_int8(vectors, 'per-vector')[0], 'per-vector')
+        query_vectors = vectors[rng.integers(0, args.docs, args.queries)]
+
+        timings = {"bm25": [], "vector": [], "hybrid": []}
+        for query, vector in zip(queries, query_vectors):
+            start = time.perf_counter()
+            lexical_docs, _ = index.search(query, args.depth)
+            middle = time.perf_counter()
+            labels, _ = exact.search(vector, args.depth)
+            end = time.perf_counter()
+            reciprocal_rank_fusion([[ids[i] for i in labels[0]], [index.event_id(d) for d in lexical_docs]])
+            timings["bm25"].append(middle - start)
+            timings["vector"].append(end - middle)
+            timings["hybrid"].append(time.perf_counter() - start)
+
+        print(f"\n{'search':<10}{'p50 ms':>9}{'p99 ms':>9}   (depth {args.depth})")
+        for name, times in timings.items():
+            print(f"{name:<10}{percentiles(times)}")
+
+
+def ranking_metrics(rankings: list[list[str]], relevant: list[set], k: int) -> tuple[float, float]:
+    mrr = recall = 0.0
+    for ranking, wanted in zip(rankings, relevant):
+        ranks = [rank for rank, event_id in enumerate(ranking[:k]) if event_id in wanted]
+        mrr += 1.0 / (ranks[0] + 1) if ranks else 0.0
+        recall += len(ranks) / len(wanted)
+    return mrr / len(rankings), recall / len(rankings)
+
+
+def query_embeddings(model_name: str, texts: list[str]) -> np.ndarray | None:
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name).encode(texts, normalize_embeddings=True)
+    except Exception as e:
+        print(f"  semantic rankings skipped ({type(e).__name__}: {e})")
+        return None
+
+
+def bench_quality(args):
+    from generate_embeddings import clean_content
+
+    events_path, embeddings_path = OUTPUT_DIR / 'synthetic_events.json', OUTPUT_DIR / 'embeddings.npz'
+    if not events_path.exists() or not embeddings_path.exists():
+        print(f"\nThemed corpus not found in {OUTPUT_DIR}; run generate_synthetic_data.py --generate")
+        return
+
+    data = np.load(embeddings_path)
+    ids = [str(event_id) for event_id in data['ids']]
+    contents = {event['id']: clean_content(event['content']) for event in json.load(open(events_path))}
+    theme_of = {message: theme for theme, messages in THEMES.items() for message in messages}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'lexical.bin')
+        builder = LexicalIndexBuilder()
+        builder.add_many(ids, [contents[event_id] for event_id in ids])
+        builder.write(path)
+        index = LexicalIndex(path)
+
+        queries, relevant, groups = [], [], []
+        tokens = {event_id: set(tokenize(contents[event_id])) for event_id in ids}
+        for query in TERM_QUERIES:
+            wanted = {event_id for event_id in ids if set(tokenize(query)) <= tokens[event_id]}
+            if wanted:
+                queries.append(query)
+                relevant.append(wanted)
+                groups.append('exact-term')
+        for theme, query in TOPIC_QUERIES.items():
+            queries.append(query)
+            relevant.append({event_id for event_id in ids if theme_of.get(contents[event_id]) == theme})
+            groups.append('topical')
+
+        print(f"\nThemed corpus: {len(ids)} notes, {len(queries)} queries, k={args.k}")
+        rankings = {"bm25": [[index.event_id(d) for d in index.search(q, args.depth)[0]] for q in queries]}
+        vectors = query_embeddings(args.model, queries)
+        if vectors is not None:
+            corpus = data['vectors'].astype(np.float32)
+            corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+            scores = vectors @ corpus.T
+            semantic = [{ids[i]: float(row[i]) for i in np.argsort(-row)[:args.depth]} for row in scores]
+            lexical = [dict(zip((index.event_id(d) for d in docs), s.tolist()))
+                       for docs, s in (index.search(q, args.depth) for q in queries)]
+            rankings["semantic"] = [list(result) for result in semantic]
+            rankings["rrf"] = [[event_id for event_id, _ in reciprocal_rank_fusion([list(s), list(found)])]
+                               for s, found in zip(semantic, lexical)]
+            rankings["weighted"] = [[event_id for event_id, _ in weighted_fusion([s, found], [0.5, 0.5])]
+                                    for s, found in zip(semantic, lexical)]
+
+        print(f"{'ranking':<10}{'group':<12}{'MRR':>8}{'recall':>8}")
+        for name, ranked in rankings.items():
+            for group in ('exact-term', 'topical'):
+                rows = [i for i, g in enumerate(groups) if g == group]
+                mrr, recall = ranking_metrics([ranked[i] for i in rows], [relevant[i] for i in rows], args.k)
+                print(f"{name:<10}{group:<12}{mrr:>8.3f}{recall:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark BM25 and hybrid ranking')
+    parser.add_argument('--docs', type=int, default=200_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=50, help='Hits taken from each ranking before fusion')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+
+    args = parser.parse_args()
+    bench_scale(args)
+    bench_quality(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark incremental build_index.py updates against a full rebuild.
+
+Builds an index over a synthetic corpus, then applies nightly-style deltas
+(new notes, edited notes, deleted notes) through the label table and times
+each update next to a from-scratch build of the same corpus. Checks that
+edited notes are found under their original label, deleted ones never come
+back, and the live count matches the corpus.
+
+Usage:
+    python benchmarks/bench_incremental_index.py --corpus 100000 --new 2000 --changed 500 --deleted 500
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import hnswlib  # noqa: E402
+from build_index import build_index, labels_path_for  # noqa: E402
+from label_table import LabelTable  # noqa: E402
+
+DIMENSIONS = 384
+
+
+def random_vectors(rng, count: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def save_corpus(path: Path, ids: list[str], hashes: np.ndarray, vectors: np.ndarray):
+    np.savez(path, ids=np.array(ids), content_hashes=hashes, vectors=vectors,
+             quantize_type='float32', model='synthetic', dimensions=DIMENSIONS)
+
+
+def timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark incremental HNSW index updates')
+    parser.add_argument('--corpus', type=int, default=100_000)
+    parser.add_argument('--new', type=int, default=2000)
+    parser.add_argument('--changed', type=int, default=500)
+    parser.add_argument('--deleted', type=int, default=500)
+    parser.add_argument('--nights', type=int, default=3)
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = Path(tempfile.mkdtemp(prefix='index-bench-'))
+    serial = args.corpus
+    ids = [f"{i:064x}" for i in range(args.corpus)]
+    hashes = rng.integers(0, 2 ** 63, args.corpus, dtype=np.uint64)
+    vectors = random_vectors(rng, args.corpus)
+    index_path = str(workdir / 'index.bin')
+
+    save_corpus(workdir / 'embeddings.npz', ids, hashes, vectors)
+    initial = timed(build_index, str(workdir / 'embeddings.npz'), None, index_path)
+    print(f"\nInitial build of {args.corpus:,} vectors: {initial:.1f}s\n")
+
+    rows = []
+    ok = True
+    for night in range(1, args.nights + 1):
+        # Edit, delete and append against the current corpus
+        picks = rng.choice(len(ids), size=args.changed + args.deleted, replace=False)
+        changed, deleted = picks[:args.changed], picks[args.changed:]
+        hashes[changed] = rng.integers(0, 2 ** 63, len(changed), dtype=np.uint64)
+        vectors[changed] = random_vectors(rng, len(changed))
+        deleted_ids = {ids[i] for i in deleted}
+        keep = np.setdiff1d(np.arange(len(ids)), deleted)
+        ids = [ids[i] for i in keep] + [f"{i:064x}" for i in range(serial, serial + args.new)]
+        serial += args.new
+        hashes = np.concatenate([hashes[keep], rng.integers(0, 2 ** 63, args.new, dtype=np.uint64)])
+        vectors = np.concatenate([vectors[keep], random_vectors(rng, args.new)])
+        changed_rows = np.searchsorted(keep, changed[np.isin(changed, keep)])
+        changed_ids = [ids[row] for row in changed_rows]
+
+        embeddings = workdir / f'embeddings-{night}.npz'
+        save_corpus(embeddings, ids, hashes, vectors)
+        table_before = LabelTable.load(labels_path_for(index_path))
+        labels_before = {event_id: table_before.label_of(event_id) for event_id in changed_ids}
+
+        incremental = timed(build_index, str(embeddings), index_path, index_path, prune=True)
+        full = timed(build_index, str(embeddings), None, str(workdir / f'full-{night}.bin'))
+
+        # Correctness checks
+        table = LabelTable.load(labels_path_for(index_path))
+        index = hnswlib.Index(space='cosine', dim=DIMENSIONS)
+        index.load_index(index_path)
+        index.set_ef(100)
+        same_label = all(table.label_of(event_id) == labels_before[event_id] for event_id in changed_ids)
+        found, _ = index.knn_query(vectors[changed_rows], k=1)
+        edited_found = float(np.mean(found[:, 0] == [labels_before[event_id] for event_id in changed_ids]))
+        ghost = any(table.label_of(event_id) is not None for event_id in deleted_ids)
+        live_ok = len(table) == len(ids)
+        night_ok = same_label and edited_found > 0.95 and not ghost and live_ok
+        ok &= night_ok
+        rows.append((night, len(ids), incremental, full, index.get_max_elements(), night_ok))
+
+    print(f"\nDelta per night: +{args.new} new, {args.changed} edited, -{args.deleted} deleted")
+    print(f"{'night':>6}{'corpus':>10}{'incremental s':>15}{'full s':>9}{'speedup':>9}{'capacity':>10}  checks")
+    for night, corpus, incremental, full, capacity, night_ok in rows:
+        print(f"{night:>6}{corpus:>10,}{incremental:>15.2f}{full:>9.1f}{full / incremental:>8.0f}x"
+              f"{capacity:>10,}  {'OK' if night_ok else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
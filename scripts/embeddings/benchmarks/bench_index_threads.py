@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark build_index.py insertion throughput across thread counts and chunk sizes.
+
+Writes an int8-quantized synthetic corpus, then builds a fresh index from it
+once per (threads, chunk size) setting and reports wall time, throughput,
+speedup over one thread and the float32 working set of one chunk. Per-chunk
+progress from build_index is suppressed.
+
+Usage:
+    python benchmarks/bench_index_threads.py --corpus 100000 --threads 1 2 4 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from build_index import build_index  # noqa: E402
+from quantization import quantization_fields, quantize_int8  # noqa: E402
+
+DIMENSIONS = 384
+
+
+def save_int8_corpus(path: Path, count: int, seed: int = 0):
+    """Clustered unit vectors, quantized the way generate_embeddings.py does."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 150, 1), DIMENSIONS)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.6 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    quantized, vmin, scale = quantize_int8(vectors, 'per-dim')
+    np.savez(path, ids=np.array([f"{i:064x}" for i in range(count)]),
+             content_hashes=rng.integers(1, 2 ** 63, count, dtype=np.uint64),
+             **quantization_fields(quantized, vmin, scale, 'per-dim'),
+             model='synthetic', dimensions=DIMENSIONS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark threaded, chunked HNSW index builds')
+    parser.add_argument('--corpus', type=int, default=100_000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[10000])
+    parser.add_argument('--m', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=200)
+
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='threads-bench-'))
+    embeddings = workdir / 'embeddings.npz'
+    save_int8_corpus(embeddings, args.corpus)
+    print(f"{args.corpus:,} int8 vectors, M={args.m}, ef_construction={args.ef_construction}, "
+          f"{os.cpu_count()} CPUs\n")
+
+    print(f"{'threads':>8}{'chunk':>8}{'seconds':>10}{'vectors/s':>12}{'speedup':>9}{'chunk MB':>10}")
+    baseline = {}
+    for chunk_size in args.chunk_sizes:
+        for threads in args.threads:
+            index_path = workdir / f'index_{threads}_{chunk_size}.bin'
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_index(str(embeddings), None, str(index_path), m=args.m,
+                            ef_construction=args.ef_construction, threads=threads, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+            baseline.setdefault(chunk_size, elapsed)
+            print(f"{threads:>8}{chunk_size:>8}{elapsed:>10.1f}{args.corpus / elapsed:>12,.0f}"
+                  f"{baseline[chunk_size] / elapsed:>8.2f}x{chunk_size * DIMENSIONS * 4 / 1e6:>10.1f}")
+
+    print(f"\nOutput in {workdir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the notes interchange: pretty JSON array vs streaming NDJSON.
+
+Generates a synthetic dump (default 1M notes) and measures, each in a fresh
+process, peak RSS and wall time for:
+
+  write  - old: build a list, json.dump(indent=2)   new: NotesWriter per event
+  read   - old: json.load + clean every note        new: iter_note_texts chunks
+
+The "new" reader keeps only ids across chunks (texts are dropped once a chunk
+has been encoded), which is what generate_embeddings.py does.
+
+Usage:
+    python benchmarks/bench_notes_io.py --notes 1000000 --workdir /tmp/notes-bench
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = (
+    "meditation community dome event wellness yoga garden carpool housing ayurveda "
+    "festival music course campus evening morning program group relay channel note"
+).split()
+
+
+def synthetic_notes(count: int):
+    rng = random.Random(3)
+    for i in range(count):
+        yield {
+            "id": f"{i:064x}",
+            "pubkey": f"{rng.getrandbits(256):064x}",
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(5, 80))),
+            "created_at": 1700000000 + i,
+            "kind": rng.choice([1, 9]),
+            "tags": [["e", f"{rng.getrandbits(256):064x}", "", "root"]] if rng.random() < 0.3 else []
+        }
+
+
+def write_legacy(path: str, count: int):
+    notes = list(synthetic_notes(count))
+    with open(path, 'w') as f:
+        json.dump(notes, f, indent=2)
+
+
+def write_ndjson(path: str, count: int):
+    from notes_io import NotesWriter
+    with NotesWriter(path) as writer:
+        for note in synthetic_notes(count):
+            writer.write(note)
+
+
+def read_legacy(path: str, count: int):
+    from generate_embeddings import clean_content
+    with open(path) as f:
+        notes = json.load(f)
+    texts = [clean_content(n['content']) for n in notes]
+    ids = [n['id'] for n in notes]
+    assert len(ids) == len(texts) == count
+
+
+def read_ndjson(path: str, count: int):
+    from generate_embeddings import iter_note_texts
+    ids = []
+    for chunk_ids, _chunk_texts, _chunk_metadata in iter_note_texts(path, 50000):
+        ids.extend(chunk_ids)
+    assert len(ids) == count
+
+
+def _measure(queue, fn_name: str, path: str, count: int):
+    # Import up front (generate_embeddings pulls in torch) so only the I/O is measured
+    import generate_embeddings  # noqa: F401
+    import notes_io  # noqa: F401
+
+    # ru_maxrss is KiB on Linux
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    globals()[fn_name](path, count)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - baseline) / 1024))
+
+
+def measure(fn_name: str, path: str, count: int) -> tuple[float, float]:
+    """Run fn in a fresh process and return (seconds, peak RSS growth MiB)"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(queue, fn_name, path, count))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark notes interchange memory use')
+    parser.add_argument('--notes', type=int, default=1_000_000)
+    parser.add_argument('--workdir', default='/tmp/notes-bench')
+
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    cases = [
+        ("json (indent=2)", "write_legacy", "read_legacy", workdir / "notes.json"),
+        ("ndjson", "write_ndjson", "read_ndjson", workdir / "notes.ndjson"),
+        ("ndjson.gz", "write_ndjson", "read_ndjson", workdir / "notes.ndjson.gz"),
+    ]
+
+    print(f"{args.notes:,} synthetic notes (memory = peak RSS growth over the imported baseline)\n")
+    print(f"{'format':<18}{'file MB':>9}{'write s':>9}{'write MiB':>11}{'read s':>9}{'read MiB':>10}")
+    for label, writer, reader, path in cases:
+        write_s, write_mb = measure(writer, str(path), args.notes)
+        read_s, read_mb = measure(reader, str(path), args.notes)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{label:<18}{size_mb:>9.1f}{write_s:>9.1f}{write_mb:>11.0f}{read_s:>9.1f}{read_mb:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
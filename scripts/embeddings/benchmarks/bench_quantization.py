@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compare int8 quantization schemes against float32 search.
+
+Generates clustered unit vectors with a few outlier dimensions (sentence
+embedding models have some, e.g. MiniLM), quantizes them with each scheme
+in quantization.py plus the old truncating global cast, and reports
+reconstruction error and exact-search recall@k against float32 ground
+truth, along with the exact index size and single-query latency.
+
+Usage:
+    python benchmarks/bench_quantization.py --corpus 50000 --outlier-dims 4
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from exact_search import ExactIndex  # noqa: E402
+from quantization import SCHEMES, dequantize_int8, quantize_int8  # noqa: E402
+from tune_index import exact_top_k, recall_at_k  # noqa: E402
+
+DIMENSIONS = 384
+
+
+def embedding_like(rng, count: int, outlier_dims: int, outlier_scale: float) -> np.ndarray:
+    centers = rng.standard_normal((max(count // 150, 1), DIMENSIONS)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.6 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    # A few dimensions with a large shared offset and spread
+    outliers = rng.choice(DIMENSIONS, outlier_dims, replace=False)
+    vectors[:, outliers] = outlier_scale * (1 + 0.5 * rng.standard_normal((count, outlier_dims)))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def truncating_global(vectors: np.ndarray) -> tuple[np.ndarray, float, float]:
+    """The original quantize_int8: global min/max and a truncating cast."""
+    vmin, vmax = vectors.min(), vectors.max()
+    scale = 255.0 / (vmax - vmin + 1e-8)
+    return ((vectors - vmin) * scale - 128).astype(np.int8), float(vmin), float(scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare int8 quantization schemes')
+    parser.add_argument('--corpus', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--outlier-dims', type=int, default=4)
+    parser.add_argument('--outlier-scale', type=float, default=8.0)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    vectors = embedding_like(rng, args.corpus + args.queries, args.outlier_dims, args.outlier_scale)
+    vectors, queries = vectors[:args.corpus], vectors[args.corpus:]
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"{args.corpus:,} vectors, {args.outlier_dims} outlier dimensions, "
+          f"{args.queries} held-out queries, k={args.k}\n")
+
+    engines = {}
+    quantized, vmin, scale = truncating_global(vectors)
+    engines['global (truncate)'] = (ExactIndex(quantized, 'global', vmin, scale),
+                                    dequantize_int8(quantized, vmin, scale))
+    for scheme in SCHEMES:
+        quantized, vmin, scale = quantize_int8(vectors, scheme)
+        engine = ExactIndex(quantized, scheme) if scheme == 'per-vector' else \
+            ExactIndex(quantized, scheme, vmin, scale)
+        engines[scheme] = (engine, dequantize_int8(quantized, vmin, scale, scheme))
+    engines['float16'] = (ExactIndex(vectors.astype(np.float16), 'float16'), vectors.astype(np.float16))
+
+    print(f"{'scheme':<20}{'RMSE':>10}{'recall':>9}{'MB':>8}{'p50 ms':>9}")
+    for name, (engine, restored) in engines.items():
+        rmse = float(np.sqrt(np.mean((restored.astype(np.float32) - vectors) ** 2)))
+        found = engine.search(queries, args.k)[0]
+        latencies = []
+        for query in queries[:100]:
+            start = time.perf_counter()
+            engine.search(query, args.k)
+            latencies.append(time.perf_counter() - start)
+        print(f"{name:<20}{rmse:>10.5f}{recall_at_k(found, truth):>9.4f}{engine.nbytes / 1e6:>8.1f}"
+              f"{np.median(latencies) * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
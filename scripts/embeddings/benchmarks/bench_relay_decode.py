@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for relay frame decoding in fetch_notes.py.
+
+Decodes a batch of realistic EVENT frames (64-hex ids, 128-hex sig, a few
+tags) and serializes each note for the NDJSON output, as the fetch loop
+does. Compares the old stdlib path (json.loads, index, copy six fields into
+a dict, json.dumps) with RelayDecoder on every installed backend, with and
+without tags.
+
+Usage:
+    python benchmarks/bench_relay_decode.py --events 200000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from relay_codec import RelayDecoder, available_backends  # noqa: E402
+from mock_relay import event_for  # noqa: E402
+
+
+def make_frames(count: int) -> list[str]:
+    frames = []
+    for serial in range(count):
+        event = event_for(serial, 1_700_000_000 + serial, 1 if serial % 4 else 9)
+        event["tags"] = [["e", event["pubkey"], "", "root"], ["p", event["pubkey"]], ["t", "nostr"]]
+        event["sig"] = f"{serial:0128x}"
+        frames.append(json.dumps(["EVENT", "embed-1-r0-w0-3", event]))
+    return frames
+
+
+def legacy(frames: list[str]) -> int:
+    written = 0
+    for msg in frames:
+        data = json.loads(msg)
+        if data[0] == "EVENT" and data[1] == "embed-1-r0-w0-3":
+            event = data[2]
+            if event.get("content") and len(event["content"].strip()) > 0:
+                json.dumps({
+                    "id": event["id"],
+                    "pubkey": event["pubkey"],
+                    "content": event["content"],
+                    "created_at": event["created_at"],
+                    "kind": event["kind"],
+                    "tags": event.get("tags", [])
+                }, separators=(',', ':'), ensure_ascii=False)
+                written += 1
+    return written
+
+
+def decoded(decoder: RelayDecoder, frames: list[str]) -> int:
+    written = 0
+    for msg in frames:
+        data = decoder.decode(msg)
+        if data[0] == "EVENT" and data[1] == "embed-1-r0-w0-3":
+            event = data[2]
+            if event.content and not event.content.isspace():
+                decoder.encode_note(event)
+                written += 1
+    return written
+
+
+def best_of(fn, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark relay frame decoding')
+    parser.add_argument('--events', type=int, default=200_000)
+
+    args = parser.parse_args()
+
+    frames = make_frames(args.events)
+    print(f"{args.events:,} EVENT frames, {sum(map(len, frames)) / len(frames):.0f} bytes each\n")
+
+    base = best_of(legacy, frames)
+    print(f"{'path':<28}{'events/s':>12}{'speedup':>9}")
+    print(f"{'stdlib dict copy (old)':<28}{args.events / base:>12,.0f}{1:>8.1f}x")
+    for backend in available_backends():
+        for tags in (True, False):
+            decoder = RelayDecoder(tags=tags, backend=backend)
+            assert decoded(decoder, frames) == legacy(frames)
+            elapsed = best_of(decoded, decoder, frames)
+            label = f"{backend}{'' if tags else ' --no-tags'}"
+            print(f"{label:<28}{args.events / elapsed:>12,.0f}{base / elapsed:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
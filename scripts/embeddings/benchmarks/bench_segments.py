@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmark time-partitioned segments against the single incremental index.
+
+Simulates nightly runs over a synthetic corpus: each day adds notes created
+that day, edits some earlier notes and deletes others. Both layouts ingest
+the same int8 embeddings.npz every night:
+
+    single index  build_index.py --prune into one index.bin; clients download
+                  index.bin, its mapping and metadata again whenever it changes
+    segments      segments.py writes the delta as a segment and compacts;
+                  clients download only segment files they have not seen
+
+Reports nightly build time (segment compaction separately) and client
+download bytes for a client syncing daily and one syncing weekly. At the
+end, checks the segments hold exactly the live corpus and compares recall
+of fan-out search over them (services/embedding-api/search_index.py) with
+the single index, both against exact search over the corpus vectors.
+
+Usage:
+    python benchmarks/bench_segments.py --corpus 100000 --days 90 --new 1000 --changed 100 --deleted 100
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent.parent / 'services' / 'embedding-api'))
+
+from build_index import build_index, metadata_path_for  # noqa: E402
+from note_metadata import NoteMetadata  # noqa: E402
+from quantization import quantization_fields, quantize_int8  # noqa: E402
+from search_index import load_version  # noqa: E402
+from segments import SegmentSet, published_segments, update_segments  # noqa: E402
+
+DIMENSIONS = 384
+DAY = 86400
+START = 1_700_006_400  # a UTC midnight
+SCHEME = 'per-vector'
+
+
+def random_vectors(rng, count: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def save_corpus(path: Path, ids: list[str], hashes: np.ndarray, vectors: np.ndarray, created_at: np.ndarray,
+                authors: np.ndarray):
+    metadata = NoteMetadata.from_notes([(1, f"{author:064x}", int(created), None)
+                                        for author, created in zip(authors.tolist(), created_at.tolist())])
+    np.savez(path, ids=np.array(ids), content_hashes=hashes, **quantization_fields(*quantize_int8(vectors, SCHEME),
+             SCHEME), model='synthetic', dimensions=DIMENSIONS, **metadata.fields())
+
+
+def single_index_files(index_path: str) -> list[str]:
+    return [index_path, index_path.replace('.bin', '_mapping.bin'), metadata_path_for(index_path)]
+
+
+def segment_files(segments_dir: Path) -> dict[str, int]:
+    """Published file name -> size for the segments listed now."""
+    return {name: (segments_dir / name).stat().st_size
+            for segment in SegmentSet(str(segments_dir)).segments for name in segment['files'].values()}
+
+
+def recall_at_k(indexes: dict, ids: list[str], vectors: np.ndarray, rng, queries: int, k: int) -> dict:
+    """Recall@k of each LoadedIndex (search_index.py) against exact search over the live corpus."""
+    found = dict.fromkeys(indexes, 0)
+    for row in rng.choice(len(ids), size=queries, replace=False):
+        query = vectors[row] + 0.5 * random_vectors(rng, 1)[0]
+        truth = {ids[i] for i in np.argsort(-(vectors @ query))[:k]}
+        for name, index in indexes.items():
+            found[name] += len(truth & {hit['id'] for hit in index.search(query, k, ef=200)})
+    return {name: hits / (queries * k) for name, hits in found.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark segment indexes over simulated nightly runs')
+    parser.add_argument('--corpus', type=int, default=100_000, help='Notes before day 1, over the prior year')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--new', type=int, default=1000)
+    parser.add_argument('--changed', type=int, default=100)
+    parser.add_argument('--deleted', type=int, default=100)
+    parser.add_argument('--fanout', type=int, nargs='+', default=[7, 4, 3])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--dir', help='Working directory (default: a new temp dir)')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = Path(args.dir or tempfile.mkdtemp(prefix='segments-bench-'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    segments_dir = workdir / 'segments'
+    index_path = str(workdir / 'index.bin')
+    embeddings = workdir / 'embeddings.npz'
+
+    serial = args.corpus
+    ids = [f"{i:064x}" for i in range(args.corpus)]
+    hashes = rng.integers(0, 2 ** 63, args.corpus, dtype=np.uint64)
+    vectors = random_vectors(rng, args.corpus)
+    created_at = np.sort(rng.integers(START - 365 * DAY, START, args.corpus))
+    authors = rng.integers(0, 500, args.corpus)
+
+    save_corpus(embeddings, ids, hashes, vectors, created_at, authors)
+    started = time.perf_counter()
+    build_index(str(embeddings), None, index_path)
+    single_initial = time.perf_counter() - started
+    started = time.perf_counter()
+    update_segments(str(embeddings), str(segments_dir))
+    segments_initial = time.perf_counter() - started
+    single_initial_bytes = sum(Path(path).stat().st_size for path in single_index_files(index_path))
+    daily_seen = weekly_seen = set(segment_files(segments_dir))
+    segments_initial_bytes = sum(segment_files(segments_dir).values())
+
+    rows = []
+    weekly = {"single": 0, "segments": 0}
+    for day in range(1, args.days + 1):
+        picks = rng.choice(len(ids), size=args.changed + args.deleted, replace=False)
+        changed, deleted = picks[:args.changed], picks[args.changed:]
+        hashes[changed] = rng.integers(0, 2 ** 63, len(changed), dtype=np.uint64)
+        vectors[changed] = random_vectors(rng, len(changed))
+        keep = np.setdiff1d(np.arange(len(ids)), deleted)
+        today = START + (day - 1) * DAY + np.sort(rng.integers(0, DAY, args.new))
+        ids = [ids[i] for i in keep] + [f"{i:064x}" for i in range(serial, serial + args.new)]
+        serial += args.new
+        hashes = np.concatenate([hashes[keep], rng.integers(0, 2 ** 63, args.new, dtype=np.uint64)])
+        vectors = np.concatenate([vectors[keep], random_vectors(rng, args.new)])
+        created_at = np.concatenate([created_at[keep], today])
+        authors = np.concatenate([authors[keep], rng.integers(0, 500, args.new)])
+        save_corpus(embeddings, ids, hashes, vectors, created_at, authors)
+
+        started = time.perf_counter()
+        build_index(str(embeddings), index_path, index_path, prune=True)
+        single_seconds = time.perf_counter() - started
+        single_bytes = sum(Path(path).stat().st_size for path in single_index_files(index_path))
+
+        # Publish the update, then compact (build_segments.py --no-compact, then --compact-only)
+        started = time.perf_counter()
+        update_segments(str(embeddings), str(segments_dir), prune=True)
+        update_seconds = time.perf_counter() - started
+        published = segment_files(segments_dir)
+        daily_bytes = sum(size for name, size in published.items() if name not in daily_seen)
+        daily_seen = set(published)
+        if day % 7 == 0:
+            weekly["single"] += single_bytes
+            weekly["segments"] += sum(size for name, size in published.items() if name not in weekly_seen)
+            weekly_seen = set(published)
+        started = time.perf_counter()
+        segments = SegmentSet(str(segments_dir))
+        segments.compact(args.fanout)
+        segments.save()
+        compact_seconds = time.perf_counter() - started
+
+        rows.append((day, len(ids), single_seconds, single_bytes, update_seconds, compact_seconds, daily_bytes,
+                     len(segments.segments)))
+
+    print(f"\nInitial corpus {args.corpus:,}: single index {single_initial:.1f}s, {single_initial_bytes:,} bytes; "
+          f"segments {segments_initial:.1f}s, {segments_initial_bytes:,} bytes")
+    print(f"Per day: +{args.new} new, {args.changed} edited, -{args.deleted} deleted; fanouts {args.fanout}\n")
+    print(f"{'day':>4}{'corpus':>9}{'single s':>10}{'single MB':>11}{'segment s':>11}{'compact s':>11}"
+          f"{'segment MB':>12}{'segments':>10}")
+    for day, corpus, single_s, single_b, update_s, compact_s, daily_b, count in rows:
+        if day % 10 == 0 or day == 1 or day == len(rows):
+            print(f"{day:>4}{corpus:>9,}{single_s:>10.2f}{single_b / 1e6:>11.1f}{update_s:>11.2f}{compact_s:>11.2f}"
+                  f"{daily_b / 1e6:>12.2f}{count:>10}")
+
+    columns = list(zip(*rows))
+    print(f"\n{args.days} days")
+    print(f"  nightly build s (mean / max): single {np.mean(columns[2]):.2f} / {max(columns[2]):.2f}, "
+          f"segments {np.mean(columns[4]):.2f} / {max(columns[4]):.2f}, "
+          f"compaction {np.mean(columns[5]):.2f} / {max(columns[5]):.2f}")
+    print(f"  daily client download: single {sum(columns[3]) / 1e6:,.0f} MB, "
+          f"segments {sum(columns[6]) / 1e6:,.0f} MB ({sum(columns[3]) / max(sum(columns[6]), 1):.0f}x less)")
+    print(f"  weekly client download: single {weekly['single'] / 1e6:,.0f} MB, "
+          f"segments {weekly['segments'] / 1e6:,.0f} MB")
+
+    located = SegmentSet(str(segments_dir)).locate()
+    live_ok = set(located) == {bytes.fromhex(event_id) for event_id in ids}
+    recall = recall_at_k({
+        "single": load_version(workdir, {"dimensions": DIMENSIONS}),
+        "segments": load_version(segments_dir, {"dimensions": DIMENSIONS,
+                                                "segments": published_segments(str(segments_dir), prefix='.')}),
+    }, ids, vectors, rng, args.queries, 10)
+    print(f"  segments hold the live corpus: {'OK' if live_ok else 'FAIL'}")
+    print(f"  recall@10 at ef 200 against exact search: single {recall['single']:.3f}, "
+          f"segments {recall['segments']:.3f}")
+    sys.exit(0 if live_ok and recall['segments'] >= recall['single'] - 0.02 else 1)
+
+
+if __name__ == '__main__':
+    main()
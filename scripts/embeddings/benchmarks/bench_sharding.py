@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for generate_embeddings.py --workers.
+
+Encodes the same synthetic corpus with 1, 2, 4, ... worker processes (each
+pinned to cores / workers torch threads) and reports wall time, texts/sec,
+speedup and parallel efficiency, plus whether the merged output matches the
+single-process result row for row.
+
+Usage:
+    python benchmarks/bench_sharding.py --notes 20000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_embeddings import encode_parallel  # noqa: E402
+from bench_token_batching import make_corpus  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-process embedding generation')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--notes', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker counts to test (default: powers of two up to the core count)')
+    parser.add_argument('--max-tokens-per-batch', type=int, default=8192)
+
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or [2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores]
+    # Speedup and efficiency are relative to a single worker
+    worker_counts = sorted(set([1] + worker_counts))
+    texts = make_corpus(args.notes)
+
+    results = []
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        # workers=1 still goes through a spawned process so model load cost is comparable
+        vectors = encode_parallel(args.model, texts, workers, max_tokens_per_batch=args.max_tokens_per_batch)
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = vectors
+        matches = vectors.shape == baseline.shape and bool(np.allclose(vectors, baseline, atol=1e-5))
+        results.append((workers, elapsed, matches))
+
+    base_time = results[0][1]
+    print(f"\n{len(texts)} texts on {cores} cores")
+    print(f"{'workers':>8}{'seconds':>10}{'texts/s':>10}{'speedup':>10}{'efficiency':>12}  output")
+    for workers, elapsed, matches in results:
+        speedup = base_time / elapsed
+        print(f"{workers:>8}{elapsed:>10.1f}{len(texts) / elapsed:>10.1f}{speedup:>9.2f}x"
+              f"{speedup / workers:>11.0%}  {'identical' if matches else 'MISMATCH'}")
+
+
+if __name__ == '__main__':
+    main()
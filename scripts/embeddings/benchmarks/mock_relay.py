@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Local stand-in Nostr relay for fetch benchmarks and checks.
+
+Holds synthetic events as sorted numpy columns (created_at, kind, serial) and
+builds each event from its serial on demand, so 500k+ events cost a few MB.
+Answers REQ with kinds/since/until/limit filters newest first, caps `limit`
+like real relays do, and ends every subscription with EOSE. An optional
+per-event latency stands in for a relay's storage and network cost.
+NIP-09 deletion requests (kind 5) can be added for stored events; the
+deleted events keep being served, as by a relay that ignores deletions.
+
+Usage:
+    python benchmarks/mock_relay.py --events 500000 --port 7777
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+import numpy as np
+
+try:
+    import websockets
+except ImportError:
+    print("Installing websockets...")
+    import subprocess
+    subprocess.check_call(['pip', 'install', 'websockets'])
+    import websockets
+
+WORDS = (
+    "meditation community dome event wellness yoga garden carpool housing ayurveda "
+    "festival music course campus evening morning program group relay channel note"
+).split()
+
+START = 1_700_000_000
+
+
+def event_for(serial: int, created_at: int, kind: int) -> dict:
+    """Deterministic synthetic event for a serial number."""
+    serial = int(serial)
+    rng = random.Random(serial)
+    # Roughly 1 in 50 notes is blank and should be skipped by the fetcher
+    content = "" if serial % 50 == 7 else " ".join(rng.choices(WORDS, k=rng.randint(3, 40)))
+    return {
+        "id": hashlib.sha256(f"mock-{serial}".encode()).hexdigest(),
+        "pubkey": hashlib.sha256(f"author-{serial % 1000}".encode()).hexdigest(),
+        "created_at": int(created_at),
+        "kind": int(kind),
+        "tags": [],
+        "content": content,
+        "sig": "0" * 128
+    }
+
+
+class MockRelay:
+    """In-memory relay state plus a websockets handler."""
+
+    def __init__(self, max_limit: int = 500, event_latency: float = 0.0):
+        self.max_limit = max_limit
+        self.event_latency = event_latency
+        self.created_at = np.zeros(0, dtype=np.int64)
+        self.kind = np.zeros(0, dtype=np.int16)
+        self.serial = np.zeros(0, dtype=np.int64)
+        # Field overrides by serial, for events that are not plain synthetic notes
+        self.overrides: dict[int, dict] = {}
+        self.requests = 0
+
+    def add(self, created_at: np.ndarray, kinds: np.ndarray):
+        """Add events (new serials) and keep the columns sorted by created_at."""
+        first = len(self.serial)
+        serial = np.arange(first, first + len(created_at), dtype=np.int64)
+        created_at = np.concatenate([self.created_at, np.asarray(created_at, dtype=np.int64)])
+        kind = np.concatenate([self.kind, np.asarray(kinds, dtype=np.int16)])
+        serial = np.concatenate([self.serial, serial])
+        order = np.argsort(created_at, kind='stable')
+        self.created_at, self.kind, self.serial = created_at[order], kind[order], serial[order]
+
+    def delete(self, serials, created_at, pubkey: str | None = None) -> list[str]:
+        """Add a kind 5 event per serial deleting it (at created_at, one time or one per serial),
+        signed by its author unless pubkey is given.
+
+        Returns the deleted event ids.
+        """
+        first = len(self.serial)
+        targets = [event_for(serial, 0, 1) for serial in serials]  # id and pubkey depend only on serial
+        for offset, target in enumerate(targets):
+            self.overrides[first + offset] = {"pubkey": pubkey or target["pubkey"], "content": "",
+                                              "tags": [["e", target["id"]]]}
+        self.add(np.broadcast_to(created_at, len(targets)), np.full(len(targets), 5))
+        return [target["id"] for target in targets]
+
+    def seed(self, count: int, span_seconds: int, seed: int = 0, start: int = START):
+        """Add count events spread over span_seconds after start, with bursts."""
+        rng = np.random.default_rng(seed)
+        created_at = start + rng.integers(0, span_seconds, count)
+        # A few busy seconds so pages have to cut through a shared created_at
+        burst = rng.choice(count, size=min(count, 400), replace=False)
+        created_at[burst] = start + span_seconds // 2
+        kinds = rng.choice([1, 9, 7, 42], size=count, p=[0.7, 0.2, 0.05, 0.05])
+        self.add(created_at, kinds)
+
+    def expected(self, kinds=(1, 9, 42), since: int | None = None) -> set[str]:
+        """Ids a complete fetch should write (matching kinds, non-blank content)."""
+        mask = np.isin(self.kind, kinds)
+        if since is not None:
+            mask &= self.created_at >= since
+        return {
+            event["id"]
+            for event in (event_for(s, c, k) for s, c, k in
+                          zip(self.serial[mask], self.created_at[mask], self.kind[mask]))
+            if event["content"].strip()
+        }
+
+    def query(self, filters: dict):
+        """Yield matching events newest first, up to the capped limit."""
+        lo = 0
+        hi = len(self.created_at)
+        if "since" in filters:
+            lo = int(np.searchsorted(self.created_at, filters["since"], side='left'))
+        if "until" in filters:
+            hi = int(np.searchsorted(self.created_at, filters["until"], side='right'))
+        limit = min(filters.get("limit", self.max_limit), self.max_limit)
+        kinds = set(filters.get("kinds", [])) or None
+
+        sent = 0
+        for i in range(hi - 1, lo - 1, -1):
+            if sent >= limit:
+                break
+            if kinds is not None and int(self.kind[i]) not in kinds:
+                continue
+            sent += 1
+            event = event_for(int(self.serial[i]), self.created_at[i], self.kind[i])
+            event.update(self.overrides.get(int(self.serial[i]), {}))
+            yield event
+
+    async def handler(self, ws, path=None):
+        async for msg in ws:
+            data = json.loads(msg)
+            if data[0] == "REQ":
+                self.requests += 1
+                subscription_id = data[1]
+                filters = data[2] if len(data) > 2 else {}
+                events = list(self.query(filters))
+                if self.event_latency:
+                    await asyncio.sleep(self.event_latency * max(len(events), 1))
+                for event in events:
+                    await ws.send(json.dumps(["EVENT", subscription_id, event]))
+                await ws.send(json.dumps(["EOSE", subscription_id]))
+            elif data[0] == "CLOSE":
+                continue
+            else:
+                await ws.send(json.dumps(["NOTICE", f"unsupported message: {data[0]}"]))
+
+    def serve(self, host: str = '127.0.0.1', port: int = 0):
+        """websockets server context manager; port 0 picks a free port."""
+        return websockets.serve(self.handler, host, port, max_size=None)
+
+
+def relay_url(server) -> str:
+    host, port = list(server.sockets)[0].getsockname()[:2]
+    return f"ws://{host}:{port}"
+
+
+async def run(args):
+    relay = MockRelay(max_limit=args.max_limit, event_latency=args.event_latency_ms / 1000)
+    relay.seed(args.events, args.span_days * 86400)
+    async with relay.serve(port=args.port) as server:
+        print(f"Mock relay with {args.events:,} events on {relay_url(server)}")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local stand-in Nostr relay')
+    parser.add_argument('--events', type=int, default=500_000)
+    parser.add_argument('--span-days', type=int, default=90)
+    parser.add_argument('--max-limit', type=int, default=500)
+    parser.add_argument('--event-latency-ms', type=float, default=0.0,
+                        help='Artificial delay per event returned')
+    parser.add_argument('--port', type=int, default=7777)
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
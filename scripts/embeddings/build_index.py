@@ -1,12 +1,43 @@
 #!/usr/bin/env python3
 """
 Build HNSW index from embeddings for fast approximate nearest neighbor search.
+
+Updates are incremental: a persistent label <-> event id table
+(<index>_labels.npz) lets each run add only new notes, re-insert edited ones
+under their existing label, and mark removed ones deleted, so nightly cost
+scales with the delta rather than the corpus. Per-note filter metadata
+(note_metadata.py) is kept by label the same way in <index>_metadata.npz.
+
+Deleted notes leave tombstones: their labels stay in the graph (or as zeroed
+exact rows) until new notes reuse them. When a run would leave more than
+--compact-threshold of the labels as tombstones, the index is rebuilt from
+scratch instead, which reclaims their memory and the graph quality that
+routing through deleted nodes costs.
+
+Corpora up to --exact-threshold vectors get an exact index instead
+(exact_search.py): the quantized rows themselves, searched by brute force,
+with no graph and no headroom. --mode forces one or the other.
+
+Vectors are dequantized and inserted in fixed-size chunks on an explicit
+number of threads. With --checkpoint, the partial index is saved every
+--checkpoint-interval seconds; a later run finds the checkpoint and only
+inserts what is still missing.
 """
 
 import argparse
+import hashlib
+import json
+import os
+import time
 import numpy as np
 from pathlib import Path
 
+from exact_search import ExactIndex, read_header
+from label_mapping import write_mapping
+from quantization import dequantize, scheme_of
+from label_table import LabelTable
+from note_metadata import NoteMetadata
+
 try:
     import hnswlib
 except ImportError:
@@ -16,9 +47,63 @@ except ImportError:
     import hnswlib
 
 
-def dequantize_int8(quantized: np.ndarray, vmin: float, scale: float) -> np.ndarray:
-    """Dequantize int8 vectors back to float32."""
-    return ((quantized.astype(np.float32) + 128) / scale) + vmin
+def vector_fingerprints(vectors: np.ndarray) -> np.ndarray:
+    """64-bit hash of each stored vector, for embeddings files without content hashes."""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), 'little') for row in vectors],
+        dtype=np.uint64
+    )
+
+
+def tombstone_ratio(table: LabelTable) -> float:
+    """Share of labels held by deleted notes (free labels not yet reused)."""
+    return len(table.free) / table.size if table.size else 0.0
+
+
+def labels_path_for(index_path: str) -> str:
+    return index_path.replace('.bin', '_labels.npz')
+
+
+def metadata_path_for(index_path: str) -> str:
+    return index_path.replace('.bin', '_metadata.npz')
+
+
+def save_checkpoint(index, table: LabelTable, pending_labels: np.ndarray, checkpoint_path: str):
+    """Save the partial index; pending labels get a zero fingerprint so a resume re-inserts them."""
+    fingerprints = table.fingerprints.copy()
+    fingerprints[pending_labels] = 0
+    index.save_index(checkpoint_path)
+    LabelTable(table.ids, fingerprints, table.live).save(labels_path_for(checkpoint_path))
+
+
+def remove_checkpoint(checkpoint_path: str):
+    for path in (checkpoint_path, labels_path_for(checkpoint_path)):
+        if Path(path).exists():
+            os.remove(path)
+
+
+def load_tuning(manifest_path: str) -> dict | None:
+    """Recommended HNSW settings recorded by tune_index.py, if any."""
+    if not Path(manifest_path).exists():
+        return None
+    with open(manifest_path) as f:
+        return json.load(f).get('hnsw_tuning', {}).get('recommended')
+
+
+# Exact int8 search stays near 13 ms per query up to here (benchmarks/bench_exact_search.py)
+EXACT_THRESHOLD = 50_000
+# Tombstoned share of labels above which an incremental run rebuilds instead
+COMPACT_THRESHOLD = 0.2
+
+
+def new_index(exact: bool, dimensions: int, count: int, m: int, ef_construction: int, exact_scheme: str,
+              affine_params: tuple):
+    """Empty exact index, or HNSW index with headroom for count vectors."""
+    if exact:
+        return ExactIndex.empty(dimensions, exact_scheme, *affine_params)
+    index = hnswlib.Index(space='cosine', dim=dimensions)
+    index.init_index(max_elements=max(count * 2, 10000), M=m, ef_construction=ef_construction)
+    return index
 
 
 def build_index(
@@ -26,77 +111,227 @@ def build_index(
     existing_index_path: str | None,
     output_path: str,
     m: int = 16,
-    ef_construction: int = 200
+    ef_construction: int = 200,
+    ef: int = 50,
+    prune: bool = False,
+    growth: float = 2.0,
+    mapping_sorted_index: bool = False,
+    tuning_path: str | None = None,
+    threads: int = -1,
+    chunk_size: int = 10000,
+    checkpoint_path: str | None = None,
+    checkpoint_interval: float = 300.0,
+    mode: str = 'auto',
+    exact_threshold: int = EXACT_THRESHOLD,
+    compact_threshold: float = COMPACT_THRESHOLD
 ):
-    """Build or update HNSW index."""
+    """Build or incrementally update an HNSW or exact index keyed by event id."""
+
+    tuned = load_tuning(tuning_path) if tuning_path else None
+    if tuned:
+        m, ef_construction, ef = tuned['m'], tuned['ef_construction'], tuned['ef']
+        print(f"Using tuned settings from {tuning_path}: M={m}, ef_construction={ef_construction}, "
+              f"ef={ef} (recall@k {tuned['recall']})")
 
     # Load embeddings
     data = np.load(embeddings_path, allow_pickle=True)
     ids = data['ids']
     vectors = data['vectors']
-    dimensions = int(data['dimensions'])
 
     if len(ids) == 0:
         print("No embeddings to index")
         return
 
+    dimensions = int(data['dimensions'])
     print(f"Loaded {len(ids)} embeddings with {dimensions} dimensions")
 
-    # Dequantize if needed (HNSW needs float32)
-    quantize_type = str(data.get('quantize_type', 'float32'))
-    if quantize_type == 'int8':
-        print("Dequantizing vectors for indexing...")
-        vmin = float(data['quantize_min'])
-        scale = float(data['quantize_scale'])
-        vectors = dequantize_int8(vectors, vmin, scale)
+    # Content hashes survive re-quantization; raw vector bytes do not
+    if 'content_hashes' in data.files:
+        fingerprints = data['content_hashes'].astype(np.uint64)
+    else:
+        fingerprints = vector_fingerprints(vectors)
 
-    # Ensure float32
-    vectors = vectors.astype(np.float32)
+    scheme = scheme_of(data)
+    affine_params = (data['quantize_min'], data['quantize_scale']) if scheme in ('global', 'per-dim') else ()
+    if mode == 'auto':
+        mode = 'exact' if len(np.unique(ids)) <= exact_threshold else 'hnsw'
+    exact = mode == 'exact'
+    # Exact rows keep the embeddings' int8 scheme; float32 input is stored as float16
+    exact_scheme = scheme or 'float16'
+    print(f"Index mode: {mode}")
+    rows_by_id = {str(event_id): row for row, event_id in enumerate(ids)}
 
     # Create or load index
-    index = hnswlib.Index(space='cosine', dim=dimensions)
+    if checkpoint_path and Path(checkpoint_path).exists() and Path(labels_path_for(checkpoint_path)).exists():
+        print(f"Resuming from checkpoint {checkpoint_path}")
+        existing_index_path = checkpoint_path
+    existing_labels = labels_path_for(existing_index_path) if existing_index_path else None
 
-    if existing_index_path and Path(existing_index_path).exists():
-        print(f"Loading existing index from {existing_index_path}")
-        index.load_index(existing_index_path)
-        # Resize if needed
-        current_count = index.get_current_count()
-        new_max = current_count + len(ids)
-        index.resize_index(new_max)
+    existing = existing_index_path if existing_index_path and Path(existing_index_path).exists() else None
+    if existing and not Path(existing_labels).exists():
+        print(f"No label table next to {existing}; rebuilding from scratch")
+        existing = None
+    if existing:
+        header = read_header(existing)
+        if exact != (header is not None) or (exact and header['scheme'] != exact_scheme):
+            print(f"{existing} is not a matching {mode} index; rebuilding from scratch")
+            existing = None
+
+    if existing:
+        print(f"Loading existing index from {existing}")
+        table = LabelTable.load(existing_labels)
+        print(f"Label table: {len(table)} live ids, {len(table.free)} free labels")
+        if exact:
+            index = ExactIndex.load(existing, mmap=False)
+            if affine_params:
+                # Re-encode stored rows from this export's vectors, not from their previous codes
+                sourced = {label: rows_by_id[raw.hex()] for raw, label in table.labels.items()
+                           if raw.hex() in rows_by_id}
+                sourced_labels = np.fromiter(sourced.keys(), dtype=np.int64, count=len(sourced))
+                sourced_rows = np.fromiter(sourced.values(), dtype=np.int64, count=len(sourced))
+                index.requantize(*affine_params, sourced_labels,
+                                 dequantize(data, vectors[sourced_rows], sourced_rows))
+        else:
+            index = hnswlib.Index(space='cosine', dim=dimensions)
+            index.load_index(existing)
+            if (index.M, index.ef_construction) != (m, ef_construction):
+                # Graph parameters are fixed at creation; they apply from the next full rebuild
+                print(f"Existing index uses M={index.M}, ef_construction={index.ef_construction}; "
+                      f"keeping them for this incremental update")
     else:
         print("Creating new index...")
-        # Initialize with some headroom
-        max_elements = max(len(ids) * 2, 10000)
-        index.init_index(max_elements=max_elements, M=m, ef_construction=ef_construction)
+        table = LabelTable()
+        index = new_index(exact, dimensions, len(ids), m, ef_construction, exact_scheme, affine_params)
+
+    # Diff the embeddings against the table (last occurrence of an id wins)
+    new_rows = []
+    changed_rows = []
+    changed_labels = []
+    for event_id, row in rows_by_id.items():
+        label = table.label_of(event_id)
+        if label is None:
+            new_rows.append(row)
+        elif table.fingerprints[label] != fingerprints[row]:
+            changed_rows.append(row)
+            changed_labels.append(label)
+    unchanged = len(rows_by_id) - len(new_rows) - len(changed_rows)
 
-    # Add vectors
-    print(f"Adding {len(ids)} vectors to index...")
+    removed = np.zeros(0, dtype=np.int64)
+    if prune:
+        removed = np.array([label for raw, label in table.labels.items() if raw.hex() not in rows_by_id],
+                           dtype=np.int64)
 
-    # Create integer labels (HNSW requires int labels)
-    # We'll maintain a separate mapping of label -> note_id
-    start_label = index.get_current_count()
-    labels = np.arange(start_label, start_label + len(ids))
+    # Freed labels are refilled by new notes first, so only the excess stays tombstoned
+    tombstones = max(len(table.free) + len(removed) - len(new_rows), 0)
+    if existing and tombstones > compact_threshold * max(table.size, 1):
+        print(f"{tombstones} of {table.size} labels would be tombstones "
+              f"({tombstones / table.size:.1%} > {compact_threshold:.0%}); rebuilding to compact")
+        existing = None
+        table = LabelTable()
+        index = new_index(exact, dimensions, len(rows_by_id), m, ef_construction, exact_scheme, affine_params)
+        new_rows = list(rows_by_id.values())
+        changed_rows, changed_labels = [], []
+        removed = np.zeros(0, dtype=np.int64)
+        unchanged = 0
 
-    index.add_items(vectors, labels)
+    if len(removed):
+        if exact:
+            index.mark_deleted(removed)
+        else:
+            for label in removed.tolist():
+                try:
+                    index.mark_deleted(label)
+                except RuntimeError:
+                    pass  # assigned before a checkpoint but never inserted
+        table.release(removed)
 
-    # Set ef for search (can be adjusted at query time)
-    index.set_ef(50)
+    print(f"{len(new_rows)} new, {len(changed_rows)} changed, {unchanged} unchanged, "
+          f"{len(removed)} deleted")
+
+    # Freed labels go to new ids first; re-adding a deleted label revives its slot in place
+    changed_labels = np.array(changed_labels, dtype=np.int64)
+    table.update(changed_labels, fingerprints[changed_rows])
+    new_labels = table.assign([str(ids[row]) for row in new_rows], fingerprints[new_rows])
+
+    # Grow capacity geometrically so most nightly deltas fit without a resize
+    if exact:
+        index.resize(table.size)
+    elif table.size > index.get_max_elements():
+        new_max = max(table.size, int(index.get_max_elements() * growth))
+        print(f"Resizing index {index.get_max_elements()} -> {new_max}")
+        index.resize_index(new_max)
+
+    rows = np.array(changed_rows + new_rows, dtype=np.int64)
+    labels = np.concatenate([changed_labels, new_labels])
+    if len(rows):
+        chunks = (len(rows) + chunk_size - 1) // chunk_size
+        thread_note = '' if exact else f" ({threads if threads > 0 else 'all'} threads)"
+        print(f"Adding {len(rows)} vectors to index in {chunks} chunks{thread_note}...")
+        started = time.perf_counter()
+        last_checkpoint = started
+        for chunk, start in enumerate(range(0, len(rows), chunk_size), 1):
+            chunk_started = time.perf_counter()
+            chunk_rows = rows[start:start + chunk_size]
+            # Dequantize one chunk at a time (HNSW needs float32)
+            chunk_vectors = dequantize(data, vectors[chunk_rows], chunk_rows)
+            if exact:
+                index.set_rows(labels[start:start + chunk_size], chunk_vectors)
+            else:
+                index.add_items(chunk_vectors, labels[start:start + chunk_size], num_threads=threads)
+
+            now = time.perf_counter()
+            done = min(start + chunk_size, len(rows))
+            print(f"  chunk {chunk}/{chunks}: {done - start} vectors in {now - chunk_started:.1f}s "
+                  f"({(done - start) / (now - chunk_started):,.0f}/s), {done}/{len(rows)} done")
+
+            if checkpoint_path and not exact and done < len(rows) and now - last_checkpoint >= checkpoint_interval:
+                save_checkpoint(index, table, labels[done:], checkpoint_path)
+                last_checkpoint = time.perf_counter()
+                print(f"  checkpointed to {checkpoint_path}")
+
+        elapsed = time.perf_counter() - started
+        print(f"Inserted {len(rows)} vectors in {elapsed:.1f}s ({len(rows) / elapsed:,.0f}/s)")
 
     # Save index
-    index.save_index(output_path)
+    if exact:
+        index.save(output_path)
+    else:
+        # Set ef for search (can be adjusted at query time)
+        index.set_ef(ef)
+        index.save_index(output_path)
+    table.save(labels_path_for(output_path))
     print(f"Saved index to {output_path}")
-    print(f"Index stats: {index.get_current_count()} vectors, max {index.get_max_elements()}")
-
-    # Save label mapping as JSON (browser-compatible)
-    mapping_path = output_path.replace('.bin', '_mapping.json')
-    import json
-    with open(mapping_path, 'w') as f:
-        json.dump({
-            'labels': labels.tolist(),
-            'ids': ids.tolist()
-        }, f)
+    if checkpoint_path and Path(checkpoint_path).resolve() != Path(output_path).resolve():
+        remove_checkpoint(checkpoint_path)
+    if exact:
+        print(f"Index stats: {len(table)} live vectors, {len(index.vectors)} rows, {index.nbytes:,} bytes")
+    else:
+        print(f"Index stats: {len(table)} live vectors, {index.get_current_count()} slots, "
+              f"max {index.get_max_elements()}")
+    print(f"Tombstones: {len(table.free)} of {table.size} labels ({tombstone_ratio(table):.1%})")
+
+    # Save the compact label -> event id mapping for clients
+    mapping_path = output_path.replace('.bin', '_mapping.bin')
+    write_mapping(mapping_path, table.ids, table.live, sorted_index=mapping_sorted_index)
     print(f"Saved label mapping to {mapping_path}")
 
+    # Filter columns by label; notes absent from this run keep what earlier runs recorded
+    metadata = NoteMetadata.from_npz(data)
+    if metadata is None:
+        print("No note metadata in embeddings; skipping filter columns")
+        return
+    previous = metadata_path_for(existing) if existing else None
+    by_label = NoteMetadata.load(previous) if previous and Path(previous).exists() else NoteMetadata.empty()
+    by_label.resize(table.size)
+    by_label.clear(np.flatnonzero(~table.live))
+    present = [(table.label_of(event_id), row) for event_id, row in rows_by_id.items()]
+    by_label.set_rows(np.array([label for label, _ in present], dtype=np.int64), metadata,
+                      np.array([row for _, row in present], dtype=np.int64))
+    metadata_path = metadata_path_for(output_path)
+    by_label.save(metadata_path)
+    print(f"Saved filter metadata to {metadata_path} ({len(by_label.pubkeys)} pubkeys, "
+          f"{len(by_label.channels)} channels)")
+
 
 def main():
     parser = argparse.ArgumentParser(description='Build HNSW index from embeddings')
@@ -105,6 +340,25 @@ def main():
     parser.add_argument('--output', required=True, help='Output index file path')
     parser.add_argument('--m', type=int, default=16, help='HNSW M parameter')
     parser.add_argument('--ef-construction', type=int, default=200, help='HNSW ef_construction')
+    parser.add_argument('--ef', type=int, default=50, help='HNSW search ef')
+    parser.add_argument('--mode', choices=['auto', 'hnsw', 'exact'], default='auto',
+                        help='Index type; auto picks exact up to --exact-threshold vectors')
+    parser.add_argument('--exact-threshold', type=int, default=EXACT_THRESHOLD,
+                        help='Largest corpus that gets an exact index in auto mode')
+    parser.add_argument('--threads', type=int, default=-1, help='Insertion threads (-1 = all cores)')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Vectors dequantized and inserted per chunk')
+    parser.add_argument('--checkpoint', help='Partial index path to save during long builds and resume from')
+    parser.add_argument('--checkpoint-interval', type=float, default=300.0,
+                        help='Seconds between checkpoints')
+    parser.add_argument('--tuning', help='manifest.json with tune_index.py results; overrides --m/--ef-construction/--ef')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete indexed ids missing from --embeddings (use when it holds the full corpus)')
+    parser.add_argument('--compact-threshold', type=float, default=COMPACT_THRESHOLD,
+                        help='Rebuild from scratch when more than this share of labels would be tombstones')
+    parser.add_argument('--growth', type=float, default=2.0,
+                        help='Capacity multiplier when the index has to be resized')
+    parser.add_argument('--mapping-sorted-index', action='store_true',
+                        help='Append a sorted id -> label section to the mapping file')
 
     args = parser.parse_args()
 
@@ -113,7 +367,19 @@ def main():
         existing_index_path=args.existing_index,
         output_path=args.output,
         m=args.m,
-        ef_construction=args.ef_construction
+        ef_construction=args.ef_construction,
+        ef=args.ef,
+        prune=args.prune,
+        growth=args.growth,
+        mapping_sorted_index=args.mapping_sorted_index,
+        tuning_path=args.tuning,
+        threads=args.threads,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint,
+        checkpoint_interval=args.checkpoint_interval,
+        mode=args.mode,
+        exact_threshold=args.exact_threshold,
+        compact_threshold=args.compact_threshold
     )
 
 
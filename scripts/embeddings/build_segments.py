@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Build time-partitioned segment indexes from embeddings (see segments.py).
+
+The nightly run writes only the new and edited notes as one small segment
+and tombstones the rows they replace (plus, with --prune, notes gone from
+--embeddings). Compaction merges small segments into larger ones; run it as
+its own step with --compact-only so it stays off the publish path, and its
+segments go out with the next run's manifest.
+"""
+
+import argparse
+import time
+
+from build_index import COMPACT_THRESHOLD, EXACT_THRESHOLD, load_tuning
+from segments import FANOUTS, SegmentSet, update_segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build time-partitioned segment indexes from embeddings')
+    parser.add_argument('--embeddings', help='Input NPZ file with embeddings')
+    parser.add_argument('--segments-dir', required=True, help='Directory with segments.json and segment files')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete indexed ids missing from --embeddings (use when it holds the full corpus)')
+    parser.add_argument('--compact', action=argparse.BooleanOptionalAction, default=True,
+                        help='Merge small segments after writing the new one')
+    parser.add_argument('--compact-only', action='store_true', help='Only run compaction')
+    parser.add_argument('--fanout', type=int, nargs='+', default=list(FANOUTS),
+                        help='Segments merged into one at each level (7 4 3: days -> weeks -> months -> quarters)')
+    parser.add_argument('--compact-threshold', type=float, default=COMPACT_THRESHOLD,
+                        help='Rewrite a segment once more than this share of its rows is deleted')
+    parser.add_argument('--exact-threshold', type=int, default=EXACT_THRESHOLD,
+                        help='Largest segment written as an exact index rather than HNSW')
+    parser.add_argument('--m', type=int, default=16, help='HNSW M parameter')
+    parser.add_argument('--ef-construction', type=int, default=200, help='HNSW ef_construction')
+    parser.add_argument('--ef', type=int, default=50, help='HNSW search ef')
+    parser.add_argument('--tuning', help='manifest.json with tune_index.py results; overrides --m/--ef-construction/--ef')
+    parser.add_argument('--threads', type=int, default=-1, help='Insertion threads (-1 = all cores)')
+
+    args = parser.parse_args()
+    if not args.compact_only and not args.embeddings:
+        parser.error('--embeddings is required unless --compact-only is given')
+    tuned = load_tuning(args.tuning) if args.tuning else None
+    if tuned:
+        args.m, args.ef_construction, args.ef = tuned['m'], tuned['ef_construction'], tuned['ef']
+        print(f"Using tuned settings from {args.tuning}: M={args.m}, ef_construction={args.ef_construction}, "
+              f"ef={args.ef} (recall@k {tuned['recall']})")
+    options = dict(exact_threshold=args.exact_threshold, m=args.m, ef_construction=args.ef_construction,
+                   ef=args.ef, threads=args.threads)
+
+    if not args.compact_only:
+        started = time.perf_counter()
+        stats = update_segments(args.embeddings, args.segments_dir, prune=args.prune, **options)
+        written = sum(segment['bytes'] for segment in stats['segments']) + stats['deletes_bytes']
+        print(f"Segment update in {time.perf_counter() - started:.1f}s: {len(stats['segments'])} segments, "
+              f"{written:,} new bytes to publish")
+
+    if args.compact or args.compact_only:
+        started = time.perf_counter()
+        segments = SegmentSet(args.segments_dir)
+        merged = segments.compact(args.fanout, args.compact_threshold, **options)
+        segments.save()
+        print(f"Compaction in {time.perf_counter() - started:.1f}s: {len(merged)} merged segments, "
+              f"{len(segments.segments)} segments, {segments.live} live vectors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Compact vector codes for low-storage offline search.
+
+Two tiers below int8 (384 bytes per 384-dim vector):
+
+    binary  one sign bit per dimension of the mean-centred vector, 48 bytes;
+            compared by Hamming distance (XOR + popcount over uint64 words)
+    pq      product quantization: the vector is split into m subvectors and
+            each is replaced by the nearest of 256 trained centroids, m bytes;
+            scored with asymmetric distance (per-query lookup tables)
+
+Both are meant for a two-stage search: shortlist on the codes, then re-rank
+the shortlist exactly against the int8 rows (see two_stage_search).
+
+In embeddings.npz the codes sit beside the int8 vectors: compact_type plus
+binary_codes/binary_center or pq_codes/pq_codebooks.
+"""
+
+import numpy as np
+
+from exact_search import ExactIndex
+
+COMPACT_TYPES = ('binary', 'pq')
+
+# Set bits in each byte value, for numpy < 2.0 (no np.bitwise_count)
+POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def row_popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits in each row of a uint64 matrix."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return POPCOUNT_TABLE[np.ascontiguousarray(words).view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class BinaryCodes:
+    """Sign bits of mean-centred vectors, searched by Hamming distance."""
+
+    def __init__(self, codes: np.ndarray, center: np.ndarray):
+        self.codes = np.ascontiguousarray(codes, dtype=np.uint8)
+        self.center = center.astype(np.float32)
+        # Whole 64-bit words make the XOR + popcount cheap
+        pad = -self.codes.shape[1] % 8
+        self._words = np.pad(self.codes, ((0, 0), (0, pad))).view(np.uint64)
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> 'BinaryCodes':
+        center = vectors.mean(axis=0)
+        return cls(np.packbits(vectors > center, axis=1), center)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(np.atleast_2d(vectors) > self.center, axis=1)
+
+    def fields(self) -> dict:
+        return {"compact_type": 'binary', "binary_codes": self.codes, "binary_center": self.center}
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.codes.shape[1]
+
+    def distances(self, query: np.ndarray) -> np.ndarray:
+        """Hamming distance from one query to every code (lower is closer)."""
+        words = np.pad(self.encode(query), ((0, 0), (0, self._words.shape[1] * 8 - self.codes.shape[1])))
+        return row_popcount(self._words ^ words.view(np.uint64))
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        distances = self.distances(query)
+        k = min(k, len(distances))
+        part = np.argpartition(distances, k - 1)[:k]
+        return part[np.argsort(distances[part], kind='stable')]
+
+
+class ProductQuantizer:
+    """m subvector codebooks of 256 centroids each; one byte per subvector."""
+
+    def __init__(self, codebooks: np.ndarray, codes: np.ndarray | None = None):
+        self.codebooks = codebooks.astype(np.float32)
+        self.codes = codes
+        self._offsets = None
+
+    @property
+    def subvectors(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.subvectors
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, subvectors: int = 48, iterations: int = 20,
+            sample: int = 50_000, seed: int = 0) -> 'ProductQuantizer':
+        """Train the codebooks with k-means per subspace on a sample, then encode everything."""
+        n, dims = vectors.shape
+        if dims % subvectors:
+            raise ValueError(f"{dims} dimensions do not split into {subvectors} subvectors")
+        rng = np.random.default_rng(seed)
+        train = vectors[rng.choice(n, min(n, sample), replace=False)].reshape(-1, subvectors, dims // subvectors)
+        centroids = min(256, len(train))
+
+        codebooks = np.zeros((subvectors, 256, dims // subvectors), dtype=np.float32)
+        for m in range(subvectors):
+            points = train[:, m]
+            book = points[rng.choice(len(points), centroids, replace=False)].copy()
+            for _ in range(iterations):
+                assign = _nearest(points, book)
+                counts = np.bincount(assign, minlength=centroids)
+                sums = np.stack([np.bincount(assign, points[:, j], centroids) for j in range(points.shape[1])], 1)
+                filled = counts > 0
+                book[filled] = sums[filled] / counts[filled, None]
+                # Re-seed empty clusters from random points
+                book[~filled] = points[rng.choice(len(points), int((~filled).sum()))]
+            codebooks[m, :centroids] = book
+
+        pq = cls(codebooks)
+        pq.codes = pq.encode(vectors)
+        return pq
+
+    def encode(self, vectors: np.ndarray, chunk_rows: int = 65536) -> np.ndarray:
+        vectors = np.atleast_2d(vectors)
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), chunk_rows):
+            parts = vectors[start:start + chunk_rows].reshape(-1, self.subvectors, self.codebooks.shape[2])
+            for m in range(self.subvectors):
+                codes[start:start + chunk_rows, m] = _nearest(parts[:, m], self.codebooks[m])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.codebooks[np.arange(self.subvectors), codes].reshape(len(codes), -1)
+
+    def fields(self) -> dict:
+        return {"compact_type": 'pq', "pq_codes": self.codes, "pq_codebooks": self.codebooks}
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate dot product of one query with every code (higher is closer)."""
+        parts = np.asarray(query, dtype=np.float32).reshape(self.subvectors, -1)
+        # (m, 256) table of subvector dot products, then one gather per code byte
+        table = np.einsum('mkd,md->mk', self.codebooks, parts)
+        if self._offsets is None or len(self._offsets) != len(self.codes):
+            self._offsets = self.codes + np.arange(self.subvectors, dtype=np.intp) * 256
+        return np.take(table.ravel(), self._offsets).sum(axis=1)
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        part = np.argpartition(-scores, k - 1)[:k]
+        return part[np.argsort(-scores[part], kind='stable')]
+
+
+def _nearest(points: np.ndarray, book: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for each point (squared L2)."""
+    return np.argmin((book * book).sum(axis=1) - 2 * points @ book.T, axis=1)
+
+
+def load_compact(data) -> BinaryCodes | ProductQuantizer | None:
+    """Compact codes stored in an embeddings npz, if any."""
+    compact_type = str(data['compact_type']) if 'compact_type' in data.files else None
+    if compact_type == 'binary':
+        return BinaryCodes(data['binary_codes'], data['binary_center'])
+    if compact_type == 'pq':
+        return ProductQuantizer(data['pq_codebooks'], data['pq_codes'])
+    return None
+
+
+def fit_compact(compact_type: str, vectors: np.ndarray, pq_subvectors: int = 48) -> BinaryCodes | ProductQuantizer:
+    if compact_type == 'binary':
+        return BinaryCodes.fit(vectors)
+    if compact_type == 'pq':
+        return ProductQuantizer.fit(vectors, pq_subvectors)
+    raise ValueError(f"unknown compact code type {compact_type!r}")
+
+
+def two_stage_search(codes: BinaryCodes | ProductQuantizer, exact: ExactIndex, query: np.ndarray,
+                     k: int = 10, shortlist: int = 100) -> tuple[np.ndarray, np.ndarray]:
+    """Shortlist on compact codes, then re-rank exactly with the int8 rows.
+
+    Returns (labels, cosine distances) for one query, best first.
+    """
+    candidates = codes.search(query, max(shortlist, k))
+    similarities = exact.similarity(query, candidates)
+    order = np.argsort(-similarities, kind='stable')[:k]
+    return candidates[order], 1.0 - similarities[order]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Persistent content-hash store for note embeddings.
+
+Maps event id -> (content hash, model, float32 vector) in a local SQLite file
+so nightly runs only encode notes that are new or whose cleaned content (or
+model) changed since the last run. Vectors are stored unquantized; the
+exported set is quantized as a whole by generate_embeddings.py. The cleaned
+text is kept too, so the lexical index can be rebuilt over every stored note,
+and so are the note's kind, pubkey, created_at and channel for filtered
+search (see note_metadata.py).
+
+NIP-09 deletion requests (apply_deletions.py) are kept in a deletions table
+and remove matching rows from the export, so build_index.py --prune marks
+their labels deleted. A request applies when the note's author made it; one
+recorded without a pubkey (a moderator's) applies to any author. Requests are
+kept after their rows go, so a note fetched again is not re-embedded. Rows
+stored before the pubkey column existed have no author to check an author's
+request against; generate_embeddings.py removes them when the note is next
+fetched with its pubkey (a full rebuild fetches every note again).
+"""
+
+import hashlib
+import sqlite3
+import numpy as np
+
+METADATA_COLUMNS = {'kind': 'INTEGER', 'pubkey': 'TEXT', 'created_at': 'INTEGER', 'channel': 'TEXT'}
+
+
+def content_hash(model_name: str, text: str) -> bytes:
+    """SHA-256 of model name plus cleaned text."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).digest()
+
+
+class EmbeddingStore:
+    """SQLite-backed event id -> vector store for one model."""
+
+    def __init__(self, path: str, model_name: str):
+        self.model_name = model_name
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                event_id TEXT PRIMARY KEY,
+                content_hash BLOB NOT NULL,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                text TEXT,
+                kind INTEGER,
+                pubkey TEXT,
+                created_at INTEGER,
+                channel TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS deletions (
+                event_id TEXT NOT NULL,
+                pubkey TEXT NOT NULL,
+                deleted_at INTEGER,
+                PRIMARY KEY (event_id, pubkey)
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")}
+        # Stores created before text and metadata were kept; rows fill in as notes are seen again
+        for name, sql_type in {'text': 'TEXT', **METADATA_COLUMNS}.items():
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE embeddings ADD COLUMN {name} {sql_type}")
+
+    def lookup(self, ids: list[str], hashes: list[bytes]) -> dict[str, np.ndarray]:
+        """Stored vectors for ids whose content hash still matches."""
+        found = {}
+        wanted = dict(zip(ids, hashes))
+        id_list = list(wanted)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(id_list), 500):
+            chunk = id_list[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT event_id, content_hash, vector FROM embeddings "
+                f"WHERE model = ? AND event_id IN ({placeholders})",
+                [self.model_name, *chunk]
+            )
+            for event_id, stored_hash, vector in rows:
+                if stored_hash == wanted[event_id]:
+                    found[event_id] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def upsert(self, ids: list[str], hashes: list[bytes], vectors: np.ndarray, texts: list[str] | None = None,
+               metadata: list[tuple] | None = None):
+        """Insert or replace vectors (an edited note keeps its row position).
+
+        metadata holds (kind, pubkey, created_at, channel) per id, as from note_metadata().
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        texts = texts if texts is not None else [None] * len(ids)
+        metadata = metadata if metadata is not None else [(None, None, None, None)] * len(ids)
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO embeddings
+                    (event_id, content_hash, model, dimensions, vector, text, kind, pubkey, created_at, channel)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(event_id) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    model = excluded.model,
+                    dimensions = excluded.dimensions,
+                    vector = excluded.vector,
+                    text = excluded.text,
+                    kind = excluded.kind,
+                    pubkey = excluded.pubkey,
+                    created_at = excluded.created_at,
+                    channel = excluded.channel
+                """,
+                [
+                    (event_id, digest, self.model_name, vector.shape[0], vector.tobytes(), text, *meta)
+                    for event_id, digest, vector, text, meta in zip(ids, hashes, vectors, texts, metadata)
+                ]
+            )
+
+    def fill_missing(self, ids: list[str], texts: list[str], metadata: list[tuple]):
+        """Store text and metadata for rows that predate those columns."""
+        with self.conn:
+            self.conn.executemany(
+                """
+                UPDATE embeddings SET
+                    text = COALESCE(text, ?),
+                    kind = COALESCE(kind, ?),
+                    pubkey = COALESCE(pubkey, ?),
+                    created_at = COALESCE(created_at, ?),
+                    channel = COALESCE(channel, ?)
+                WHERE event_id = ? AND (text IS NULL OR kind IS NULL)
+                """,
+                [(text, *meta, event_id) for event_id, text, meta in zip(ids, texts, metadata)]
+            )
+
+    def delete(self, ids: list[str]) -> int:
+        """Remove vectors for the given event ids; returns rows deleted."""
+        with self.conn:
+            cursor = self.conn.executemany("DELETE FROM embeddings WHERE event_id = ?", [(i,) for i in ids])
+        return cursor.rowcount
+
+    def record_deletions(self, requests: list[tuple[str, str | None, int]]) -> int:
+        """Store (event id, required author or None for any, deleted_at) requests and drop the
+        rows they cover; returns rows deleted."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO deletions (event_id, pubkey, deleted_at) VALUES (?, ?, ?)",
+                [(event_id, pubkey or '', deleted_at) for event_id, pubkey, deleted_at in requests]
+            )
+            cursor = self.conn.execute(
+                """
+                DELETE FROM embeddings WHERE event_id IN (
+                    SELECT d.event_id FROM deletions d JOIN embeddings e ON e.event_id = d.event_id
+                    WHERE d.pubkey = '' OR d.pubkey = e.pubkey
+                )
+                """
+            )
+        return cursor.rowcount
+
+    def deleted(self, ids: list[str], pubkeys: list[str]) -> set[str]:
+        """Ids among (id, author pubkey) pairs that a stored deletion request covers."""
+        authors = dict(zip(ids, pubkeys))
+        id_list = list(authors)
+        found = set()
+        for start in range(0, len(id_list), 500):
+            chunk = id_list[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT event_id, pubkey FROM deletions WHERE event_id IN ({placeholders})", chunk
+            )
+            found.update(event_id for event_id, pubkey in rows if pubkey in ('', authors[event_id]))
+        return found
+
+    def deletion_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM deletions").fetchone()[0]
+
+    def count(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM embeddings WHERE model = ?", [self.model_name]
+        ).fetchone()[0]
+
+    def export(self) -> tuple[list[str], list[bytes], np.ndarray]:
+        """All ids, content hashes and vectors for this model, in first-insertion order."""
+        ids = []
+        hashes = []
+        vectors = []
+        rows = self.conn.execute(
+            "SELECT event_id, content_hash, vector FROM embeddings WHERE model = ? ORDER BY rowid",
+            [self.model_name]
+        )
+        for event_id, digest, vector in rows:
+            ids.append(event_id)
+            hashes.append(digest)
+            vectors.append(np.frombuffer(vector, dtype=np.float32))
+        if not vectors:
+            return [], [], np.zeros((0, 0), dtype=np.float32)
+        return ids, hashes, np.stack(vectors)
+
+    def export_metadata(self) -> list[tuple]:
+        """(kind, pubkey, created_at, channel) per row, aligned with export(); unknown values are 0 or None."""
+        rows = self.conn.execute(
+            "SELECT kind, pubkey, created_at, channel FROM embeddings WHERE model = ? ORDER BY rowid",
+            [self.model_name]
+        )
+        return [(kind or 0, pubkey or '', created_at or 0, channel) for kind, pubkey, created_at, channel in rows]
+
+    def iter_texts(self):
+        """(event id, text) for this model's rows that have text, in first-insertion order."""
+        yield from self.conn.execute(
+            "SELECT event_id, text FROM embeddings WHERE model = ? AND text IS NOT NULL ORDER BY rowid",
+            [self.model_name]
+        )
+
+    def close(self):
+        self.conn.close()
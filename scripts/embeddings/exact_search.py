@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Exact (brute-force) cosine search over quantized vectors.
+
+For corpora of tens of thousands of vectors a chunked matrix product over the
+stored int8 rows is exact, fast enough, and a fraction of the size of an HNSW
+graph with float32 vectors and 2x headroom. Rows stay int8 (or float16) in
+memory and are widened to float32 one chunk at a time for BLAS. Rows use one
+of the quantization.py schemes; global and per-dim values map back to floats
+as a * q + b (a and b scalars or per-dimension), so for a query y:
+
+    x . y = q . (a * y) + b . y
+
+per-vector rows need no correction at all: their scale cancels in cosine
+similarity. Row norms are precomputed, and top-k uses argpartition per chunk.
+
+index.bin layout in exact mode, all little-endian:
+
+    header   32 bytes  magic "NBEX", u16 version, u16 flags, u32 labels,
+                       u32 dimensions, f32 quantize min, f32 quantize scale,
+                       8 reserved bytes
+    norms    labels x f32      row norm, 0 for a free label
+    params   2 x dims x f32    per-dim min then scale (FLAG_PER_DIM only)
+    vectors  labels x dims     int8, or float16 with FLAG_FLOAT16
+
+The header min/scale apply to the global scheme. Labels are row numbers,
+matching the label table and index_mapping.bin.
+"""
+
+import struct
+
+import numpy as np
+
+from quantization import dequantize, quantize_int8, scheme_of
+
+MAGIC = b'NBEX'
+VERSION = 1
+FLAG_FLOAT16 = 1
+FLAG_PER_DIM = 2
+FLAG_PER_VECTOR = 4
+HEADER = struct.Struct('<4sHHIIff8x')
+SCHEME_FLAGS = {'float16': FLAG_FLOAT16, 'global': 0, 'per-dim': FLAG_PER_DIM, 'per-vector': FLAG_PER_VECTOR}
+
+
+def affine(vmin, scale) -> tuple:
+    """(a, b) with dequantized = a * int8 + b, matching dequantize_int8."""
+    return 1.0 / scale, vmin + 128.0 / scale
+
+
+def scheme_from_flags(flags: int) -> str:
+    for scheme, flag in SCHEME_FLAGS.items():
+        if flag and flags & flag:
+            return scheme
+    return 'global'
+
+
+def read_header(path: str) -> dict | None:
+    """Header fields of an exact index file, or None if path is something else (e.g. HNSW)."""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size or header[:4] != MAGIC:
+        return None
+    magic, version, flags, count, dims, vmin, scale = HEADER.unpack(header)
+    return {"version": version, "scheme": scheme_from_flags(flags), "labels": count, "dimensions": dims,
+            "quantize_min": vmin, "quantize_scale": scale}
+
+
+class ExactIndex:
+    """Brute-force cosine index over int8 or float16 rows; free rows have norm 0."""
+
+    def __init__(self, vectors: np.ndarray, scheme: str = 'global', vmin=0.0, scale=1.0,
+                 norms: np.ndarray | None = None, chunk_rows: int = 4096):
+        if scheme not in SCHEME_FLAGS:
+            raise ValueError(f"unknown exact index scheme {scheme!r}")
+        if vectors.dtype != (np.float16 if scheme == 'float16' else np.int8):
+            raise ValueError(f"{scheme} rows cannot be {vectors.dtype}")
+        self.vectors = vectors
+        self.scheme = scheme
+        self.vmin = np.asarray(vmin, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.chunk_rows = chunk_rows
+        self.norms = self.row_norms() if norms is None else norms
+
+    @classmethod
+    def empty(cls, dimensions: int, scheme: str, vmin=0.0, scale=1.0) -> 'ExactIndex':
+        dtype = np.float16 if scheme == 'float16' else np.int8
+        return cls(np.zeros((0, dimensions), dtype=dtype), scheme, vmin, scale, np.zeros(0, dtype=np.float32))
+
+    @classmethod
+    def from_embeddings(cls, embeddings_path: str, dtype: str = 'int8') -> 'ExactIndex':
+        """Index an embeddings NPZ; label i is row i. Float vectors are quantized per dimension."""
+        data = np.load(embeddings_path, allow_pickle=True)
+        scheme = scheme_of(data)
+        if dtype == 'float16':
+            return cls(dequantize(data).astype(np.float16), 'float16')
+        if scheme is None:
+            quantized, vmin, scale = quantize_int8(data['vectors'].astype(np.float32), 'per-dim')
+            return cls(quantized, 'per-dim', vmin, scale)
+        if scheme == 'per-vector':
+            return cls(data['vectors'], scheme)
+        return cls(data['vectors'], scheme, data['quantize_min'], data['quantize_scale'])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'ExactIndex':
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        magic, version, flags, count, dims, vmin, scale = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} exact index")
+        scheme = scheme_from_flags(flags)
+        dtype = np.float16 if scheme == 'float16' else np.int8
+        offset = HEADER.size + 4 * count
+        if scheme == 'per-dim':
+            params = np.fromfile(path, dtype='<f4', count=2 * dims, offset=offset)
+            vmin, scale = params[:dims], params[dims:]
+            offset += params.nbytes
+
+        mode = 'r' if mmap else 'c'
+        norms = np.memmap(path, dtype='<f4', mode=mode, offset=HEADER.size, shape=(count,)) \
+            if count else np.zeros(0, dtype=np.float32)
+        vectors = np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(count, dims)) \
+            if count else np.zeros((0, dims), dtype=dtype)
+        if not mmap:
+            norms, vectors = np.array(norms), np.array(vectors)
+        return cls(vectors, scheme, vmin, scale, norms)
+
+    def save(self, path: str):
+        per_dim = self.scheme == 'per-dim'
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, SCHEME_FLAGS[self.scheme], len(self.vectors), self.dimensions,
+                                0.0 if per_dim else float(self.vmin), 1.0 if per_dim else float(self.scale)))
+            f.write(np.ascontiguousarray(self.norms, dtype='<f4').tobytes())
+            if per_dim:
+                f.write(self.vmin.astype('<f4').tobytes())
+                f.write(self.scale.astype('<f4').tobytes())
+            f.write(np.ascontiguousarray(self.vectors).tobytes())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.norms))
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        params = 2 * 4 * self.dimensions if self.scheme == 'per-dim' else 0
+        return HEADER.size + self.norms.nbytes + params + self.vectors.nbytes
+
+    def _affine(self) -> tuple:
+        """(a, b) mapping stored values to vectors, up to a per-row factor that cancels in cosine."""
+        if self.scheme in ('float16', 'per-vector'):
+            return 1.0, 0.0
+        return affine(self.vmin, self.scale)
+
+    def _to_float(self, rows: np.ndarray) -> np.ndarray:
+        a, b = self._affine()
+        return a * rows.astype(np.float32) + b
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.scheme == 'float16':
+            return vectors.astype(np.float16)
+        if self.scheme == 'per-vector':
+            return quantize_int8(vectors, 'per-vector')[0]
+        return (np.round((vectors - self.vmin) * self.scale) - 128).clip(-128, 127).astype(np.int8)
+
+    def _writable(self):
+        if isinstance(self.vectors, np.memmap):
+            self.vectors = np.array(self.vectors)
+        if isinstance(self.norms, np.memmap):
+            self.norms = np.array(self.norms)
+
+    def row_norms(self) -> np.ndarray:
+        norms = np.empty(len(self.vectors), dtype=np.float32)
+        for start in range(0, len(self.vectors), self.chunk_rows):
+            norms[start:start + self.chunk_rows] = np.linalg.norm(
+                self._to_float(self.vectors[start:start + self.chunk_rows]), axis=1)
+        return norms
+
+    def resize(self, size: int):
+        """Grow to hold labels below size; new rows are free."""
+        self._writable()
+        if size > len(self.vectors):
+            grow = size - len(self.vectors)
+            self.vectors = np.concatenate([self.vectors, np.zeros((grow, self.dimensions), self.vectors.dtype)])
+            self.norms = np.concatenate([self.norms, np.zeros(grow, dtype=np.float32)])
+
+    def set_rows(self, labels: np.ndarray, vectors: np.ndarray):
+        """Store float vectors under labels, growing the index if needed."""
+        labels = np.asarray(labels, dtype=np.int64)
+        self.resize(int(labels.max()) + 1 if len(labels) else 0)
+        self.vectors[labels] = self._encode(vectors)
+        self.norms[labels] = np.linalg.norm(self._to_float(self.vectors[labels]), axis=1)
+
+    def vectors_for(self, labels: np.ndarray) -> np.ndarray:
+        """Float32 vectors under labels (per-vector rows up to their own scale, which cosine ignores)."""
+        return self._to_float(np.asarray(self.vectors[labels]))
+
+    def mark_deleted(self, labels: np.ndarray):
+        self._writable()
+        self.norms[np.asarray(labels, dtype=np.int64)] = 0
+
+    def requantize(self, vmin, scale, labels: np.ndarray, vectors: np.ndarray):
+        """Re-express global or per-dim rows under a new min/scale (each embeddings export has its own).
+
+        Rows under labels are re-encoded from their float vectors, so they keep a single rounding
+        step however many exports they live through. Other live rows have no float source and are
+        converted from their current codes.
+        """
+        vmin, scale = np.asarray(vmin, dtype=np.float32), np.asarray(scale, dtype=np.float32)
+        if self.scheme not in ('global', 'per-dim') or \
+                (np.array_equal(vmin, self.vmin) and np.array_equal(scale, self.scale)):
+            return
+        labels = np.asarray(labels, dtype=np.int64)
+        unsourced = np.setdiff1d(np.flatnonzero(self.norms), labels)
+        unsourced_vectors = self.vectors_for(unsourced)
+        self.vectors = np.zeros(self.vectors.shape, dtype=np.int8)
+        self.norms = np.zeros(len(self.vectors), dtype=np.float32)
+        self.vmin, self.scale = vmin, scale
+        self.set_rows(np.concatenate([labels, unsourced]), np.concatenate([vectors, unsourced_vectors]))
+
+    def similarity(self, query: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """Exact cosine similarity of one query to the given labels (free labels score -inf)."""
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        a, b = self._affine()
+        offset = float(query @ b) if np.ndim(b) else b * float(query.sum())
+        dots = self.vectors[labels].astype(np.float32) @ (query * a) + offset
+        norms = np.asarray(self.norms[labels])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(norms > 0, dots / norms, -np.inf)
+
+    def search(self, queries: np.ndarray, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Exact top-k labels and cosine distances, shaped (n_queries, k) like hnswlib's knn_query."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        k = min(k, len(self))
+        n = len(queries)
+        best_scores = np.full((n, 0), -np.inf, dtype=np.float32)
+        best_labels = np.zeros((n, 0), dtype=np.int64)
+
+        # Fold the (per-dimension) scale into the query and the offset into one term per query
+        a, b = self._affine()
+        query_t = np.ascontiguousarray((queries * a).T, dtype=np.float32)
+        offsets = queries @ b if np.ndim(b) else b * queries.sum(axis=1)
+
+        for start in range(0, len(self.vectors), self.chunk_rows):
+            norms = np.asarray(self.norms[start:start + self.chunk_rows])
+            rows = self.vectors[start:start + self.chunk_rows].astype(np.float32)
+            # (chunk, n) dot products of the stored values, then the offset correction
+            scores = (rows @ query_t + offsets).T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(norms > 0, scores / norms, -np.inf)
+
+            take = min(k, scores.shape[1])
+            part = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+            best_labels = np.concatenate([best_labels, part + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_labels = np.take_along_axis(best_labels, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        labels = np.take_along_axis(best_labels, order, axis=1)
+        distances = 1.0 - np.take_along_axis(best_scores, order, axis=1)
+        return labels, distances
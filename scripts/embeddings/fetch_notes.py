@@ -1,15 +1,34 @@
 #!/usr/bin/env python3
 """
 Fetch notes from Nostr relay for embedding generation.
-Connects via WebSocket and retrieves text notes (kind 1) and channel messages (kind 9).
+Connects via WebSocket and retrieves text notes (kind 1), channel messages (kind 9)
+and NIP-28 public channel messages (kind 42, whose root "e" tag names the channel).
+
+Pages backward through created_at with until/since cursors so the whole window
+is covered no matter how many events the relay holds or how low it caps
+`limit`. The high-water created_at (plus the ids seen at exactly that second)
+is persisted to a state file so the next run only fetches what is new.
+
+Several relays and --shards time windows are fetched concurrently, one
+WebSocket per (relay, window), with events de-duplicated by id before they
+are written.
+
+With --deletions, NIP-09 deletion requests (kind 5) are fetched in the same
+pass, under the same high-water mark, and written to their own NDJSON file
+for apply_deletions.py.
 """
 
 import asyncio
+import contextlib
 import json
 import argparse
 import time
 from pathlib import Path
 
+from note_metadata import DELETION
+from notes_io import NotesWriter
+from relay_codec import NoteEvent, RelayDecoder
+
 try:
     import websockets
 except ImportError:
@@ -18,104 +37,291 @@ except ImportError:
     subprocess.check_call(['pip', 'install', 'websockets'])
     import websockets
 
+KINDS = [1, 9, 42]
+PAGE_SIZE = 500  # common relay cap for `limit`
+PAGE_TIMEOUT = 30  # seconds without a message before a page is abandoned
+MAX_RETRIES = 3
+
+
+def load_state(state_path: str | None) -> tuple[int | None, list[str]]:
+    """Read (high-water created_at, ids at that second) from a JSON state file."""
+    if not state_path or not Path(state_path).exists():
+        return None, []
+    with open(state_path) as f:
+        state = json.load(f)
+    return state.get('high_water_created_at'), state.get('high_water_ids', [])
+
+
+def save_state(state_path: str, high_water: int, high_water_ids: list[str]):
+    """Write the high-water mark, keeping any other keys (e.g. a manifest's)."""
+    state = {}
+    if Path(state_path).exists():
+        with open(state_path) as f:
+            state = json.load(f)
+    state['high_water_created_at'] = high_water
+    state['high_water_ids'] = sorted(high_water_ids)
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+async def fetch_page(ws, subscription_id: str, filters: dict, decoder: RelayDecoder) -> list[NoteEvent]:
+    """Run one REQ to EOSE and return its events."""
+    await ws.send(json.dumps(["REQ", subscription_id, filters]))
+    events = []
+    while True:
+        msg = await asyncio.wait_for(ws.recv(), timeout=PAGE_TIMEOUT)
+        data = decoder.decode(msg)
+
+        if data[0] == "EVENT" and data[1] == subscription_id:
+            if data[2] is not None:
+                events.append(data[2])
+
+        elif data[0] == "EOSE" and data[1] == subscription_id:
+            break
+
+        elif data[0] == "CLOSED" and data[1] == subscription_id:
+            raise RuntimeError(f"Relay closed subscription: {data[2] if len(data) > 2 else ''}")
+
+        elif data[0] == "NOTICE":
+            print(f"Relay notice: {data[1]}")
+
+    await ws.send(json.dumps(["CLOSE", subscription_id]))
+    return events
+
+
+def id_key(event_id: str) -> int:
+    """64-bit key from the first 16 hex chars of an event id (about half the
+    memory of the id string in a set; a collision needs ~4 billion events)."""
+    return int(event_id[:16], 16)
+
+
+def time_windows(since: int | None, now: int, shards: int,
+                 backfill_days: int) -> list[tuple[int | None, int | None]]:
+    """Split [since, now] into disjoint inclusive (since, until) windows.
+
+    The first window stays open below (since=None) when there is no
+    high-water mark, and the last stays open above to catch clock skew.
+    """
+    lower = since if since is not None else now - backfill_days * 86400
+    shards = max(1, min(shards, now - lower + 1))
+    if shards == 1:
+        return [(since, None)]
+    edges = [lower + (now + 1 - lower) * i // shards for i in range(shards + 1)]
+    windows = [(edges[i], edges[i + 1] - 1) for i in range(shards)]
+    windows[0] = (since, windows[0][1])
+    windows[-1] = (windows[-1][0], None)
+    return windows
+
+
+class NoteSink:
+    """Shared de-duplication, high-water tracking and output for all fetch tasks."""
+
+    def __init__(self, writer: NotesWriter, decoder: RelayDecoder,
+                 high_water: int | None, high_water_ids: list[str], deletions: NotesWriter | None = None):
+        self.writer = writer
+        self.deletions = deletions
+        self.kinds = KINDS + [DELETION] if deletions is not None else KINDS
+        self.decoder = decoder
+        self.seen = {id_key(event_id) for event_id in high_water_ids}
+        self.high_water = high_water
+        self.at_high_water = set(high_water_ids)
+        self.duplicates = 0
+
+    def add(self, event: NoteEvent):
+        key = id_key(event.id)
+        if key in self.seen:
+            self.duplicates += 1
+            return
+        self.seen.add(key)
+
+        if self.high_water is None or event.created_at > self.high_water:
+            self.high_water = event.created_at
+            self.at_high_water = {event.id}
+        elif event.created_at == self.high_water:
+            self.at_high_water.add(event.id)
+
+        if event.kind == DELETION:
+            if self.deletions is not None:
+                self.deletions.write_line(self.decoder.encode_note(event))
+            return
+
+        # Only include notes with content
+        if event.content and not event.content.isspace():
+            self.writer.write_line(self.decoder.encode_note(event))
+
+
+async def fetch_window(
+    relay_url: str,
+    since: int | None,
+    until: int | None,
+    sink: NoteSink,
+    limiter: asyncio.Semaphore,
+    page_size: int,
+    label: str
+) -> bool:
+    """Page backward through one relay's [since, until] window; True if covered."""
+    pages = 0
+    # Ids already returned at the cursor second, to tell a cut-through page
+    # from one that only repeats the boundary
+    boundary = set()
+
+    async with limiter:
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                async with websockets.connect(relay_url, ping_interval=30, ping_timeout=10,
+                                              max_size=None) as ws:
+                    while True:
+                        filters = {"kinds": sink.kinds, "limit": page_size}
+                        if since is not None:
+                            filters["since"] = since
+                        if until is not None:
+                            filters["until"] = until
+
+                        events = await fetch_page(ws, f"embed-{label}-{pages}", filters, sink.decoder)
+                        pages += 1
+                        if not events:
+                            break
+
+                        for event in events:
+                            sink.add(event)
+
+                        oldest = min(event.created_at for event in events)
+                        at_oldest = {event.id for event in events if event.created_at == oldest}
+                        if any(event.id not in boundary for event in events):
+                            # Re-query the oldest second: the page may have cut through it
+                            boundary = at_oldest | boundary if oldest == until else at_oldest
+                            until = oldest
+                        else:
+                            if len(events) >= page_size:
+                                print(f"Warning: more than {page_size} events at created_at={oldest} "
+                                      f"on {relay_url}; some may be missed")
+                            boundary = set()
+                            until = oldest - 1
+
+                        if since is not None and until < since:
+                            break
+                        if pages % 20 == 0:
+                            print(f"  [{label}] {pages} pages, {sink.writer.count} notes total, until={until}")
+
+                print(f"  [{label}] done: {pages} pages")
+                return True
+
+            except Exception as e:
+                # The cursor survives reconnects, so a retry resumes where it stopped
+                print(f"  [{label}] error (attempt {attempt}/{MAX_RETRIES}): {e}")
+                if attempt < MAX_RETRIES:
+                    await asyncio.sleep(2 ** attempt)
+
+    return False
+
+
+async def fetch_notes(
+    relay_urls: list[str],
+    output_path: str,
+    since: int | None = None,
+    state_path: str | None = None,
+    page_size: int = PAGE_SIZE,
+    shards: int = 1,
+    concurrency: int = 8,
+    backfill_days: int = 365,
+    tags: bool = True,
+    json_backend: str | None = None,
+    deletions_path: str | None = None
+):
+    """Fetch every (relay, time window) pair concurrently into one de-duplicated NDJSON file.
+
+    deletions_path also fetches kind 5 deletion requests into a second NDJSON file; their
+    "e" tags name the deleted notes, so tags must be kept.
+    """
+    if deletions_path and not tags:
+        raise ValueError("Deletion requests need tags to name the deleted notes")
+
+    high_water, high_water_ids = load_state(state_path)
+    if high_water is not None and (since is None or high_water > since):
+        # `since` is inclusive, so events at the high-water second come back
+        # again; their ids are remembered to skip them
+        since = high_water
+    else:
+        high_water_ids = []
+
+    windows = time_windows(since, int(time.time()), shards, backfill_days)
+    run_id = int(time.time())
+    limiter = asyncio.Semaphore(concurrency)
+
+    print(f"Fetching kinds {KINDS + [DELETION] if deletions_path else KINDS} since {since if since is not None else 'the beginning'} "
+          f"from {len(relay_urls)} relay(s) in {len(windows)} window(s), "
+          f"{concurrency} at a time, {page_size} per page")
+
+    decoder = RelayDecoder(tags=tags, backend=json_backend)
+    print(f"Decoding with {decoder.backend}{'' if tags else ', dropping tags'}")
+
+    deletions_writer = NotesWriter(deletions_path) if deletions_path else contextlib.nullcontext()
+    with NotesWriter(output_path) as notes, deletions_writer as deletions:
+        sink = NoteSink(notes, decoder, high_water, high_water_ids, deletions)
+        tasks = [
+            fetch_window(url, window_since, window_until, sink, limiter, page_size,
+                         label=f"{run_id}-r{r}-w{w}")
+            for r, url in enumerate(relay_urls)
+            for w, (window_since, window_until) in enumerate(windows)
+        ]
+        results = await asyncio.gather(*tasks)
+
+    print(f"Wrote {notes.count} notes to {output_path} ({sink.duplicates} duplicates dropped)")
+    if deletions is not None:
+        print(f"Wrote {deletions.count} deletion requests to {deletions_path}")
+
+    if not all(results):
+        # Notes already written are kept, but some window was not covered
+        print(f"Fetch incomplete ({results.count(False)} of {len(results)} windows failed); "
+              f"high-water mark not advanced")
+    elif state_path and sink.high_water is not None:
+        save_state(state_path, sink.high_water, list(sink.at_high_water))
+        print(f"High-water mark: created_at={sink.high_water} ({len(sink.at_high_water)} ids)")
 
-async def fetch_notes(relay_url: str, since_event: str | None, output_path: str, limit: int = 10000):
-    """Fetch notes from relay via WebSocket."""
-
-    notes = []
-    subscription_id = f"embed-{int(time.time())}"
-
-    # Build filter - fetch kind 1 (text notes) and kind 9 (group messages)
-    filters = {
-        "kinds": [1, 9],
-        "limit": limit
-    }
-
-    # If we have a since_event, only fetch newer notes
-    # (In practice, we'd track created_at timestamp, but using event ID for simplicity)
-    if since_event:
-        # Fetch the timestamp of the since_event and use that
-        # For now, just fetch recent notes
-        filters["since"] = int(time.time()) - 86400 * 7  # Last 7 days
-
-    print(f"Connecting to {relay_url}...")
-
-    try:
-        async with websockets.connect(relay_url, ping_interval=30, ping_timeout=10) as ws:
-            # Subscribe to notes
-            req = ["REQ", subscription_id, filters]
-            await ws.send(json.dumps(req))
-            print(f"Sent subscription request: {json.dumps(filters)}")
-
-            # Collect events with timeout
-            timeout = 30  # seconds
-            start_time = time.time()
-
-            while time.time() - start_time < timeout:
-                try:
-                    msg = await asyncio.wait_for(ws.recv(), timeout=5)
-                    data = json.loads(msg)
-
-                    if data[0] == "EVENT" and data[1] == subscription_id:
-                        event = data[2]
-                        # Only include notes with content
-                        if event.get("content") and len(event["content"].strip()) > 0:
-                            notes.append({
-                                "id": event["id"],
-                                "pubkey": event["pubkey"],
-                                "content": event["content"],
-                                "created_at": event["created_at"],
-                                "kind": event["kind"],
-                                "tags": event.get("tags", [])
-                            })
-                            if len(notes) % 100 == 0:
-                                print(f"  Collected {len(notes)} notes...")
-
-                    elif data[0] == "EOSE":
-                        print(f"End of stored events - collected {len(notes)} notes")
-                        break
-
-                    elif data[0] == "NOTICE":
-                        print(f"Relay notice: {data[1]}")
-
-                except asyncio.TimeoutError:
-                    print("Timeout waiting for events, continuing...")
-                    continue
-
-            # Close subscription
-            await ws.send(json.dumps(["CLOSE", subscription_id]))
-
-    except Exception as e:
-        print(f"Error connecting to relay: {e}")
-        # If relay is unavailable, create empty notes file
-        notes = []
-
-    # Sort by created_at
-    notes.sort(key=lambda x: x["created_at"])
-
-    # Write to output
-    output = Path(output_path)
-    with open(output, 'w') as f:
-        json.dump(notes, f, indent=2)
-
-    print(f"Wrote {len(notes)} notes to {output_path}")
-    return notes
+    return notes.count
 
 
 def main():
     parser = argparse.ArgumentParser(description='Fetch notes from Nostr relay')
-    parser.add_argument('--relay', required=True, help='Relay WebSocket URL')
-    parser.add_argument('--since-event', help='Fetch notes after this event ID')
-    parser.add_argument('--output', required=True, help='Output JSON file path')
-    parser.add_argument('--limit', type=int, default=10000, help='Maximum notes to fetch')
+    parser.add_argument('--relay', required=True, nargs='+', help='Relay WebSocket URL(s)')
+    parser.add_argument('--since', type=int, help='Only fetch notes with created_at >= this timestamp')
+    parser.add_argument('--state',
+                        help='JSON file holding the high-water mark (e.g. manifest.json); '
+                             'read before fetching and updated after a complete fetch')
+    parser.add_argument('--output', required=True,
+                        help='Output NDJSON file path (.gz or .zst to compress)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help='Events requested per page (the relay may cap this lower)')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Split the time range into this many windows fetched in parallel')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum (relay, window) fetches running at once')
+    parser.add_argument('--backfill-days', type=int, default=365,
+                        help='Range to shard when there is no high-water mark (older notes '
+                             'still go to the first window)')
+    parser.add_argument('--tags', action=argparse.BooleanOptionalAction, default=True,
+                        help='Keep event tags in the output (--no-tags drops them while decoding)')
+    parser.add_argument('--deletions',
+                        help='Also fetch NIP-09 deletion requests (kind 5) into this NDJSON file')
+    parser.add_argument('--json-backend', choices=['msgspec', 'orjson', 'json'],
+                        help='JSON library for relay frames (default: fastest installed)')
 
     args = parser.parse_args()
+    if args.deletions and not args.tags:
+        parser.error('--deletions needs tags (drop --no-tags)')
 
     asyncio.run(fetch_notes(
-        relay_url=args.relay,
-        since_event=args.since_event if args.since_event else None,
+        relay_urls=args.relay,
         output_path=args.output,
-        limit=args.limit
+        since=args.since,
+        state_path=args.state,
+        page_size=args.page_size,
+        shards=args.shards,
+        concurrency=args.concurrency,
+        backfill_days=args.backfill_days,
+        tags=args.tags,
+        json_backend=args.json_backend,
+        deletions_path=args.deletions
     ))
 
 
@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
 """
 Generate embeddings for Nostr notes using sentence-transformers.
-Supports int8 quantization for reduced storage.
+Supports int8 quantization for reduced storage, optionally with binary or
+product-quantized codes alongside for two-stage search (see compact_codes.py),
+a BM25 lexical index over the same cleaned text (see lexical_index.py), and
+per-note kind, pubkey, created_at and channel columns (see note_metadata.py).
 """
 
-import json
 import argparse
+import os
+import tempfile
 import numpy as np
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from tqdm import tqdm
 
+from embedding_store import EmbeddingStore, content_hash
+from lexical_index import LexicalIndexBuilder
+from note_metadata import NoteMetadata, note_metadata
+from notes_io import iter_note_batches
+from compact_codes import COMPACT_TYPES, fit_compact
+from quantization import SCHEMES, quantization_fields, quantize_int8
+
 try:
     from sentence_transformers import SentenceTransformer
 except ImportError:
@@ -19,12 +31,6 @@ except ImportError:
     from sentence_transformers import SentenceTransformer
 
 
-def load_notes(input_path: str) -> list[dict]:
-    """Load notes from JSON file."""
-    with open(input_path, 'r') as f:
-        return json.load(f)
-
-
 def clean_content(content: str) -> str:
     """Clean note content for embedding."""
     # Remove nostr: URIs
@@ -37,22 +43,247 @@ def clean_content(content: str) -> str:
     return content.strip()
 
 
-def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, float, float]:
-    """Quantize float32 vectors to int8 for storage efficiency."""
-    # Compute global min/max for consistent quantization
-    vmin = vectors.min()
-    vmax = vectors.max()
+def token_lengths(model, texts: list[str], chunk_size: int = 10000) -> np.ndarray:
+    """Tokenize once and return each text's length in tokens (after truncation)."""
+    max_length = model.max_seq_length
+    lengths = np.empty(len(texts), dtype=np.int32)
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts[start:start + chunk_size]
+        encoded = model.tokenizer(chunk, add_special_tokens=True, truncation=True, max_length=max_length)
+        lengths[start:start + len(chunk)] = [len(ids) for ids in encoded['input_ids']]
+    return lengths
+
+
+def plan_batches(lengths: np.ndarray, max_tokens_per_batch: int) -> list[np.ndarray]:
+    """
+    Group text indices into batches whose padded size fits a token budget.
+
+    Texts are sorted by token length so each batch pads to a similar length,
+    then batches are cut when (texts in batch) x (longest text) would exceed
+    the budget: short notes share big batches, long messages get small ones.
+    """
+    order = np.argsort(lengths, kind='stable')[::-1]
+    batches = []
+    start = 0
+    while start < len(order):
+        # Longest text comes first, so it sets the padded length for this batch
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, max_tokens_per_batch // longest)
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def encode_texts(
+    model,
+    texts: list[str],
+    batch_size: int = 32,
+    max_tokens_per_batch: int = 0
+) -> np.ndarray:
+    """Encode texts, optionally in token-budgeted batches, returning vectors in input order."""
+    if max_tokens_per_batch <= 0:
+        return model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=True,
+            convert_to_numpy=True,
+            normalize_embeddings=True  # L2 normalize for cosine similarity
+        )
+
+    lengths = token_lengths(model, texts)
+    batches = plan_batches(lengths, max_tokens_per_batch)
+    padded = sum(len(batch) * int(lengths[batch[0]]) for batch in batches)
+    print(f"Token-budget batching: {len(batches)} batches, "
+          f"{lengths.sum() / max(padded, 1):.1%} of padded tokens are real")
+
+    embeddings = None
+    for batch in tqdm(batches, desc="Batches"):
+        vectors = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        # Scatter back so output rows line up with the original ids order
+        embeddings[batch] = vectors
+
+    return embeddings
+
+
+# Per-process model for --workers mode (loaded once by _init_worker)
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    """Load the model once per worker process and pin its torch thread count."""
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_shard(shard_path: str, texts: list[str], batch_size: int, max_tokens_per_batch: int) -> str:
+    """Encode one shard in a worker and write its partial result to disk."""
+    vectors = encode_texts(_worker_model, texts, batch_size, max_tokens_per_batch)
+    np.save(shard_path, vectors.astype(np.float32))
+    return shard_path
+
+
+class ShardedEncoder:
+    """
+    Shard texts across a persistent pool of worker processes.
+
+    Each worker loads the model once and pins torch to threads_per_worker
+    threads (default: cores / workers) so processes don't oversubscribe the
+    CPU. Every encode() call splits its texts into contiguous shards, each
+    written to disk by its worker and merged by shard index, so the output is
+    identical to a single-process run regardless of completion order. The
+    pool is started lazily and reused across calls.
+    """
+
+    def __init__(self, model_name: str, workers: int, batch_size: int = 32,
+                 max_tokens_per_batch: int = 0, threads_per_worker: int = 0):
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self._pool = None
+        self._shard_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._shard_dir.cleanup()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if self._pool is None:
+            print(f"Starting {self.workers} worker processes x {self.threads} threads")
+            self._shard_dir = tempfile.TemporaryDirectory(prefix='embed-shards-')
+            # spawn: torch's thread pools do not survive fork safely
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads)
+            )
+
+        shards = [shard for shard in np.array_split(np.arange(len(texts)), self.workers) if len(shard)]
+        futures = [
+            self._pool.submit(
+                _encode_shard,
+                os.path.join(self._shard_dir.name, f'shard-{i:04d}.npy'),
+                [texts[j] for j in shard],
+                self.batch_size,
+                self.max_tokens_per_batch
+            )
+            for i, shard in enumerate(shards)
+        ]
+        shard_paths = [future.result() for future in futures]
+        return np.concatenate([np.load(path) for path in shard_paths])
 
-    # Scale to 0-255 range, then shift to -128 to 127
-    scale = 255.0 / (vmax - vmin + 1e-8)
-    quantized = ((vectors - vmin) * scale - 128).astype(np.int8)
 
-    return quantized, float(vmin), float(scale)
+class LocalEncoder:
+    """Encode in this process; the model is loaded on first use."""
 
+    def __init__(self, model_name: str, batch_size: int = 32, max_tokens_per_batch: int = 0):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self._model = None
 
-def dequantize_int8(quantized: np.ndarray, vmin: float, scale: float) -> np.ndarray:
-    """Dequantize int8 vectors back to float32."""
-    return ((quantized.astype(np.float32) + 128) / scale) + vmin
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._model = None
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if self._model is None:
+            print(f"Loading model: {self.model_name}")
+            self._model = SentenceTransformer(self.model_name)
+        return encode_texts(self._model, texts, self.batch_size, self.max_tokens_per_batch)
+
+
+def make_encoder(model_name: str, batch_size: int = 32, max_tokens_per_batch: int = 0,
+                 workers: int = 1, threads_per_worker: int = 0):
+    """Encoder for this run: sharded across processes when workers > 1."""
+    if workers > 1:
+        return ShardedEncoder(model_name, workers, batch_size, max_tokens_per_batch, threads_per_worker)
+    return LocalEncoder(model_name, batch_size, max_tokens_per_batch)
+
+
+def encode_parallel(
+    model_name: str,
+    texts: list[str],
+    workers: int,
+    batch_size: int = 32,
+    max_tokens_per_batch: int = 0,
+    threads_per_worker: int = 0
+) -> np.ndarray:
+    """One-shot sharded encode of texts (see ShardedEncoder)."""
+    with ShardedEncoder(model_name, workers, batch_size, max_tokens_per_batch, threads_per_worker) as encoder:
+        return encoder.encode(texts)
+
+
+def iter_note_texts(input_path: str, chunk_size: int):
+    """Stream (ids, cleaned texts, metadata) chunks from the notes file, skipping very short content."""
+    for notes in iter_note_batches(input_path, chunk_size):
+        ids = []
+        texts = []
+        metadata = []
+        for note in notes:
+            cleaned = clean_content(note['content'])
+            if len(cleaned) > 10:  # Skip very short content
+                texts.append(cleaned)
+                ids.append(note['id'])
+                metadata.append(note_metadata(note))
+        if ids:
+            yield ids, texts, metadata
+
+
+def embed_incremental(store: EmbeddingStore, model_name: str, ids: list[str], texts: list[str], encoder,
+                      metadata: list[tuple] | None = None) -> tuple[int, int]:
+    """
+    Reuse stored vectors for unchanged notes and encode only new or edited ones.
+
+    Returns (reused, recomputed) counts for this chunk.
+    """
+    # Last occurrence wins if a note appears twice in the chunk
+    latest = dict(zip(ids, texts))
+    meta = dict(zip(ids, metadata or [(0, '', 0, None)] * len(ids)))
+    # Notes covered by a NIP-09 deletion request stay out of the store (apply_deletions.py). Rows
+    # stored without a pubkey are only matched to their author's request here, so drop them too
+    deleted = store.deleted(list(latest), [meta[event_id][1] for event_id in latest])
+    for event_id in deleted:
+        del latest[event_id]
+    if deleted:
+        store.delete(list(deleted))
+    hashes = {event_id: content_hash(model_name, text) for event_id, text in latest.items()}
+    reused = store.lookup(list(hashes), list(hashes.values()))
+    todo = [event_id for event_id in latest if event_id not in reused]
+
+    if todo:
+        todo_texts = [latest[event_id] for event_id in todo]
+        vectors = encoder.encode(todo_texts)
+        store.upsert(todo, [hashes[event_id] for event_id in todo], vectors, todo_texts,
+                     [meta[event_id] for event_id in todo])
+    if reused:
+        store.fill_missing(list(reused), [latest[event_id] for event_id in reused],
+                           [meta[event_id] for event_id in reused])
+
+    return len(reused), len(todo)
+
+
+def hash_prefixes(hashes: list[bytes]) -> np.ndarray:
+    """First 8 bytes of each content hash as uint64, so indexers can spot edits."""
+    return np.frombuffer(b''.join(digest[:8] for digest in hashes), dtype='<u8')
 
 
 def generate_embeddings(
@@ -60,63 +291,89 @@ def generate_embeddings(
     model_name: str,
     output_path: str,
     quantize: str = 'none',
-    batch_size: int = 32
+    quantize_scheme: str = 'per-dim',
+    pq_subvectors: int = 48,
+    batch_size: int = 32,
+    max_tokens_per_batch: int = 0,
+    workers: int = 1,
+    threads_per_worker: int = 0,
+    store_path: str | None = None,
+    chunk_size: int = 50000,
+    lexical_path: str | None = None
 ):
-    """Generate embeddings for all notes."""
-
-    # Load notes
-    notes = load_notes(input_path)
-    if not notes:
-        print("No notes to process")
-        # Create empty output
-        np.savez(output_path, ids=np.array([]), vectors=np.array([]))
-        return
-
-    print(f"Loaded {len(notes)} notes")
-
-    # Load model
-    print(f"Loading model: {model_name}")
-    model = SentenceTransformer(model_name)
+    """Generate embeddings for all notes, streaming the notes file in chunks."""
 
-    # Prepare texts
-    texts = []
     ids = []
-    for note in notes:
-        cleaned = clean_content(note['content'])
-        if len(cleaned) > 10:  # Skip very short content
-            texts.append(cleaned)
-            ids.append(note['id'])
+    hashes = []
+    metadata = []
+    parts = []
+    seen = 0
+    reused = recomputed = 0
+    store = EmbeddingStore(store_path, model_name) if store_path else None
+    lexical = LexicalIndexBuilder() if lexical_path else None
 
-    print(f"Processing {len(texts)} notes with valid content")
+    print("Generating embeddings...")
+    try:
+        with make_encoder(model_name, batch_size, max_tokens_per_batch, workers, threads_per_worker) as encoder:
+            for chunk_ids, chunk_texts, chunk_metadata in iter_note_texts(input_path, chunk_size):
+                seen += len(chunk_ids)
+                if store is not None:
+                    chunk_reused, chunk_recomputed = embed_incremental(
+                        store, model_name, chunk_ids, chunk_texts, encoder, chunk_metadata
+                    )
+                    reused += chunk_reused
+                    recomputed += chunk_recomputed
+                else:
+                    ids.extend(chunk_ids)
+                    hashes.extend(content_hash(model_name, text) for text in chunk_texts)
+                    metadata.extend(chunk_metadata)
+                    parts.append(encoder.encode(chunk_texts))
+                    if lexical is not None:
+                        lexical.add_many(chunk_ids, chunk_texts)
+                print(f"  Processed {seen} notes with valid content...")
+
+        if store is not None:
+            # Output covers the whole stored corpus, not just this run's input
+            ids, hashes, embeddings = store.export()
+            metadata = store.export_metadata()
+            print(f"Embedding store: {recomputed} recomputed, {reused} reused, {len(ids)} total")
+            if lexical is not None:
+                for event_id, text in store.iter_texts():
+                    lexical.add(event_id, text)
+        else:
+            embeddings = np.concatenate(parts) if parts else None
+    finally:
+        if store is not None:
+            store.close()
 
-    if not texts:
+    if not ids:
         print("No valid content to embed")
         np.savez(output_path, ids=np.array([]), vectors=np.array([]))
         return
 
-    # Generate embeddings in batches
-    print("Generating embeddings...")
-    embeddings = model.encode(
-        texts,
-        batch_size=batch_size,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-        normalize_embeddings=True  # L2 normalize for cosine similarity
-    )
-
     print(f"Generated {len(embeddings)} embeddings with shape {embeddings.shape}")
+    columns = NoteMetadata.from_notes(metadata).fields()
+
+    if lexical is not None:
+        stats = lexical.write(lexical_path)
+        print(f"Lexical index: {stats['docs']} docs, {stats['terms']} terms, {stats['postings']} postings, "
+              f"{stats['bytes']:,} bytes -> {lexical_path}")
 
-    # Quantize if requested
-    if quantize == 'int8':
-        print("Quantizing to int8...")
-        quantized, vmin, scale = quantize_int8(embeddings)
+    # Quantize if requested; compact tiers keep int8 rows for re-ranking
+    if quantize == 'int8' or quantize in COMPACT_TYPES:
+        print(f"Quantizing to int8 ({quantize_scheme})...")
+        quantized, vmin, scale = quantize_int8(embeddings, quantize_scheme)
+        compact = {}
+        if quantize in COMPACT_TYPES:
+            print(f"Encoding {quantize} codes...")
+            compact = fit_compact(quantize, embeddings, pq_subvectors).fields()
         np.savez(
             output_path,
             ids=np.array(ids),
-            vectors=quantized,
-            quantize_min=vmin,
-            quantize_scale=scale,
-            quantize_type='int8',
+            content_hashes=hash_prefixes(hashes),
+            **quantization_fields(quantized, vmin, scale, quantize_scheme),
+            **compact,
+            **columns,
             model=model_name,
             dimensions=embeddings.shape[1]
         )
@@ -125,12 +382,17 @@ def generate_embeddings(
         original_size = embeddings.nbytes
         quantized_size = quantized.nbytes
         print(f"Quantization: {original_size:,} bytes -> {quantized_size:,} bytes ({quantized_size/original_size:.1%})")
+        if compact:
+            codes = compact["binary_codes" if quantize == 'binary' else "pq_codes"]
+            print(f"{quantize} codes: {codes.nbytes:,} bytes ({codes.shape[1]} bytes per vector)")
     else:
         np.savez(
             output_path,
             ids=np.array(ids),
+            content_hashes=hash_prefixes(hashes),
             vectors=embeddings,
             quantize_type='float32',
+            **columns,
             model=model_name,
             dimensions=embeddings.shape[1]
         )
@@ -140,13 +402,31 @@ def generate_embeddings(
 
 def main():
     parser = argparse.ArgumentParser(description='Generate embeddings for Nostr notes')
-    parser.add_argument('--input', required=True, help='Input JSON file with notes')
+    parser.add_argument('--input', required=True,
+                        help='Input NDJSON notes file (.gz/.zst compressed or legacy JSON array)')
     parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2',
                         help='Sentence transformer model name')
     parser.add_argument('--output', required=True, help='Output NPZ file path')
-    parser.add_argument('--quantize', choices=['none', 'int8'], default='none',
-                        help='Quantization type')
+    parser.add_argument('--quantize', choices=['none', 'int8', *COMPACT_TYPES], default='none',
+                        help='Quantization type; binary and pq also write int8 vectors for re-ranking')
+    parser.add_argument('--quantize-scheme', choices=SCHEMES, default='per-dim',
+                        help='int8 scales: one global min/scale, per dimension, or symmetric per vector')
+    parser.add_argument('--pq-subvectors', type=int, default=48,
+                        help='Product quantization subvectors, i.e. bytes per vector (must divide dimensions)')
     parser.add_argument('--batch-size', type=int, default=32, help='Batch size for encoding')
+    parser.add_argument('--max-tokens-per-batch', type=int, default=0,
+                        help='Sort texts by token length and cap each batch at this many padded '
+                             'tokens instead of a fixed --batch-size (0 = fixed batches)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Shard notes across this many processes (one model copy each)')
+    parser.add_argument('--threads-per-worker', type=int, default=0,
+                        help='torch threads per worker process (0 = cores / workers)')
+    parser.add_argument('--store', help='SQLite embedding store: reuse vectors for unchanged notes '
+                                        'and write every stored vector to --output')
+    parser.add_argument('--chunk-size', type=int, default=50000,
+                        help='Notes read from --input and encoded per chunk (bounds text memory)')
+    parser.add_argument('--lexical-output',
+                        help='Also write a BM25 inverted index (lexical.bin) over the cleaned note text')
 
     args = parser.parse_args()
 
@@ -155,7 +435,15 @@ def main():
         model_name=args.model,
         output_path=args.output,
         quantize=args.quantize,
-        batch_size=args.batch_size
+        quantize_scheme=args.quantize_scheme,
+        pq_subvectors=args.pq_subvectors,
+        batch_size=args.batch_size,
+        max_tokens_per_batch=args.max_tokens_per_batch,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        store_path=args.store,
+        chunk_size=args.chunk_size,
+        lexical_path=args.lexical_output
     )
 
 
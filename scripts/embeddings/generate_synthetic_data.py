@@ -12,6 +12,9 @@ import requests
 import numpy as np
 from pathlib import Path
 
+from label_mapping import LabelMapping, describe_mapping, write_mapping
+from label_table import id_bytes
+
 # Configuration
 EMBEDDING_API_URL = "https://embedding-api-617806532906.us-central1.run.app"
 RELAY_URL = "wss://nostr-relay-617806532906.us-central1.run.app"
@@ -123,13 +126,41 @@ def get_embedding(text: str) -> list:
         return None
 
 
+def get_embeddings_stream(items: list[tuple[str, str]]) -> dict[str, list]:
+    """Embed (event_id, text) pairs over one /embed/stream connection."""
+    def body():
+        for event_id, text in items:
+            yield (json.dumps({"id": event_id, "text": text}) + "\n").encode()
+
+    vectors = {}
+    try:
+        with requests.post(
+            f"{EMBEDDING_API_URL}/embed/stream",
+            data=body(),
+            headers={"Content-Type": "application/x-ndjson"},
+            stream=True,
+            timeout=300
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                result = json.loads(line)
+                if "embedding" in result:
+                    vectors[result["id"]] = result["embedding"]
+                else:
+                    print(f"Embedding API error for {result.get('id')}: {result.get('error')}")
+    except Exception as e:
+        print(f"Embedding API error: {e}")
+    return vectors
+
+
 def generate_synthetic_data():
     """Generate synthetic channels and posts."""
     OUTPUT_DIR.mkdir(exist_ok=True)
 
     events = []
-    embeddings = []
-    event_ids = []
+    to_embed = []
 
     # Generate user keypairs
     users = [generate_keypair() for _ in range(20)]
@@ -178,14 +209,9 @@ def generate_synthetic_data():
                 tags=[["e", channel_id, "", "root"]]
             )
             events.append(post_event)
-
-            # Get embedding for this post
-            embedding = get_embedding(message)
-            if embedding:
-                embeddings.append(embedding)
-                event_ids.append(post_event["id"])
-                post_count += 1
-                print(f"Created post {post_count}: {message[:50]}...")
+            to_embed.append((post_event["id"], message))
+            post_count += 1
+            print(f"Created post {post_count}: {message[:50]}...")
 
     # Also create some regular notes (kind 1)
     extra_notes = [
@@ -208,13 +234,15 @@ def generate_synthetic_data():
             tags=[]
         )
         events.append(note_event)
+        to_embed.append((note_event["id"], note))
+        post_count += 1
+        print(f"Created note {post_count}: {note[:50]}...")
 
-        embedding = get_embedding(note)
-        if embedding:
-            embeddings.append(embedding)
-            event_ids.append(note_event["id"])
-            post_count += 1
-            print(f"Created note {post_count}: {note[:50]}...")
+    # Embed every post and note over a single streaming connection
+    print(f"\nEmbedding {len(to_embed)} texts via /embed/stream...")
+    vectors = get_embeddings_stream(to_embed)
+    event_ids = [event_id for event_id, _ in to_embed if event_id in vectors]
+    embeddings = [vectors[event_id] for event_id in event_ids]
 
     # Save events
     events_path = OUTPUT_DIR / "synthetic_events.json"
@@ -270,13 +298,9 @@ def build_hnsw_index(embeddings_path: Path):
     index.save_index(str(index_path))
     print(f"Saved HNSW index to {index_path}")
 
-    # Save mapping as JSON
-    mapping_path = OUTPUT_DIR / "index_mapping.json"
-    with open(mapping_path, 'w') as f:
-        json.dump({
-            'labels': labels.tolist(),
-            'ids': ids.tolist()
-        }, f)
+    # Save compact binary mapping (label L -> 32-byte id at a fixed offset)
+    mapping_path = OUTPUT_DIR / "index_mapping.bin"
+    write_mapping(str(mapping_path), id_bytes(ids), sorted_index=False)
     print(f"Saved label mapping to {mapping_path}")
 
     # Create manifest
@@ -289,9 +313,10 @@ def build_hnsw_index(embeddings_path: Path):
         "quantize_type": "float32",
         "index_size_bytes": index_path.stat().st_size,
         "embeddings_size_bytes": embeddings_path.stat().st_size,
+        **describe_mapping(str(mapping_path)),
         "latest": {
             "index": "latest/index.bin",
-            "index_mapping": "latest/index_mapping.json",
+            "index_mapping": "latest/index_mapping.bin",
             "embeddings": "latest/embeddings.npz",
             "manifest": "latest/manifest.json"
         }
@@ -321,7 +346,7 @@ def test_search(query: str):
 
     # Load index
     index_path = OUTPUT_DIR / "index.bin"
-    mapping_path = OUTPUT_DIR / "index_mapping.json"
+    mapping_path = OUTPUT_DIR / "index_mapping.bin"
 
     if not index_path.exists():
         print("Index not found")
@@ -331,8 +356,7 @@ def test_search(query: str):
     index.load_index(str(index_path))
     index.set_ef(50)
 
-    with open(mapping_path) as f:
-        mapping = json.load(f)
+    mapping = LabelMapping(str(mapping_path))
 
     # Search
     query_vector = np.array([embedding], dtype=np.float32)
@@ -347,7 +371,7 @@ def test_search(query: str):
         events = {e["id"]: e for e in json.load(f)}
 
     for i, (label, distance) in enumerate(zip(labels[0], distances[0])):
-        event_id = mapping['ids'][label]
+        event_id = mapping.event_id(int(label))
         event = events.get(event_id, {})
         score = 1 - distance
         content = event.get('content', 'N/A')[:80]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compact binary label -> event id mapping (index_mapping.bin).
+
+Replaces index_mapping.json, whose parallel lists of labels and hex strings
+had to be parsed in full before any search hit could be resolved. Layout,
+all little-endian:
+
+    header   32 bytes  magic "NBLM", u16 version, u16 flags, u32 labels,
+                       u32 live, u64 ids offset, u64 sorted offset (0 = none)
+    ids      labels x 32 bytes   raw event id for label L at ids_offset + 32 * L,
+                                 all zeros for a free label
+    sorted   live x 36 bytes     (32-byte id, u32 label) sorted by id, for
+                                 id -> label lookup by binary search
+
+Any label resolves with one 32-byte read, so the file can be memory-mapped
+or fetched piecewise with HTTP range requests.
+"""
+
+import bisect
+import hashlib
+import struct
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b'NBLM'
+VERSION = 1
+FLAG_SORTED = 1
+HEADER = struct.Struct('<4sHHIIQQ')
+ID_BYTES = 32
+SORTED_DTYPE = np.dtype([('id', 'V32'), ('label', '<u4')])
+
+
+def write_mapping(path: str, ids: np.ndarray, live: np.ndarray | None = None, sorted_index: bool = True):
+    """Write (labels, 32) uint8 ids; rows where live is False are written as free."""
+    ids = np.ascontiguousarray(ids, dtype=np.uint8).reshape(-1, ID_BYTES)
+    live = np.ones(len(ids), dtype=bool) if live is None else np.asarray(live, dtype=bool)
+    ids = np.where(live[:, None], ids, 0).astype(np.uint8)
+    live_labels = np.flatnonzero(live)
+
+    ids_offset = HEADER.size
+    sorted_offset = ids_offset + ids.nbytes if sorted_index else 0
+    header = HEADER.pack(MAGIC, VERSION, FLAG_SORTED if sorted_index else 0,
+                         len(ids), len(live_labels), ids_offset, sorted_offset)
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(ids.tobytes())
+        if sorted_index:
+            # Byte-wise sort order of the raw ids (same as hex string order)
+            keys = ids[live_labels].view('S32').ravel()
+            order = live_labels[np.argsort(keys, kind='stable')]
+            entries = np.empty(len(order), dtype=SORTED_DTYPE)
+            entries['id'] = ids[order].view('V32').ravel()
+            entries['label'] = order
+            f.write(entries.tobytes())
+
+
+def describe_mapping(path: str) -> dict:
+    """Manifest fields for a mapping file: size, SHA-256 and format."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return {
+        "index_mapping_size_bytes": Path(path).stat().st_size,
+        "index_mapping_sha256": digest.hexdigest(),
+        "index_mapping_format": f"nblm-{VERSION}"
+    }
+
+
+class _SortedIds:
+    """Sequence view of the sorted section's ids, for bisect."""
+
+    def __init__(self, entries: np.ndarray):
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.entries[i]['id'].tobytes()
+
+
+class LabelMapping:
+    """Memory-mapped reader for index_mapping.bin."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        magic, version, flags, count, live, ids_offset, sorted_offset = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} label mapping")
+
+        self.count = count
+        self.live = live
+        self.ids = np.memmap(path, dtype=np.uint8, mode='r', offset=ids_offset, shape=(count, ID_BYTES)) \
+            if count else np.zeros((0, ID_BYTES), dtype=np.uint8)
+        self.sorted = None
+        if flags & FLAG_SORTED:
+            self.sorted = np.memmap(path, dtype=SORTED_DTYPE, mode='r', offset=sorted_offset, shape=(live,)) \
+                if live else np.zeros(0, dtype=SORTED_DTYPE)
+
+    def __len__(self) -> int:
+        return self.live
+
+    def event_id(self, label: int) -> str | None:
+        """Hex event id for a label, or None if it is free or out of range."""
+        if not 0 <= label < self.count:
+            return None
+        row = self.ids[label]
+        return row.tobytes().hex() if row.any() else None
+
+    def event_ids(self, labels) -> list[str | None]:
+        return [self.event_id(int(label)) for label in labels]
+
+    def label_of(self, event_id: str) -> int | None:
+        """Label for a hex event id via the sorted index, or None."""
+        if self.sorted is None:
+            raise ValueError("mapping was written without a sorted index")
+        key = bytes.fromhex(event_id)
+        i = bisect.bisect_left(_SortedIds(self.sorted), key)
+        if i < self.live and self.sorted[i]['id'].tobytes() == key:
+            return int(self.sorted[i]['label'])
+        return None
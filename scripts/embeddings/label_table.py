@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Persistent HNSW label <-> event id table for incremental index builds.
+
+Row `label` holds the raw 32-byte event id for that HNSW label, the content
+fingerprint of the vector stored under it, and whether it is live. Labels of
+deleted notes stay in the table as free slots; they are handed out again
+before new labels so the label space stays dense. An in-memory dict gives
+the reverse id -> label lookup.
+"""
+
+import numpy as np
+
+from label_mapping import ID_BYTES
+
+
+def id_bytes(event_ids) -> np.ndarray:
+    """Hex event ids -> (n, 32) uint8 array."""
+    raw = b''.join(bytes.fromhex(event_id) for event_id in event_ids)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, ID_BYTES)
+
+
+class LabelTable:
+    """Bidirectional label <-> event id table with a free list."""
+
+    def __init__(self, ids: np.ndarray | None = None, fingerprints: np.ndarray | None = None,
+                 live: np.ndarray | None = None):
+        self.ids = ids if ids is not None else np.zeros((0, ID_BYTES), dtype=np.uint8)
+        self.fingerprints = fingerprints if fingerprints is not None else np.zeros(0, dtype=np.uint64)
+        self.live = live if live is not None else np.zeros(0, dtype=bool)
+        self.labels = {self.ids[label].tobytes(): int(label) for label in np.flatnonzero(self.live)}
+        # Popped from the end, so lowest free label first
+        self.free = np.flatnonzero(~self.live)[::-1].tolist()
+
+    @classmethod
+    def load(cls, path: str) -> 'LabelTable':
+        data = np.load(path)
+        return cls(data['ids'].copy(), data['fingerprints'].copy(), data['live'].copy())
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, ids=self.ids, fingerprints=self.fingerprints, live=self.live)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def size(self) -> int:
+        """Labels in use or free; the index must hold at least this many elements."""
+        return len(self.ids)
+
+    def label_of(self, event_id: str) -> int | None:
+        return self.labels.get(bytes.fromhex(event_id))
+
+    def event_id(self, label: int) -> str:
+        return self.ids[label].tobytes().hex()
+
+    def live_labels(self) -> np.ndarray:
+        return np.flatnonzero(self.live)
+
+    def assign(self, event_ids: list[str], fingerprints: np.ndarray) -> np.ndarray:
+        """Give new event ids labels, reusing free ones first."""
+        raw = id_bytes(event_ids)
+        reused = [self.free.pop() for _ in range(min(len(self.free), len(event_ids)))]
+        appended = len(event_ids) - len(reused)
+        labels = np.array(reused + list(range(self.size, self.size + appended)), dtype=np.int64)
+
+        if appended:
+            self.ids = np.concatenate([self.ids, np.zeros((appended, ID_BYTES), dtype=np.uint8)])
+            self.fingerprints = np.concatenate([self.fingerprints, np.zeros(appended, dtype=np.uint64)])
+            self.live = np.concatenate([self.live, np.zeros(appended, dtype=bool)])
+
+        self.ids[labels] = raw
+        self.fingerprints[labels] = fingerprints
+        self.live[labels] = True
+        for label, row in zip(labels.tolist(), raw):
+            self.labels[row.tobytes()] = label
+        return labels
+
+    def update(self, labels: np.ndarray, fingerprints: np.ndarray):
+        self.fingerprints[labels] = fingerprints
+
+    def release(self, labels: np.ndarray):
+        """Free labels of deleted notes for reuse."""
+        for label in labels.tolist():
+            del self.labels[self.ids[label].tobytes()]
+            self.free.append(label)
+        self.ids[labels] = 0
+        self.live[labels] = False
+        self.free.sort(reverse=True)
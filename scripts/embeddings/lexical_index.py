@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+BM25 inverted index over cleaned note text (lexical.bin).
+
+MiniLM embeddings blur exact terms such as names, hashtags and channel
+slugs; a lexical index over the same clean_content text catches them, and
+fused ranking combines both. Layout, all little-endian:
+
+    header    80 bytes  magic "NBLX", u16 version, u16 flags, u32 docs,
+                        u32 terms, f32 average doc length, f32 k1, f32 b,
+                        4 reserved bytes, u64 offsets of the sections below
+    ids       docs x 32 bytes      raw event id per doc number
+    lengths   docs x u16           tokens per doc (clipped at 65535)
+    vocab     (terms + 1) x u32    byte offsets into the term blob, then the
+                                   UTF-8 terms in byte order (binary search)
+    df        terms x u32          documents containing each term
+    postings  (terms + 1) x u64    byte offsets into the postings blob, then
+                                   per term varint (doc gap, tf) pairs with
+                                   doc numbers ascending
+
+Every section is fixed-width or offset-addressed, so the file is used
+through one read-only memory map and a query only touches its own terms'
+postings. The index has its own id table; doc numbers are not vector labels,
+and fusion joins the two rankings on event id.
+"""
+
+import bisect
+import re
+import struct
+from array import array
+from collections import Counter
+
+import numpy as np
+
+MAGIC = b'NBLX'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIfff4x6Q')
+ID_BYTES = 32
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+
+TOKEN = re.compile(r"\w+(?:-\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens; hyphenated slugs index whole and by part."""
+    tokens = []
+    for token in TOKEN.findall(text.casefold()):
+        tokens.append(token)
+        if '-' in token:
+            tokens.extend(token.split('-'))
+    return tokens
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """LEB128 varints (7 bits per byte, high bit = more follows) as uint8."""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for bits in (7, 14, 21, 28, 35):
+        sizes += values >= (1 << bits)
+    owner = np.repeat(np.arange(len(values)), sizes)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    out = (values[owner] >> (7 * position).astype(np.uint64)) & 0x7F
+    out |= (position < sizes[owner] - 1).astype(np.uint64) << 7
+    return out.astype(np.uint8)
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse of encode_varints."""
+    data = np.asarray(data, dtype=np.uint8)
+    last = data < 0x80
+    group = np.concatenate(([0], np.cumsum(last)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    position = np.arange(len(data)) - starts[group]
+    weights = (data & 0x7F).astype(np.float64) * np.exp2(7.0 * position)
+    return np.bincount(group, weights=weights, minlength=len(starts)).astype(np.int64)
+
+
+class LexicalIndexBuilder:
+    """Accumulates (event id, text) docs and writes lexical.bin."""
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self.vocab: dict[str, int] = {}
+        self.lengths = array('I')
+        self.terms = array('I')
+        self.docs = array('I')
+        self.tfs = array('I')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, event_id: str, text: str):
+        tokens = tokenize(text)
+        doc = len(self.ids)
+        self.ids.append(event_id)
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.terms.append(self.vocab.setdefault(term, len(self.vocab)))
+            self.docs.append(doc)
+            self.tfs.append(tf)
+
+    def add_many(self, ids, texts):
+        for event_id, text in zip(ids, texts):
+            self.add(event_id, text)
+
+    def write(self, path: str, k1: float = K1, b: float = B) -> dict:
+        """Write the index; returns size stats."""
+        words = sorted(self.vocab, key=lambda word: word.encode('utf-8'))
+        rank = np.empty(len(words), dtype=np.int64)
+        rank[[self.vocab[word] for word in words]] = np.arange(len(words))
+
+        terms = rank[np.frombuffer(self.terms, dtype=np.uint32)] if self.terms else np.zeros(0, np.int64)
+        docs = np.frombuffer(self.docs, dtype=np.uint32).astype(np.int64)
+        tfs = np.frombuffer(self.tfs, dtype=np.uint32).astype(np.int64)
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+        # Gap to the previous posting of the same term; the first gap is the doc number
+        gaps = np.diff(docs, prepend=0)
+        first = np.concatenate(([True], terms[1:] != terms[:-1])) if len(terms) else np.zeros(0, bool)
+        gaps[first] = docs[first]
+        pairs = np.empty(2 * len(docs), dtype=np.int64)
+        pairs[0::2], pairs[1::2] = gaps, tfs
+        postings = encode_varints(pairs)
+
+        pair_bytes = (postings < 0x80).nonzero()[0]
+        ends = pair_bytes[1::2] + 1 if len(pair_bytes) else np.zeros(0, np.int64)
+        df = np.bincount(terms, minlength=len(words)).astype('<u4')
+        posting_offsets = np.zeros(len(words) + 1, dtype='<u8')
+        posting_offsets[1:] = np.concatenate(([0], ends))[np.cumsum(df)]
+
+        encoded = [word.encode('utf-8') for word in words]
+        vocab_offsets = np.zeros(len(words) + 1, dtype='<u4')
+        vocab_offsets[1:] = np.cumsum([len(word) for word in encoded])
+        ids = np.frombuffer(b''.join(bytes.fromhex(event_id) for event_id in self.ids), dtype=np.uint8)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+
+        sections = [
+            ids.tobytes(),
+            np.minimum(lengths, 0xFFFF).astype('<u2').tobytes(),
+            vocab_offsets.tobytes() + b''.join(encoded),
+            df.tobytes(),
+            posting_offsets.tobytes(),
+            postings.tobytes(),
+        ]
+        offsets, position = [], HEADER.size
+        for section in sections:
+            # 8-byte alignment keeps every array section mappable in place
+            position += -position % 8
+            offsets.append(position)
+            position += len(section)
+
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(self.ids), len(words), avg_length, k1, b, *offsets))
+            for offset, section in zip(offsets, sections):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(section)
+
+        return {"docs": len(self.ids), "terms": len(words), "postings": len(docs),
+                "postings_bytes": len(postings), "bytes": position}
+
+
+class _Terms:
+    """Sequence view of the vocab blob, for bisect."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class LexicalIndex:
+    """Memory-mapped BM25 reader for lexical.bin."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        magic, version, flags, docs, terms, avg_length, k1, b, *offsets = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} lexical index")
+        ids_at, lengths_at, vocab_at, df_at, postings_at, blob_at = offsets
+
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.docs, self.k1, self.b = docs, k1, b
+        self.avg_length = avg_length or 1.0
+        self.ids = data[ids_at:ids_at + docs * ID_BYTES].reshape(docs, ID_BYTES)
+        self.lengths = data[lengths_at:lengths_at + 2 * docs].view('<u2')
+        vocab_offsets = data[vocab_at:vocab_at + 4 * (terms + 1)].view('<u4')
+        self.terms = _Terms(vocab_offsets, data[vocab_at + vocab_offsets.nbytes:])
+        self.df = data[df_at:df_at + 4 * terms].view('<u4')
+        self.posting_offsets = data[postings_at:postings_at + 8 * (terms + 1)].view('<u8')
+        self.postings = data[blob_at:]
+
+    def __len__(self) -> int:
+        return self.docs
+
+    def term_id(self, term: str) -> int | None:
+        key = term.encode('utf-8')
+        i = bisect.bisect_left(self.terms, key)
+        return i if i < len(self.terms) and self.terms[i] == key else None
+
+    def postings_for(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """(doc numbers, term frequencies) for one term."""
+        start, end = self.posting_offsets[term_id], self.posting_offsets[term_id + 1]
+        pairs = decode_varints(self.postings[start:end])
+        return np.cumsum(pairs[0::2]), pairs[1::2]
+
+    def event_id(self, doc: int) -> str:
+        return self.ids[doc].tobytes().hex()
+
+    def search(self, query: str, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k doc numbers and BM25 scores, best first."""
+        hits, contributions = [], []
+        for term in set(tokenize(query)):
+            term_id = self.term_id(term)
+            if term_id is None:
+                continue
+            docs, tfs = self.postings_for(term_id)
+            df = float(self.df[term_id])
+            idf = np.log1p((self.docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / self.avg_length)
+            hits.append(docs)
+            contributions.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        if not hits:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        docs, slots = np.unique(np.concatenate(hits), return_inverse=True)
+        scores = np.bincount(slots, weights=np.concatenate(contributions)).astype(np.float32)
+        k = min(k, len(docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return docs[top], scores[top]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuse ranked id lists by sum of 1 / (k + rank); best first."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, event_id in enumerate(ranking):
+            scores[event_id] = scores.get(event_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def weighted_fusion(results: list[dict[str, float]], weights: list[float]) -> list[tuple[str, float]]:
+    """Fuse {id: score} maps by weighted sum of per-list min-max normalized scores; best first."""
+    scores: dict[str, float] = {}
+    for result, weight in zip(results, weights):
+        if not result:
+            continue
+        low, high = min(result.values()), max(result.values())
+        span = high - low or 1.0
+        for event_id, score in result.items():
+            scores[event_id] = scores.get(event_id, 0.0) + weight * (score - low) / span
+    return sorted(scores.items(), key=lambda item: -item[1])
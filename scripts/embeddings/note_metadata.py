@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Per-note metadata columns for filtered search.
+
+Each embedded note keeps its kind, author pubkey, created_at and channel
+(the root "e" tag of a kind 42 channel message, NIP-28) as columnar arrays,
+so a filter is a few vectorized comparisons rather than a scan of note JSON.
+Pubkeys and channels are dictionary-encoded: a (n,) int32 code per note
+into a (distinct, 32) uint8 table of raw ids, -1 for none.
+
+In embeddings.npz the columns are row-aligned with ids under meta_* keys.
+build_index.py keeps them by label in <index>_metadata.npz (unprefixed keys),
+carried across incremental runs like the label table; free labels and notes
+with unknown metadata have kind 0, created_at 0 and codes -1.
+"""
+
+import numpy as np
+
+from label_table import id_bytes
+
+CHANNEL_MESSAGE = 42
+DELETION = 5
+FIELDS = ('kinds', 'created_at', 'pubkey_codes', 'pubkeys', 'channel_codes', 'channels')
+
+
+def channel_of(note: dict) -> str | None:
+    """Channel id of a kind 42 message: the "e" tag marked root, else the first "e" tag."""
+    if note.get('kind') != CHANNEL_MESSAGE:
+        return None
+    e_tags = [tag for tag in note.get('tags') or [] if len(tag) > 1 and tag[0] == 'e']
+    for tag in e_tags:
+        if len(tag) > 3 and tag[3] == 'root':
+            return tag[1]
+    return e_tags[0][1] if e_tags else None
+
+
+def note_metadata(note: dict) -> tuple[int, str, int, str | None]:
+    """(kind, pubkey, created_at, channel) for one note."""
+    return int(note.get('kind', 0)), note.get('pubkey', ''), int(note.get('created_at', 0)), channel_of(note)
+
+
+def _encode(values: list[str | None]) -> tuple[np.ndarray, np.ndarray]:
+    """Dictionary-encode hex ids: (codes, table), code -1 for missing or malformed ids."""
+    table, codes = {}, np.full(len(values), -1, dtype=np.int32)
+    for i, value in enumerate(values):
+        if value and len(value) == 64:
+            codes[i] = table.setdefault(value, len(table))
+    return codes, id_bytes(list(table)) if table else np.zeros((0, 32), dtype=np.uint8)
+
+
+class NoteMetadata:
+    """Columnar kind / created_at / pubkey / channel arrays, one row per vector."""
+
+    def __init__(self, kinds: np.ndarray, created_at: np.ndarray, pubkey_codes: np.ndarray, pubkeys: np.ndarray,
+                 channel_codes: np.ndarray, channels: np.ndarray):
+        self.kinds = kinds.astype(np.uint16)
+        self.created_at = created_at.astype(np.uint32)
+        self.pubkey_codes = pubkey_codes.astype(np.int32)
+        self.pubkeys = pubkeys.astype(np.uint8).reshape(-1, 32)
+        self.channel_codes = channel_codes.astype(np.int32)
+        self.channels = channels.astype(np.uint8).reshape(-1, 32)
+
+    @classmethod
+    def from_notes(cls, metadata: list[tuple[int, str, int, str | None]]) -> 'NoteMetadata':
+        """Build from note_metadata() tuples."""
+        kinds, pubkeys, created_at, channels = zip(*metadata) if metadata else ((), (), (), ())
+        pubkey_codes, pubkey_table = _encode(list(pubkeys))
+        channel_codes, channel_table = _encode(list(channels))
+        return cls(np.array(kinds, dtype=np.uint16), np.clip(np.array(created_at, dtype=np.int64), 0, 2**32 - 1),
+                   pubkey_codes, pubkey_table, channel_codes, channel_table)
+
+    @classmethod
+    def from_npz(cls, data, prefix: str = 'meta_') -> 'NoteMetadata | None':
+        if f'{prefix}kinds' not in data.files:
+            return None
+        return cls(*(data[f'{prefix}{name}'] for name in FIELDS))
+
+    @classmethod
+    def load(cls, path: str) -> 'NoteMetadata':
+        return cls.from_npz(np.load(path), prefix='')
+
+    def fields(self, prefix: str = 'meta_') -> dict:
+        return {f'{prefix}{name}': getattr(self, name) for name in FIELDS}
+
+    def save(self, path: str):
+        np.savez(path, **self.fields(prefix=''))
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @classmethod
+    def empty(cls, size: int = 0) -> 'NoteMetadata':
+        """size rows with no metadata (kind 0, created_at 0, codes -1)."""
+        none = np.full(size, -1, dtype=np.int32)
+        return cls(np.zeros(size, np.uint16), np.zeros(size, np.uint32), none, np.zeros((0, 32), np.uint8),
+                   none.copy(), np.zeros((0, 32), np.uint8))
+
+    def resize(self, size: int):
+        """Grow (or shrink) to size rows; new rows are empty."""
+        extra = NoteMetadata.empty(max(size - len(self), 0))
+        self.kinds = np.concatenate([self.kinds[:size], extra.kinds])
+        self.created_at = np.concatenate([self.created_at[:size], extra.created_at])
+        self.pubkey_codes = np.concatenate([self.pubkey_codes[:size], extra.pubkey_codes])
+        self.channel_codes = np.concatenate([self.channel_codes[:size], extra.channel_codes])
+
+    def clear(self, rows: np.ndarray):
+        self.kinds[rows] = 0
+        self.created_at[rows] = 0
+        self.pubkey_codes[rows] = -1
+        self.channel_codes[rows] = -1
+
+    def set_rows(self, rows: np.ndarray, other: 'NoteMetadata', other_rows: np.ndarray):
+        """Copy other's other_rows into rows, re-coding pubkeys and channels into this table."""
+        self.kinds[rows] = other.kinds[other_rows]
+        self.created_at[rows] = other.created_at[other_rows]
+        self.pubkeys, pubkey_map = _merge(self.pubkeys, other.pubkeys)
+        self.channels, channel_map = _merge(self.channels, other.channels)
+        self.pubkey_codes[rows] = pubkey_map[other.pubkey_codes[other_rows]]
+        self.channel_codes[rows] = channel_map[other.channel_codes[other_rows]]
+
+
+def _merge(table: np.ndarray, other: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Append other's ids missing from table; returns (table, code map from other's codes).
+
+    The map has one extra trailing -1, so indexing it with code -1 keeps -1.
+    """
+    known = {row.tobytes(): code for code, row in enumerate(table)}
+    added = []
+    mapping = np.full(len(other) + 1, -1, dtype=np.int32)
+    for code, row in enumerate(other):
+        key = row.tobytes()
+        if key not in known:
+            known[key] = len(table) + len(added)
+            added.append(row)
+        mapping[code] = known[key]
+    if added:
+        table = np.concatenate([table, np.stack(added)])
+    return table, mapping
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Streaming NDJSON reader/writer for the notes interchange file.
+
+fetch_notes.py appends one JSON event per line as events arrive, and
+generate_embeddings.py / update_manifest.py consume them through a generator,
+so no stage ever holds the whole dump in memory. Compression is chosen by
+file extension: .gz (gzip) or .zst (zstandard). Legacy files holding a single
+JSON array are still readable.
+"""
+
+import gzip
+import io
+import json
+from typing import Iterator
+
+
+def _open_zstd(path: str, mode: str):
+    try:
+        import zstandard
+    except ImportError:
+        print("Installing zstandard...")
+        import subprocess
+        subprocess.check_call(['pip', 'install', 'zstandard'])
+        import zstandard
+
+    if 'w' in mode:
+        raw = open(path, 'wb')
+        stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    else:
+        raw = open(path, 'rb')
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def open_notes(path: str, mode: str = 'r'):
+    """Open a notes file for text I/O, compressing by extension."""
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    if path.endswith('.zst'):
+        return _open_zstd(path, mode)
+    return open(path, mode, encoding='utf-8')
+
+
+class NotesWriter:
+    """Append notes to an NDJSON file one line at a time."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open_notes(self.path, 'w')
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    def write(self, note: dict):
+        self.write_line(json.dumps(note, separators=(',', ':'), ensure_ascii=False))
+
+    def write_line(self, line: str):
+        """Append an already-serialized note."""
+        self._file.write(line)
+        self._file.write('\n')
+        self.count += 1
+
+
+def iter_notes(path: str) -> Iterator[dict]:
+    """Yield notes one at a time from an NDJSON (or legacy JSON array) file."""
+    with open_notes(path, 'r') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+
+        if first == '[':
+            # Legacy pretty-printed array: no way to stream it with the stdlib
+            yield from json.loads(first + f.read())
+            return
+
+        pending = first
+        for line in f:
+            line = pending + line
+            pending = ''
+            if line.strip():
+                yield json.loads(line)
+        if pending.strip():
+            yield json.loads(pending)
+
+
+def iter_note_batches(path: str, batch_size: int) -> Iterator[list[dict]]:
+    """Group notes from iter_notes into lists of at most batch_size."""
+    batch = []
+    for note in iter_notes(path):
+        batch.append(note)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+int8 quantization schemes for embeddings.npz.
+
+    global      one min/scale for the whole matrix (the original scheme; the
+                default when an npz has no quantize_scheme)
+    per-dim     min/scale per dimension, so one outlier dimension no longer
+                squeezes every other dimension into a few levels
+    per-vector  symmetric, scale = 127 / max|x| per row and no offset; the
+                scale cancels in cosine similarity, so int8 rows compare with
+                an int8 x int8 dot product and an int32 accumulator
+
+global and per-dim share x = (q + 128) / scale + min, with quantize_min and
+quantize_scale stored as scalars or (dims,) arrays. per-vector stores
+quantize_scale as an (n,) array of row scales and x = q / scale.
+"""
+
+import numpy as np
+
+SCHEMES = ('global', 'per-dim', 'per-vector')
+
+
+def quantize_int8(vectors: np.ndarray, scheme: str = 'per-dim') -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Quantize float32 vectors to int8 with rounding; returns (quantized, min, scale)."""
+    if scheme == 'per-vector':
+        peak = np.abs(vectors).max(axis=1)
+        scale = (127.0 / np.where(peak > 0, peak, 1.0)).astype(np.float32)
+        quantized = np.round(vectors * scale[:, None]).clip(-127, 127).astype(np.int8)
+        return quantized, np.zeros(len(vectors), dtype=np.float32), scale
+
+    if scheme == 'per-dim':
+        vmin, vmax = vectors.min(axis=0), vectors.max(axis=0)
+    elif scheme == 'global':
+        vmin, vmax = np.float32(vectors.min()), np.float32(vectors.max())
+    else:
+        raise ValueError(f"unknown quantization scheme {scheme!r}")
+
+    # Scale to 0-255 range, then shift to -128 to 127
+    scale = (255.0 / (vmax - vmin + 1e-8)).astype(np.float32)
+    quantized = (np.round((vectors - vmin) * scale) - 128).clip(-128, 127).astype(np.int8)
+    return quantized, np.asarray(vmin, dtype=np.float32), scale
+
+
+def dequantize_int8(quantized: np.ndarray, vmin, scale, scheme: str = 'global') -> np.ndarray:
+    """Dequantize int8 vectors back to float32; per-vector scales must match the rows given."""
+    if scheme == 'per-vector':
+        return quantized.astype(np.float32) / np.asarray(scale, dtype=np.float32)[:, None]
+    return ((quantized.astype(np.float32) + 128) / scale) + vmin
+
+
+def quantization_fields(quantized: np.ndarray, vmin, scale, scheme: str) -> dict:
+    """np.savez keyword arguments describing an int8 matrix."""
+    fields = {"vectors": quantized, "quantize_type": 'int8', "quantize_scheme": scheme,
+              "quantize_scale": scale}
+    if scheme != 'per-vector':
+        fields["quantize_min"] = vmin
+    return fields
+
+
+def scheme_of(data) -> str | None:
+    """Quantization scheme of a loaded embeddings npz, or None for float vectors."""
+    if str(data.get('quantize_type', 'float32')) != 'int8':
+        return None
+    return str(data['quantize_scheme']) if 'quantize_scheme' in data.files else 'global'
+
+
+def dequantize(data, vectors: np.ndarray | None = None, rows: np.ndarray | None = None) -> np.ndarray:
+    """Float32 vectors from an embeddings npz.
+
+    vectors defaults to data['vectors']; pass a slice of it with the row
+    numbers it came from (rows) so per-vector scales line up.
+    """
+    vectors = data['vectors'] if vectors is None else vectors
+    scheme = scheme_of(data)
+    if scheme is None:
+        return vectors.astype(np.float32)
+    scale = data['quantize_scale']
+    if scheme == 'per-vector':
+        return dequantize_int8(vectors, None, scale if rows is None else scale[rows], scheme)
+    return dequantize_int8(vectors, data['quantize_min'], scale, scheme)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Time-partitioned segment indexes (LSM layout).
+
+Instead of one index.bin that is loaded, grown and rewritten every night,
+each run writes the notes that are new or edited since the last run as a
+small immutable segment, and a compactor merges runs of small segments into
+larger ones, so nightly build cost and client downloads follow the delta
+rather than the corpus. A segments directory holds segments.json, listing
+the segments oldest first, and per segment:
+
+    <name>.bin               exact index (exact_search.py, per-vector int8) up
+                             to the exact threshold, HNSW above it
+    <name>_mapping.bin       label -> event id (label_mapping.py)
+    <name>_metadata.npz      filter columns by label (note_metadata.py)
+    <name>_labels.npz        label table with content fingerprints (builder
+                             state, not published)
+    <name>_deletes_<n>.npy   the n labels since superseded by an edit in a
+                             newer segment or pruned
+
+Names are L<level>-<first day>-<last day>-<id>, the days being the UTC
+created_at range of the segment's notes. All files but the deletes list are
+immutable; the deletes list is renamed whenever it grows, so a published
+name never changes content and clients fetch only names they have not seen.
+
+Levels are time tiers. Nightly deltas are level 0; with the default fanouts
+(7, 4, 3) compaction merges seven of them into a level 1 (weekly) segment,
+four of those into a level 2 (monthly) one and three of those into a level 3
+(quarterly) one, dropping deleted rows as it goes. A segment whose deleted
+share passes the compact threshold (deletions, moderation) is rewritten on
+its own at the same level. A first build or full rebuild splits the corpus
+by calendar month straight into level 2.
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from build_index import COMPACT_THRESHOLD, EXACT_THRESHOLD, hnswlib, vector_fingerprints
+from exact_search import ExactIndex
+from label_mapping import write_mapping
+from label_table import LabelTable, id_bytes
+from note_metadata import NoteMetadata
+from quantization import dequantize
+
+SEGMENTS_FILE = 'segments.json'
+FANOUTS = (7, 4, 3)
+BULK_LEVEL = 2
+# hnswlib 0.8 saveIndex header; level 0 holds each element's links, float32 vector and u64 label
+HNSW_HEADER_BYTES = 96
+
+
+def day(created_at: int) -> str:
+    return datetime.fromtimestamp(int(created_at), timezone.utc).strftime('%Y%m%d')
+
+
+def hnsw_vectors(path: str, dimensions: int) -> np.ndarray:
+    """Unit vectors of a saved hnswlib index by label, read from its level 0 block.
+
+    get_items copies through Python lists (~45 us a vector); this is a strided read.
+    """
+    header = np.fromfile(path, dtype='<u8', count=6)
+    _, max_elements, count, row_bytes, label_at, data_at = header.tolist()
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=HNSW_HEADER_BYTES, shape=(count, row_bytes))
+    labels = data[:, label_at:label_at + 8].view('<u8')[:, 0].astype(np.int64)
+    vectors = np.zeros((int(labels.max()) + 1 if count else 0, dimensions), dtype=np.float32)
+    vectors[labels] = data[:, data_at:data_at + 4 * dimensions].view('<f4')
+    return vectors
+
+
+class SegmentSet:
+    """segments.json plus the segment files next to it."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        path = self.root / SEGMENTS_FILE
+        state = json.loads(path.read_text()) if path.exists() else {}
+        self.segments: list[dict] = state.get('segments', [])
+        self.next_id: int = state.get('next_id', 1)
+        self.dimensions: int | None = state.get('dimensions')
+        self._tables: dict[str, LabelTable] = {}
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"{SEGMENTS_FILE}.tmp"
+        tmp.write_text(json.dumps({"next_id": self.next_id, "dimensions": self.dimensions,
+                                   "segments": self.segments}, indent=2))
+        os.replace(tmp, self.root / SEGMENTS_FILE)
+
+    @property
+    def live(self) -> int:
+        return sum(segment['live'] for segment in self.segments)
+
+    def path(self, segment: dict, key: str) -> Path:
+        return self.root / segment['files'][key]
+
+    def table(self, segment: dict) -> LabelTable:
+        if segment['name'] not in self._tables:
+            self._tables[segment['name']] = LabelTable.load(str(self.root / f"{segment['name']}_labels.npz"))
+        return self._tables[segment['name']]
+
+    def locate(self) -> dict[bytes, tuple[int, int]]:
+        """Raw event id -> (segment position, label) for every live note."""
+        located = {}
+        for position, segment in enumerate(self.segments):
+            for raw, label in self.table(segment).labels.items():
+                located[raw] = (position, label)
+        return located
+
+    def vectors(self, segment: dict) -> np.ndarray:
+        """Float vectors by label (unit length for HNSW, up to scale for exact segments)."""
+        path = str(self.path(segment, 'index'))
+        if segment['index_type'] == 'exact':
+            index = ExactIndex.load(path)
+            return index.vectors_for(np.arange(len(index.vectors)))
+        return hnsw_vectors(path, self.dimensions)
+
+    def write(self, ids: np.ndarray, fingerprints: np.ndarray, vectors: np.ndarray, metadata: NoteMetadata,
+              level: int, exact_threshold: int = EXACT_THRESHOLD, m: int = 16, ef_construction: int = 200,
+              ef: int = 50, threads: int = -1) -> dict:
+        """Write (n, 32) raw ids with their vectors as a new segment and list it; returns its record."""
+        self.dimensions = self.dimensions or vectors.shape[1]
+        created = metadata.created_at[metadata.kinds != 0]
+        first, last = (int(created.min()), int(created.max())) if len(created) else (0, 0)
+        name = f"L{level}-{day(first)}-{day(last)}-{self.next_id:06d}"
+        self.next_id += 1
+        labels = np.arange(len(ids))
+        files = {"index": f"{name}.bin", "mapping": f"{name}_mapping.bin", "metadata": f"{name}_metadata.npz"}
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        exact = len(ids) <= exact_threshold
+        if exact:
+            index = ExactIndex.empty(vectors.shape[1], 'per-vector')
+            index.set_rows(labels, vectors)
+            index.save(str(self.root / files['index']))
+        else:
+            index = hnswlib.Index(space='cosine', dim=vectors.shape[1])
+            index.init_index(max_elements=len(ids), M=m, ef_construction=ef_construction)
+            index.add_items(vectors, labels, num_threads=threads)
+            index.set_ef(ef)
+            index.save_index(str(self.root / files['index']))
+        write_mapping(str(self.root / files['mapping']), ids, sorted_index=False)
+        metadata.save(str(self.root / files['metadata']))
+        table = LabelTable(ids.copy(), fingerprints.astype(np.uint64), np.ones(len(ids), dtype=bool))
+        table.save(str(self.root / f"{name}_labels.npz"))
+        self._tables[name] = table
+
+        segment = {
+            "name": name,
+            "level": level,
+            "index_type": "exact" if exact else "hnsw",
+            "count": len(ids),
+            "live": len(ids),
+            "min_created_at": first,
+            "max_created_at": last,
+            "files": files,
+            "bytes": sum((self.root / f).stat().st_size for f in files.values()),
+        }
+        self.segments.append(segment)
+        return segment
+
+    def tombstone(self, segment: dict, labels: np.ndarray) -> int:
+        """Mark labels deleted and republish the segment's deletes list; returns the new deletes size."""
+        table = self.table(segment)
+        table.release(np.asarray(labels, dtype=np.int64))
+        table.save(str(self.root / f"{segment['name']}_labels.npz"))
+        deleted = np.flatnonzero(~table.live).astype('<u4')
+        if 'deletes' in segment['files']:
+            self.path(segment, 'deletes').unlink(missing_ok=True)
+        segment['files']['deletes'] = f"{segment['name']}_deletes_{len(deleted)}.npy"
+        np.save(self.path(segment, 'deletes'), deleted)
+        segment['live'] = len(table)
+        return self.path(segment, 'deletes').stat().st_size
+
+    def remove(self, segment: dict):
+        for name in list(segment['files'].values()) + [f"{segment['name']}_labels.npz"]:
+            (self.root / name).unlink(missing_ok=True)
+        self._tables.pop(segment['name'], None)
+        self.segments.remove(segment)
+
+    def merge(self, merging: list[dict], level: int, **options) -> dict:
+        """Rewrite segments' live rows as one segment at level, in their place in the list."""
+        ids, fingerprints, vectors, metadata = [], [], [], []
+        for segment in merging:
+            table = self.table(segment)
+            live = table.live_labels()
+            ids.append(table.ids[live])
+            fingerprints.append(table.fingerprints[live])
+            vectors.append(self.vectors(segment)[live])
+            metadata.append((NoteMetadata.load(str(self.path(segment, 'metadata'))), live))
+
+        total = sum(len(part) for part in ids)
+        merged = NoteMetadata.empty(total)
+        offset = 0
+        for columns, live in metadata:
+            merged.set_rows(np.arange(offset, offset + len(live)), columns, live)
+            offset += len(live)
+        vectors = np.concatenate(vectors)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        position = self.segments.index(merging[0])
+        segment = self.write(np.concatenate(ids), np.concatenate(fingerprints), vectors, merged, level, **options)
+        self.segments.insert(position, self.segments.pop())
+        for old in merging:
+            self.remove(old)
+        return segment
+
+    def compact(self, fanouts=FANOUTS, compact_threshold: float = COMPACT_THRESHOLD, **options) -> list[dict]:
+        """Merge the oldest fanouts[level] segments of each level a level up, then rewrite segments
+        with more than compact_threshold of their rows deleted; returns new segments."""
+        written = []
+        for level, fanout in enumerate(fanouts):
+            while True:
+                candidates = [segment for segment in self.segments if segment['level'] == level]
+                if len(candidates) < fanout:
+                    break
+                started = time.perf_counter()
+                segment = self.merge(candidates[:fanout], level + 1, **options)
+                print(f"Compacted {fanout} level {level} segments into {segment['name']} "
+                      f"({segment['count']} rows, {segment['index_type']}) in {time.perf_counter() - started:.1f}s")
+                written.append(segment)
+
+        for segment in list(self.segments):
+            deleted = segment['count'] - segment['live']
+            if deleted <= compact_threshold * segment['count']:
+                continue
+            if not segment['live']:
+                print(f"Dropped {segment['name']}: all {deleted} rows deleted")
+                self.remove(segment)
+                continue
+            rewritten = self.merge([segment], segment['level'], **options)
+            print(f"Rewrote {segment['name']} as {rewritten['name']} without its {deleted} deleted rows")
+            written.append(rewritten)
+        return written
+
+
+def published_segments(segments_dir: str, prefix: str = 'segments') -> list[dict]:
+    """Segment records for manifest.json, file names under prefix (the bucket folder)."""
+    published = []
+    for segment in SegmentSet(segments_dir).segments:
+        record = {key: value for key, value in segment.items() if key != 'files'}
+        record['files'] = {key: f"{prefix}/{name}" for key, name in segment['files'].items()}
+        published.append(record)
+    return published
+
+
+def update_segments(
+    embeddings_path: str,
+    segments_dir: str,
+    prune: bool = False,
+    **options
+) -> dict:
+    """Write new and edited notes as a segment, tombstoning the rows they replace; returns stats."""
+    data = np.load(embeddings_path, allow_pickle=True)
+    ids = data['ids']
+    vectors = data['vectors']
+    segments = SegmentSet(segments_dir)
+    stats = {"new": 0, "changed": 0, "deleted": 0, "segments": [], "deletes_bytes": 0}
+    if len(ids) == 0:
+        print("No embeddings to index")
+        return stats
+    if segments.dimensions and segments.dimensions != int(data['dimensions']):
+        raise ValueError(f"{segments_dir} holds {segments.dimensions}-dim segments; rebuild from scratch")
+
+    if 'content_hashes' in data.files:
+        fingerprints = data['content_hashes'].astype(np.uint64)
+    else:
+        fingerprints = vector_fingerprints(vectors)
+    metadata = NoteMetadata.from_npz(data)
+    if metadata is None:
+        metadata = NoteMetadata.empty(len(ids))
+
+    # Diff against the live rows of every segment (last occurrence of an id wins)
+    located = segments.locate()
+    rows_by_id = {str(event_id): row for row, event_id in enumerate(ids)}
+    rows = []
+    superseded: dict[int, list[int]] = {}
+    for event_id, row in rows_by_id.items():
+        found = located.pop(bytes.fromhex(event_id), None)
+        if found is None:
+            stats["new"] += 1
+        elif segments.table(segments.segments[found[0]]).fingerprints[found[1]] != fingerprints[row]:
+            stats["changed"] += 1
+            superseded.setdefault(found[0], []).append(found[1])
+        else:
+            continue
+        rows.append(row)
+    if prune:
+        for position, label in located.values():
+            superseded.setdefault(position, []).append(label)
+            stats["deleted"] += 1
+    print(f"{stats['new']} new, {stats['changed']} changed, {len(rows_by_id) - len(rows)} unchanged, "
+          f"{stats['deleted']} deleted across {len(segments.segments)} segments")
+
+    for position, labels in superseded.items():
+        stats["deletes_bytes"] += segments.tombstone(segments.segments[position], np.array(labels))
+
+    rows = np.array(sorted(rows), dtype=np.int64)
+    if len(rows):
+        vectors = dequantize(data, vectors[rows], rows)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        raw = id_bytes(str(event_id) for event_id in ids[rows])
+        delta = NoteMetadata.empty(len(rows))
+        delta.set_rows(np.arange(len(rows)), metadata, rows)
+        if segments.segments:
+            groups = [np.arange(len(rows))]
+            level = 0
+        else:
+            # First build: one segment per calendar month of created_at
+            months = delta.created_at.astype('datetime64[s]').astype('datetime64[M]')
+            groups = [np.flatnonzero(months == month) for month in np.unique(months)]
+            level = BULK_LEVEL
+        for group in groups:
+            columns = NoteMetadata.empty(len(group))
+            columns.set_rows(np.arange(len(group)), delta, group)
+            segment = segments.write(raw[group], fingerprints[rows[group]], vectors[group], columns, level,
+                                     **options)
+            stats["segments"].append(segment)
+            print(f"Wrote {segment['name']}: {segment['count']} rows, {segment['index_type']}, "
+                  f"{segment['bytes']:,} bytes")
+    segments.save()
+    return stats
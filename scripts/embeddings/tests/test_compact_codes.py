@@ -0,0 +1,28 @@
+"""Hamming distances over binary codes (compact_codes.py), with and without np.bitwise_count."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compact_codes import BinaryCodes  # noqa: E402
+
+
+@pytest.mark.parametrize('bitwise_count', [True, False])
+@pytest.mark.parametrize('dimensions', [384, 100])
+def test_binary_distances(monkeypatch, bitwise_count, dimensions):
+    if not bitwise_count:
+        monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    elif not hasattr(np, 'bitwise_count'):
+        pytest.skip("numpy < 2.0 has no bitwise_count")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, dimensions)).astype(np.float32)
+    codes = BinaryCodes.fit(vectors)
+    query = rng.standard_normal(dimensions).astype(np.float32)
+
+    expected = np.unpackbits(codes.codes ^ codes.encode(query), axis=1).sum(axis=1)
+    np.testing.assert_array_equal(codes.distances(query), expected)
+    assert expected[codes.search(query, 5)].tolist() == np.sort(expected)[:5].tolist()
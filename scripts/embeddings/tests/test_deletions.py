@@ -0,0 +1,201 @@
+"""
+NIP-09 deletion propagation (apply_deletions.py) against the mock relay.
+
+Three nightly runs of the pipeline in benchmarks/bench_deletions.py share one
+working directory over a small corpus: the initial fetch; a night with
+deletions by authors and a moderator, some of notes fetched in the same run,
+plus requests signed by someone else; and a mass deletion by the moderator
+past the compact threshold. The mock relay keeps serving deleted notes, the
+worst case for the pipeline.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from apply_deletions import deletion_requests  # noqa: E402
+from bench_deletions import FORGER, MODERATOR, RandomEncoder, indexed, nightly, pick  # noqa: E402
+from embedding_store import EmbeddingStore, content_hash  # noqa: E402
+from generate_embeddings import embed_incremental, iter_note_texts  # noqa: E402
+from mock_relay import MockRelay, event_for, relay_url  # noqa: E402
+
+EVENTS = 2_000
+NEW_EVENTS = 100
+COMPACT_THRESHOLD = 0.2
+
+
+def searchable(state: dict, vectors: dict, event_ids: list[str]) -> int:
+    """How many of event_ids come back as their own nearest neighbour in the HNSW index."""
+    index, table = state["index"], state["table_obj"]
+    index.set_ef(100)
+    found = 0
+    for event_id in event_ids:
+        if event_id in vectors:
+            labels, _ = index.knn_query(vectors[event_id], k=1)
+            found += table.event_id(int(labels[0][0])) == event_id
+    return found
+
+
+def stored_vectors(workdir: Path, event_ids: list[str]) -> dict:
+    """Vectors the encoder gave event_ids (recomputed from the notes files)."""
+    wanted, found = set(event_ids), {}
+    for path in sorted(workdir.glob('notes-*.ndjson')):
+        for ids, texts, _ in iter_note_texts(str(path), 50_000):
+            for event_id, text in zip(ids, texts):
+                if event_id in wanted:
+                    found[event_id] = RandomEncoder().encode([text])[0]
+    return found
+
+
+@pytest.fixture(scope='module')
+def runs(tmp_path_factory) -> dict:
+    """indexed() after each night, the ids each kind of request targeted and their vectors."""
+    rng = np.random.default_rng(0)
+    relay = MockRelay()
+    relay.seed(EVENTS, 30 * 86400)
+    workdir = tmp_path_factory.mktemp('deletions')
+    runs = {}
+
+    async def run():
+        async with relay.serve() as server:
+            url = relay_url(server)
+            await nightly(url, workdir, 1, COMPACT_THRESHOLD)
+            runs["initial"] = indexed(workdir)
+            serial_of = {event_for(serial, 0, 1)["id"]: int(serial) for serial in relay.serial}
+
+            now = int(relay.created_at.max()) + 60
+            indexed_serials = sorted(serial_of[event_id] for event_id in runs["initial"]["store"])
+            by_author = pick(rng, indexed_serials, 0.05)
+            rest = sorted(set(indexed_serials) - set(by_author))
+            forged = pick(rng, rest, 0.01)
+            moderated = pick(rng, sorted(set(rest) - set(forged)), 0.01)
+            first_new = len(relay.serial)
+            relay.add(now + np.arange(NEW_EVENTS), np.ones(NEW_EVENTS, dtype=np.int16))
+            same_run = [serial for serial in range(first_new, first_new + NEW_EVENTS)
+                        if event_for(serial, 0, 1)["content"].strip()][:NEW_EVENTS // 10]
+            # One request a second: the mock relay caps events per created_at like real relays
+            at = now + NEW_EVENTS
+            runs["by_author"] = relay.delete(by_author, at + np.arange(len(by_author)))
+            at += len(by_author)
+            runs["same_run"] = relay.delete(same_run, at + np.arange(len(same_run)))
+            at += len(same_run)
+            runs["moderated"] = relay.delete(moderated, at + np.arange(len(moderated)), pubkey=MODERATOR)
+            at += len(moderated)
+            runs["forged"] = relay.delete(forged, at + np.arange(len(forged)), pubkey=FORGER)
+            at += len(forged)
+            await nightly(url, workdir, 2, COMPACT_THRESHOLD)
+            runs["deletions"] = indexed(workdir)
+
+            mass = pick(rng, sorted(serial_of[event_id] for event_id in runs["deletions"]["store"]
+                                    if event_id in serial_of), 0.3)
+            runs["mass"] = relay.delete(mass, at + np.arange(len(mass)), pubkey=MODERATOR)
+            await nightly(url, workdir, 3, COMPACT_THRESHOLD)
+            runs["moderation"] = indexed(workdir)
+
+    asyncio.run(run())
+    runs["vectors"] = stored_vectors(workdir, runs["by_author"] + runs["moderated"] + runs["forged"])
+    return runs
+
+
+def live_everywhere(state: dict) -> set[str]:
+    return state["store"] | state["table"] | state["segments"]
+
+
+@pytest.mark.parametrize('night', ['initial', 'deletions', 'moderation'])
+def test_store_label_table_and_segments_agree(runs, night):
+    state = runs[night]
+    assert state["store"]
+    assert state["store"] == state["table"] == state["segments"]
+
+
+@pytest.mark.parametrize('requests', ['by_author', 'same_run', 'moderated'])
+def test_deleted_notes_leave_store_label_table_and_segments(runs, requests):
+    assert runs[requests]
+    assert not set(runs[requests]) & live_everywhere(runs["deletions"])
+
+
+def test_forged_requests_are_ignored(runs):
+    state = runs["deletions"]
+    assert runs["forged"]
+    assert set(runs["forged"]) <= state["store"] & state["table"] & state["segments"]
+    assert searchable(state, runs["vectors"], runs["forged"]) >= 0.95 * len(runs["forged"])
+
+
+def test_deleted_notes_are_not_searchable(runs):
+    deleted = runs["by_author"] + runs["moderated"]
+    assert set(deleted) <= set(runs["vectors"])
+    assert searchable(runs["deletions"], runs["vectors"], deleted) == 0
+
+
+def test_index_stays_incremental_below_the_threshold(runs):
+    state = runs["deletions"]
+    assert 0 < state["ratio"] <= COMPACT_THRESHOLD
+    assert state["graph_slots"] > state["live"]
+    assert state["segment_deletes"] > 0
+
+
+def test_mass_deletion_compacts(runs):
+    state = runs["moderation"]
+    assert runs["mass"]
+    assert not set(runs["mass"]) & live_everywhere(state)
+    assert state["ratio"] == 0
+    assert state["graph_slots"] == state["live"]
+    assert state["segment_deletes"] == 0
+
+
+def write_deletions(path: Path, events: list[dict]) -> str:
+    path.write_text(''.join(json.dumps(event) + '\n' for event in events))
+    return str(path)
+
+
+def test_deletion_requests_follow_nip09(tmp_path):
+    author, moderator, target = 'a' * 64, 'b' * 64, 'c' * 64
+    path = write_deletions(tmp_path / 'deletions.ndjson', [
+        {"kind": 5, "pubkey": author, "created_at": 10, "tags": [["e", target], ["a", f"30023:{author}:x"]]},
+        {"kind": 5, "pubkey": moderator, "created_at": 11, "tags": [["e", target], ["e", "short"]]},
+        {"kind": 1, "pubkey": author, "created_at": 12, "tags": [["e", target]]},
+    ])
+    assert deletion_requests(path, {moderator}) == [(target, author, 10), (target, None, 11)]
+    # Without the moderator list the second request only binds its signer's notes
+    assert deletion_requests(path)[1] == (target, moderator, 11)
+
+
+def test_store_keeps_requests_for_notes_not_stored_yet(tmp_path):
+    author, other = 'a' * 64, 'b' * 64
+    by_author, by_moderator, by_other = 'c' * 64, 'd' * 64, 'e' * 64
+    store = EmbeddingStore(str(tmp_path / 'store.sqlite'), 'synthetic')
+    try:
+        assert store.record_deletions([(by_author, author, 1), (by_moderator, None, 2), (by_other, other, 3)]) == 0
+        assert store.deletion_count() == 3
+        found = store.deleted([by_author, by_moderator, by_other], [author, author, author])
+        assert found == {by_author, by_moderator}
+    finally:
+        store.close()
+
+
+def test_author_deletion_removes_rows_stored_without_a_pubkey(tmp_path):
+    author, forger = 'a' * 64, 'f' * 64
+    note, other = 'c' * 64, 'd' * 64
+    texts = ['deleted by its author', 'deletion forged']
+    store = EmbeddingStore(str(tmp_path / 'store.sqlite'), 'synthetic')
+    try:
+        # Rows from before the metadata columns: no pubkey to check requests against
+        store.upsert([note, other], [content_hash('synthetic', text) for text in texts],
+                     RandomEncoder().encode(texts))
+        assert store.record_deletions([(note, author, 1), (other, forger, 2)]) == 0
+
+        # The next fetch brings each note with its author
+        embed_incremental(store, 'synthetic', [note, other], texts, RandomEncoder(),
+                          [(1, author, 10, None), (1, author, 11, None)])
+        assert store.export()[0] == [other]
+        assert store.export_metadata()[0][1] == author
+    finally:
+        store.close()
@@ -0,0 +1,52 @@
+"""Incremental exact indexes keep one rounding step when the int8 params change (exact_search.py)."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from build_index import build_index  # noqa: E402
+from exact_search import ExactIndex  # noqa: E402
+from quantization import dequantize, quantization_fields, quantize_int8  # noqa: E402
+
+DIMENSIONS = 32
+
+
+def unit(rng, count: int, spread: float = 1.0) -> np.ndarray:
+    vectors = rng.standard_normal((count, DIMENSIONS)).astype(np.float32) * spread
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True) * spread
+
+
+@pytest.mark.parametrize('scheme', ['global', 'per-dim'])
+def test_unchanged_rows_do_not_drift(tmp_path, scheme):
+    rng = np.random.default_rng(0)
+    kept = unit(rng, 500)
+    ids = [f"{i:064x}" for i in range(500)]
+    embeddings, index = tmp_path / 'embeddings.npz', str(tmp_path / 'index.bin')
+    for night in range(8):
+        # New notes with a growing range move the export's min/scale every night
+        vectors = np.concatenate([kept, unit(rng, 20, 1.0 + 0.2 * night)])
+        night_ids = ids + [f"{10_000 + 100 * night + i:064x}" for i in range(20)]
+        np.savez(embeddings, ids=np.array(night_ids), content_hashes=np.arange(len(night_ids), dtype=np.uint64),
+                 **quantization_fields(*quantize_int8(vectors, scheme), scheme), model='synthetic',
+                 dimensions=DIMENSIONS)
+        build_index(str(embeddings), index if night else None, index, mode='exact', prune=True)
+
+    stored = ExactIndex.load(index).vectors_for(np.arange(500))
+    np.testing.assert_allclose(stored, dequantize(np.load(embeddings))[:500], atol=1e-6)
+
+
+def test_rows_without_a_source_are_converted():
+    rng = np.random.default_rng(1)
+    vectors = unit(rng, 10)
+    quantized, vmin, scale = quantize_int8(vectors, 'global')
+    index = ExactIndex(quantized, 'global', vmin, scale)
+    index.mark_deleted([9])
+    before = index.vectors_for(np.arange(9))
+    index.requantize(-2.0, 60.0, np.arange(5), vectors[:5])
+    assert index.norms[9] == 0 and np.all(index.norms[:9] > 0)
+    np.testing.assert_allclose(index.vectors_for(np.arange(5)), vectors[:5], atol=1 / 60)
+    np.testing.assert_allclose(index.vectors_for(np.arange(5, 9)), before[5:], atol=1 / 60)
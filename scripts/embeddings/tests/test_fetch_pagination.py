@@ -0,0 +1,127 @@
+"""
+Paginated relay fetch (fetch_notes.py) against the mock relay.
+
+A small corpus with a relay-side limit cap well below the corpus size, and
+bursts of events sharing one created_at, so every fetch has to page through
+until/since windows and cut through busy seconds.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from fetch_notes import fetch_notes, load_state, time_windows  # noqa: E402
+from mock_relay import MockRelay, relay_url  # noqa: E402
+from notes_io import iter_notes  # noqa: E402
+
+EVENTS = 10_000
+MAX_LIMIT = 500  # above MockRelay.seed's 400-event burst second
+SPAN = 30 * 86400
+
+
+@pytest.fixture
+def relay() -> MockRelay:
+    relay = MockRelay(max_limit=MAX_LIMIT)
+    relay.seed(EVENTS, SPAN)
+    return relay
+
+
+def fetch(relay: MockRelay, output: Path, relays: int = 1, **options) -> list[str]:
+    """Run fetch_notes against the relay (listed `relays` times); returns ids written, in order."""
+    async def run():
+        async with relay.serve() as server:
+            await fetch_notes([relay_url(server)] * relays, str(output), **options)
+    asyncio.run(run())
+    return [note['id'] for note in iter_notes(str(output))]
+
+
+def test_full_fetch_pages_past_the_cap(relay, tmp_path):
+    ids = fetch(relay, tmp_path / 'full.ndjson', page_size=MAX_LIMIT)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == relay.expected()
+    assert relay.requests > EVENTS // MAX_LIMIT
+
+
+def test_page_cuts_through_a_busy_second(tmp_path):
+    relay = MockRelay(max_limit=100)
+    # Pages of 100 end partway through each of these 80-event seconds
+    seconds = [1_700_000_000 + 10 * i for i in range(6)]
+    relay.add(np.concatenate([np.arange(1_699_999_900, 1_699_999_950)] + [np.full(80, s) for s in seconds]),
+              np.ones(530, dtype=np.int16))
+    ids = fetch(relay, tmp_path / 'notes.ndjson', page_size=100)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == relay.expected()
+
+
+def test_more_than_a_page_in_one_second_warns(tmp_path, capsys):
+    relay = MockRelay(max_limit=10)
+    relay.add(np.full(30, 1_700_000_000), np.ones(30, dtype=np.int16))
+    relay.add(np.arange(1_699_999_900, 1_699_999_920), np.ones(20, dtype=np.int16))
+    ids = fetch(relay, tmp_path / 'notes.ndjson', page_size=10)
+    assert "more than 10 events at created_at=1700000000" in capsys.readouterr().out
+    # The cursor moves past the capped second instead of looping on it
+    busy = relay.expected(since=1_700_000_000)
+    assert set(ids) >= relay.expected() - busy
+    assert len(set(ids) & busy) >= 10
+
+
+def test_since_window(relay, tmp_path):
+    since = int(relay.created_at[len(relay.created_at) // 2])
+    ids = fetch(relay, tmp_path / 'recent.ndjson', since=since, page_size=MAX_LIMIT)
+    assert set(ids) == relay.expected(since=since)
+
+
+def test_shards_and_relays_are_deduplicated(relay, tmp_path):
+    ids = fetch(relay, tmp_path / 'sharded.ndjson', relays=2, shards=4, page_size=MAX_LIMIT,
+                backfill_days=10_000)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == relay.expected()
+
+
+def test_time_windows_cover_the_range():
+    windows = time_windows(1000, 2000, 4, 365)
+    assert windows[0][0] == 1000 and windows[-1][1] is None
+    for (_, until), (since, _) in zip(windows, windows[1:]):
+        assert since == until + 1
+    assert time_windows(None, 2000, 1, 365) == [(None, None)]
+
+
+def test_resume_from_state(relay, tmp_path):
+    state = tmp_path / 'state.json'
+    fetch(relay, tmp_path / 'full.ndjson', state_path=str(state), page_size=MAX_LIMIT)
+    high_water, high_water_ids = load_state(str(state))
+    assert high_water == int(relay.created_at[np.isin(relay.kind, [1, 9, 42])].max())
+    assert high_water_ids
+
+    before = relay.expected()
+    # New events at exactly the high-water second and after it
+    relay.add(np.concatenate([np.full(20, high_water), high_water + 1 + np.arange(200)]),
+              np.where(np.arange(220) % 3 == 0, 9, 1))
+    ids = fetch(relay, tmp_path / 'incremental.ndjson', state_path=str(state), page_size=MAX_LIMIT)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == relay.expected() - before
+    assert json.loads(state.read_text())['high_water_created_at'] == high_water + 200
+
+    assert fetch(relay, tmp_path / 'noop.ndjson', state_path=str(state), page_size=MAX_LIMIT) == []
+
+
+def test_failed_fetch_keeps_the_high_water_mark(relay, tmp_path, monkeypatch):
+    state = tmp_path / 'state.json'
+    fetch(relay, tmp_path / 'full.ndjson', state_path=str(state), page_size=MAX_LIMIT)
+    saved = state.read_text()
+
+    async def unreachable(*args, **kwargs):
+        return False
+
+    monkeypatch.setattr('fetch_notes.fetch_window', unreachable)
+    relay.add(np.array([int(relay.created_at.max()) + 10]), np.ones(1, dtype=np.int16))
+    fetch(relay, tmp_path / 'failed.ndjson', state_path=str(state), page_size=MAX_LIMIT)
+    assert state.read_text() == saved
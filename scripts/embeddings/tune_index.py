@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Tune HNSW parameters against exact brute-force ground truth.
+
+Holds out a sample of the embeddings as queries, computes their exact top-k
+neighbours with chunked numpy matmul, then sweeps M, ef_construction and
+search ef. For every setting it reports recall@k, single-query latency
+percentiles, build time and index size. Settings on the recall/latency
+Pareto front are written to the manifest under "hnsw_tuning", along with a
+recommended setting: the fastest one that meets --target-recall.
+
+Usage:
+    python tune_index.py --embeddings embeddings.npz --manifest manifest.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from quantization import dequantize
+
+try:
+    import hnswlib
+except ImportError:
+    print("Installing hnswlib...")
+    import subprocess
+    subprocess.check_call(['pip', 'install', 'hnswlib'])
+    import hnswlib
+
+
+def load_vectors(embeddings_path: str) -> np.ndarray:
+    """Float32, L2-normalized vectors from an embeddings NPZ."""
+    vectors = dequantize(np.load(embeddings_path, allow_pickle=True))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, chunk_size: int = 8192) -> np.ndarray:
+    """Exact cosine top-k labels per query (corpus and queries normalized)."""
+    top = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), chunk_size):
+        scores = queries[start:start + chunk_size] @ corpus.T
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+        top[start:start + chunk_size] = np.take_along_axis(part, order, axis=1)
+    return top
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found.tolist(), truth.tolist()))
+    return hits / truth.size
+
+
+def pareto_front(results: list[dict]) -> list[dict]:
+    """Settings not beaten on both recall (higher) and p50 latency (lower)."""
+    front = []
+    for r in sorted(results, key=lambda r: (r['p50_ms'], -r['recall'])):
+        if not front or r['recall'] > front[-1]['recall']:
+            front.append(r)
+    return front
+
+
+def tune(
+    embeddings_path: str,
+    manifest_path: str | None,
+    k: int = 10,
+    queries: int = 1000,
+    max_vectors: int | None = None,
+    m_values: list[int] = (8, 16, 32),
+    ef_construction_values: list[int] = (100, 200, 400),
+    ef_values: list[int] = (16, 32, 64, 128, 256),
+    target_recall: float = 0.95,
+    threads: int = -1,
+    seed: int = 0
+) -> dict:
+    vectors = load_vectors(embeddings_path)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    if max_vectors:
+        order = order[:max_vectors + queries]
+    query_vectors = vectors[order[:queries]]
+    corpus = vectors[order[queries:]]
+    dimensions = corpus.shape[1]
+    print(f"{len(corpus)} indexed vectors, {len(query_vectors)} held-out queries, k={k}")
+
+    start = time.perf_counter()
+    truth = exact_top_k(corpus, query_vectors, k)
+    print(f"Exact ground truth in {time.perf_counter() - start:.1f}s\n")
+
+    results = []
+    labels = np.arange(len(corpus))
+    print(f"{'M':>4}{'efC':>6}{'ef':>6}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'build s':>9}{'MB':>8}")
+    for m, ef_construction in itertools.product(m_values, ef_construction_values):
+        index = hnswlib.Index(space='cosine', dim=dimensions)
+        index.init_index(max_elements=len(corpus), M=m, ef_construction=ef_construction)
+        start = time.perf_counter()
+        index.add_items(corpus, labels, num_threads=threads)
+        build_seconds = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.bin')
+            index.save_index(path)
+            index_bytes = os.path.getsize(path)
+
+        for ef in ef_values:
+            if ef < k:
+                continue
+            index.set_ef(ef)
+            # One query per call, like a client resolving a search box query
+            latencies = np.empty(len(query_vectors))
+            found = np.empty((len(query_vectors), k), dtype=np.int64)
+            for i, query in enumerate(query_vectors):
+                start = time.perf_counter()
+                found[i] = index.knn_query(query, k=k, num_threads=1)[0][0]
+                latencies[i] = time.perf_counter() - start
+
+            p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+            result = {
+                "m": m, "ef_construction": ef_construction, "ef": ef,
+                "recall": round(recall_at_k(found, truth), 4),
+                "p50_ms": round(float(p50), 4), "p95_ms": round(float(p95), 4), "p99_ms": round(float(p99), 4),
+                "build_seconds": round(build_seconds, 2), "index_bytes": index_bytes
+            }
+            results.append(result)
+            print(f"{m:>4}{ef_construction:>6}{ef:>6}{result['recall']:>9.4f}{p50:>9.3f}{p95:>9.3f}"
+                  f"{p99:>9.3f}{build_seconds:>9.1f}{index_bytes / 1e6:>8.1f}")
+
+    front = pareto_front(results)
+    meeting = [r for r in front if r['recall'] >= target_recall]
+    recommended = min(meeting, key=lambda r: r['p50_ms']) if meeting else max(front, key=lambda r: r['recall'])
+
+    print("\nPareto front (recall vs p50 latency):")
+    for r in front:
+        marker = "  <- recommended" if r is recommended else ""
+        print(f"  M={r['m']} efC={r['ef_construction']} ef={r['ef']}: "
+              f"recall {r['recall']:.4f}, p50 {r['p50_ms']:.3f} ms{marker}")
+    if not meeting:
+        print(f"No setting reached recall {target_recall}; recommending the highest-recall one")
+
+    tuning = {
+        "tuned_at": datetime.now(timezone.utc).isoformat(),
+        "k": k,
+        "queries": len(query_vectors),
+        "vectors": len(corpus),
+        "target_recall": target_recall,
+        "recommended": recommended,
+        "pareto": front
+    }
+
+    if manifest_path:
+        manifest = {}
+        if Path(manifest_path).exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        manifest["hnsw_tuning"] = tuning
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Wrote tuning results to {manifest_path}")
+
+    return tuning
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune HNSW parameters against brute-force ground truth')
+    parser.add_argument('--embeddings', required=True, help='Input NPZ file with embeddings')
+    parser.add_argument('--manifest', help='manifest.json to record the Pareto settings in')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query for recall@k')
+    parser.add_argument('--queries', type=int, default=1000, help='Held-out query vectors')
+    parser.add_argument('--max-vectors', type=int, help='Index at most this many vectors (sampled)')
+    parser.add_argument('--m', type=int, nargs='+', default=[8, 16, 32], help='M values to try')
+    parser.add_argument('--ef-construction', type=int, nargs='+', default=[100, 200, 400],
+                        help='ef_construction values to try')
+    parser.add_argument('--ef', type=int, nargs='+', default=[16, 32, 64, 128, 256],
+                        help='Search ef values to try')
+    parser.add_argument('--target-recall', type=float, default=0.95)
+    parser.add_argument('--threads', type=int, default=-1, help='Build threads (-1 = all cores)')
+
+    args = parser.parse_args()
+
+    tune(
+        embeddings_path=args.embeddings,
+        manifest_path=args.manifest,
+        k=args.k,
+        queries=args.queries,
+        max_vectors=args.max_vectors,
+        m_values=args.m,
+        ef_construction_values=args.ef_construction,
+        ef_values=args.ef,
+        target_recall=args.target_recall,
+        threads=args.threads
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -4,16 +4,28 @@ Update manifest.json with embedding generation metadata.
 """
 
 import json
+import os
 import argparse
 from pathlib import Path
 from datetime import datetime, timezone
 import numpy as np
 
+from compact_codes import load_compact
+from build_index import labels_path_for, tombstone_ratio
+from exact_search import read_header
+from label_mapping import describe_mapping
+from label_table import LabelTable
+from notes_io import iter_notes
+from quantization import scheme_of
+from segments import published_segments
+
 
 def update_manifest(
     notes_path: str,
     embeddings_path: str,
-    output_path: str
+    output_path: str,
+    mapping_path: str | None = None,
+    segments_dir: str | None = None
 ):
     """Update or create manifest.json."""
 
@@ -30,9 +42,11 @@ def update_manifest(
             "total_vectors": 0
         }
 
-    # Load notes to get last event
-    with open(notes_path, 'r') as f:
-        notes = json.load(f)
+    # Stream notes to find the most recent one without loading the whole file
+    latest = None
+    for note in iter_notes(notes_path):
+        if latest is None or note['created_at'] > latest['created_at']:
+            latest = {'id': note['id'], 'created_at': note['created_at']}
 
     # Load embeddings for stats
     data = np.load(embeddings_path, allow_pickle=True)
@@ -44,29 +58,28 @@ def update_manifest(
     manifest["dimensions"] = int(data['dimensions'])
     manifest["model"] = str(data.get('model', 'unknown'))
     manifest["quantize_type"] = str(data.get('quantize_type', 'float32'))
+    if scheme_of(data):
+        manifest["quantize_scheme"] = scheme_of(data)
+    if 'compact_type' in data.files:
+        compact = load_compact(data)
+        manifest["compact_codes"] = {"type": str(data['compact_type']), "bytes_per_vector": compact.bytes_per_vector}
 
     # Track last processed event
-    if notes:
-        # Sort by created_at and get the most recent
-        notes.sort(key=lambda x: x['created_at'], reverse=True)
-        manifest["last_event_id"] = notes[0]["id"]
-        manifest["last_event_timestamp"] = notes[0]["created_at"]
+    if latest:
+        manifest["last_event_id"] = latest["id"]
+        manifest["last_event_timestamp"] = latest["created_at"]
 
     # File URLs (will be set relative to GCS bucket)
     version = manifest["version"]
     bucket_name = os.environ.get('GCS_BUCKET_NAME', 'Nostr-BBS-vectors')
 
     manifest["files"] = {
-        "index": f"v{version}/index.bin",
-        "index_mapping": f"v{version}/index_mapping.npz",
         "embeddings": f"v{version}/embeddings.npz",
         "manifest": f"v{version}/manifest.json"
     }
 
     # Latest URLs for easy access
     manifest["latest"] = {
-        "index": "latest/index.bin",
-        "index_mapping": "latest/index_mapping.npz",
         "embeddings": "latest/embeddings.npz",
         "manifest": "latest/manifest.json"
     }
@@ -74,8 +87,6 @@ def update_manifest(
     # GCS public URLs
     manifest["gcs_bucket"] = bucket_name
     manifest["public_urls"] = {
-        "index": f"https://storage.googleapis.com/{bucket_name}/latest/index.bin",
-        "index_mapping": f"https://storage.googleapis.com/{bucket_name}/latest/index_mapping.npz",
         "embeddings": f"https://storage.googleapis.com/{bucket_name}/latest/embeddings.npz",
         "manifest": f"https://storage.googleapis.com/{bucket_name}/latest/manifest.json"
     }
@@ -85,9 +96,58 @@ def update_manifest(
     if embeddings_file.exists():
         manifest["embeddings_size_bytes"] = embeddings_file.stat().st_size
 
+    # Single index from build_index.py; the nightly workflow publishes segments instead, so
+    # drop fields a previous manifest carried over for an index.bin no longer uploaded
+    for key in ("index_size_bytes", "index_type", "index_tombstone_ratio", "index_mapping_size_bytes",
+                "index_mapping_sha256", "index_mapping_format"):
+        manifest.pop(key, None)
     index_file = Path("index.bin")
     if index_file.exists():
+        for key, filename in (("index", "index.bin"), ("index_mapping", "index_mapping.bin")):
+            manifest["files"][key] = f"v{version}/{filename}"
+            manifest["latest"][key] = f"latest/{filename}"
+            manifest["public_urls"][key] = f"https://storage.googleapis.com/{bucket_name}/latest/{filename}"
         manifest["index_size_bytes"] = index_file.stat().st_size
+        # build_index.py writes an exact index for small corpora
+        manifest["index_type"] = "exact" if read_header(str(index_file)) else "hnsw"
+    # Labels held by deleted notes; build_index.py rebuilds past --compact-threshold
+    labels_file = Path(labels_path_for(str(index_file)))
+    if labels_file.exists():
+        manifest["index_tombstone_ratio"] = round(tombstone_ratio(LabelTable.load(str(labels_file))), 4)
+
+    # BM25 index from generate_embeddings.py --lexical-output, for hybrid search
+    lexical_file = Path("lexical.bin")
+    if lexical_file.exists():
+        manifest["files"]["lexical"] = f"v{version}/lexical.bin"
+        manifest["latest"]["lexical"] = "latest/lexical.bin"
+        manifest["public_urls"]["lexical"] = f"https://storage.googleapis.com/{bucket_name}/latest/lexical.bin"
+        manifest["lexical_size_bytes"] = lexical_file.stat().st_size
+
+    # Label-ordered kind/pubkey/created_at/channel columns from build_index.py, for filtered search
+    metadata_file = Path("index_metadata.npz")
+    if metadata_file.exists():
+        manifest["files"]["index_metadata"] = f"v{version}/index_metadata.npz"
+        manifest["latest"]["index_metadata"] = "latest/index_metadata.npz"
+        manifest["public_urls"]["index_metadata"] = (
+            f"https://storage.googleapis.com/{bucket_name}/latest/index_metadata.npz"
+        )
+
+    # Time-partitioned segments from build_segments.py; names are immutable, so clients and
+    # the search service fetch only the segments (and deletes lists) they have not seen
+    if segments_dir and Path(segments_dir).exists():
+        manifest["segments"] = published_segments(segments_dir)
+        manifest["segments_size_bytes"] = sum(
+            (Path(segments_dir) / Path(name).name).stat().st_size
+            for segment in manifest["segments"] for name in segment["files"].values()
+        )
+        # Rows held by deletes lists; build_segments.py rewrites a segment past --compact-threshold
+        count = sum(segment["count"] for segment in manifest["segments"])
+        live = sum(segment["live"] for segment in manifest["segments"])
+        manifest["segments_tombstone_ratio"] = round(1 - live / count, 4) if count else 0.0
+
+    # Size and checksum let clients verify the mapping (or range-read it)
+    if mapping_path and Path(mapping_path).exists():
+        manifest.update(describe_mapping(mapping_path))
 
     # Write manifest
     with open(output_path, 'w') as f:
@@ -98,16 +158,20 @@ def update_manifest(
 
 def main():
     parser = argparse.ArgumentParser(description='Update embedding manifest')
-    parser.add_argument('--notes', required=True, help='Notes JSON file')
+    parser.add_argument('--notes', required=True, help='Notes NDJSON file (.gz/.zst or legacy JSON)')
     parser.add_argument('--embeddings', required=True, help='Embeddings NPZ file')
     parser.add_argument('--output', required=True, help='Output manifest.json path')
+    parser.add_argument('--mapping', help='Binary label mapping (index_mapping.bin) to checksum')
+    parser.add_argument('--segments-dir', help='Segments directory from build_segments.py to list')
 
     args = parser.parse_args()
 
     update_manifest(
         notes_path=args.notes,
         embeddings_path=args.embeddings,
-        output_path=args.output
+        output_path=args.output,
+        mapping_path=args.mapping,
+        segments_dir=args.segments_dir
     )
 
 
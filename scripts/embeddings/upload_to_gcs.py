@@ -11,6 +11,7 @@ Environment:
 """
 
 import argparse
+import json
 import os
 from pathlib import Path
 
@@ -23,7 +24,24 @@ except ImportError:
     from google.cloud import storage
 
 
-def upload_to_gcs(bucket_name: str, source_dir: Path, prefix: str = ""):
+def upload_segments(bucket, segments_dir: Path):
+    """Upload segment files not yet in the bucket to segments/ (names are never reused)."""
+    with open(segments_dir / "segments.json") as f:
+        segments = json.load(f)["segments"]
+    uploaded = 0
+    for segment in segments:
+        for filename in segment["files"].values():
+            blob = bucket.blob(f"segments/{filename}")
+            if blob.exists():
+                continue
+            blob.upload_from_filename(str(segments_dir / filename), content_type="application/octet-stream")
+            blob.make_public()
+            uploaded += 1
+            print(f"Uploaded {filename} -> gs://{bucket.name}/segments/{filename}")
+    print(f"Segments: {uploaded} new files, {len(segments)} segments")
+
+
+def upload_to_gcs(bucket_name: str, source_dir: Path, prefix: str = "", segments_dir: Path | None = None):
     """Upload index files to GCS bucket."""
 
     client = storage.Client()
@@ -38,10 +56,16 @@ def upload_to_gcs(bucket_name: str, source_dir: Path, prefix: str = ""):
         bucket.make_public(recursive=True, future=True)
         print(f"Created new bucket: {bucket_name}")
 
+    # Segments go first so a manifest listing them never points at a missing file
+    if segments_dir is not None:
+        upload_segments(bucket, segments_dir)
+
     # Files to upload
     files_to_upload = [
         "index.bin",
-        "index_mapping.json",
+        "index_mapping.bin",
+        "lexical.bin",
+        "index_metadata.npz",
         "embeddings.npz",
         "manifest.json",
         "synthetic_events.json",
@@ -102,6 +126,7 @@ def main():
     parser.add_argument('--bucket', default='Nostr-BBS-vectors', help='GCS bucket name')
     parser.add_argument('--source', default='output', help='Source directory with index files')
     parser.add_argument('--prefix', default='', help='Key prefix (e.g., v1, v2)')
+    parser.add_argument('--segments-dir', help='Segments directory from build_segments.py')
 
     args = parser.parse_args()
 
@@ -114,7 +139,8 @@ def main():
     upload_to_gcs(
         bucket_name=args.bucket,
         source_dir=source_dir,
-        prefix=args.prefix
+        prefix=args.prefix,
+        segments_dir=Path(args.segments_dir) if args.segments_dir else None
     )
 
     return 0
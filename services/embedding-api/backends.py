@@ -0,0 +1,151 @@
+"""
+Pluggable inference backends for the embedding model.
+
+EMBED_BACKEND selects one of:
+    torch      - SentenceTransformer on PyTorch (reference implementation)
+    onnx       - The same transformer exported to ONNX, run with ONNX Runtime
+    onnx-int8  - The ONNX graph with dynamically int8-quantized weights
+
+All backends return L2-normalized float32 vectors from mean pooling, so they
+are interchangeable as long as they stay within PARITY_TOLERANCE of torch.
+ONNX graphs are produced by export_onnx.py (run at image build time).
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model_int8.onnx"
+}
+
+# Minimum cosine similarity against the torch vector for the same text
+PARITY_TOLERANCE = {
+    "torch": 1.0 - 1e-6,
+    "onnx": 0.9999,
+    "onnx-int8": 0.98
+}
+
+# Texts used to verify parity after export and in benchmarks
+PARITY_TEXTS = [
+    "Just finished a wonderful 20-minute meditation session.",
+    "New co-op opening on Burlington Ave! Organic produce from local farms.",
+    "Anyone want to carpool to the Des Moines airport next Friday?",
+    "#nostr relay maintenance tonight, expect brief downtime",
+    "Lost cat near 1st street - orange tabby named Veda. Please help!",
+    "The annual town meeting was productive. Great community engagement, lots of "
+    "questions about the new housing proposal and the summer music festival.",
+    "ok",
+    "Sthapatya Veda architecture tour of Vedic City homes."
+]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class TorchBackend:
+    """SentenceTransformer on PyTorch, the reference for parity checks"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+            normalize_embeddings=True  # L2 normalization for cosine similarity
+        )
+
+
+class OnnxBackend:
+    """
+    Exported transformer on ONNX Runtime with mean pooling done in numpy.
+
+    Args:
+        model_name: Hugging Face model id, used for the tokenizer
+        onnx_path: Exported graph (fp32 or int8-quantized)
+        threads: ONNX Runtime intra-op threads (None keeps the runtime default)
+        max_seq_length: Truncation length, matching SentenceTransformer's setting
+
+    The session is shared, but each inference thread gets its own tokenizer:
+    a Rust-backed fast tokenizer raises "Already borrowed" when two threads
+    call it at once.
+    """
+
+    def __init__(self, model_name: str, onnx_path: str, threads: int | None = None, max_seq_length: int = 256):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.name = "onnx-int8" if "int8" in Path(onnx_path).name else "onnx"
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        # Loaded here so a bad model id fails at startup; other threads load their own
+        self._local = threading.local()
+        self._local.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dimensions = self.session.get_outputs()[0].shape[-1]
+
+    @property
+    def tokenizer(self):
+        """This thread's tokenizer, loaded on first use"""
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+            tokenizer = self._local.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return tokenizer
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feed = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+
+        # Mean pooling over real (non-padding) tokens, as SentenceTransformer does
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return normalize(summed / counts)
+
+
+def load_backend(name: str, model_name: str, onnx_dir: str, threads: int | None = None):
+    """Construct the backend selected by EMBED_BACKEND"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Use one of: {', '.join(BACKENDS)}")
+
+    if name == "torch":
+        return TorchBackend(model_name)
+
+    onnx_path = os.path.join(onnx_dir, ONNX_FILES[name])
+    if not Path(onnx_path).exists():
+        raise FileNotFoundError(f"{onnx_path} not found; run export_onnx.py first")
+    return OnnxBackend(model_name, onnx_path, threads=threads)
+
+
+def parity(backend, reference: np.ndarray, texts: List[str] = PARITY_TEXTS) -> float:
+    """Lowest cosine similarity between backend vectors and reference vectors"""
+    vectors = backend.encode(texts)
+    return float(np.min(np.sum(normalize(vectors) * normalize(reference), axis=1)))
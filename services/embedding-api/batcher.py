@@ -0,0 +1,183 @@
+"""
+Request-coalescing micro-batcher for the embedding model.
+
+Concurrent /embed calls push their texts onto a shared asyncio queue. A single
+background task drains the queue and flushes everything it has collected as one
+model.encode() call once either the batch is full or the oldest pending text
+has waited long enough. Each caller then receives only its own rows.
+
+Every flushed batch runs as its own task, so up to max_concurrency forward
+passes (one per inference worker) run at once. While all of them are busy the
+batcher keeps collecting, and the next batch is dispatched as soon as a worker
+frees up.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+import numpy as np
+
+
+@dataclass
+class _PendingRequest:
+    """Texts submitted by one caller and the future that receives their vectors"""
+    texts: List[str]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent encode requests into batched forward passes.
+
+    Args:
+        encode_fn: Callable taking a list of texts and returning a 2D numpy array
+        max_batch_size: Flush once this many texts are pending
+        max_wait_ms: Flush once the oldest pending text has waited this long
+        executor: Run encode_fn here instead of on the event loop
+        max_concurrency: Batches encoding at once (the executor's worker count)
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        executor: Executor | None = None,
+        max_concurrency: int = 1
+    ):
+        self.encode_fn = encode_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrency = max(1, max_concurrency)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        self._slots: asyncio.Semaphore | None = None
+        # Dispatched batches by the task encoding them
+        self._in_flight: dict[asyncio.Task, List[_PendingRequest]] = {}
+
+        # Counters exposed via /health
+        self.batches = 0
+        self.texts = 0
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._worker is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and fail every request still queued or in flight"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        stopped = RuntimeError("Batcher stopped")
+        for task, batch in list(self._in_flight.items()):
+            task.cancel()
+            self._fail(batch, stopped)
+        self._in_flight.clear()
+
+        while not self._queue.empty():
+            self._fail([self._queue.get_nowait()], stopped)
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Queue texts for the next batch and wait for their embeddings"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(texts=texts, future=future))
+        return await future
+
+    def stats(self) -> dict:
+        """Batching counters for monitoring"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queued_requests": self._queue.qsize(),
+            "in_flight_batches": len(self._in_flight)
+        }
+
+    @staticmethod
+    def _fail(batch: List[_PendingRequest], error: BaseException):
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    async def _collect(self, batch: List[_PendingRequest]):
+        """Block for the first request, then gather more into batch until size or time limit"""
+        first = await self._queue.get()
+        batch.append(first)
+        size = len(first.texts)
+        deadline = first.enqueued_at + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Still take anything already queued without waiting
+                if self._queue.empty():
+                    break
+                pending = self._queue.get_nowait()
+            else:
+                try:
+                    pending = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(pending)
+            size += len(pending.texts)
+
+    async def _run(self):
+        """Flush loop: wait for a free worker, collect a batch, dispatch it as its own task"""
+        loop = asyncio.get_running_loop()
+        batch: List[_PendingRequest] = []
+        try:
+            while True:
+                await self._slots.acquire()
+                batch = []
+                await self._collect(batch)
+                task = loop.create_task(self._flush(batch))
+                self._in_flight[task] = batch
+                task.add_done_callback(self._finished)
+                batch = []
+        except asyncio.CancelledError:
+            # Requests taken off the queue but not dispatched yet
+            self._fail(batch, RuntimeError("Batcher stopped"))
+            raise
+
+    def _finished(self, task: asyncio.Task):
+        self._in_flight.pop(task, None)
+        self._slots.release()
+
+    async def _flush(self, batch: List[_PendingRequest]):
+        """One encode call for a collected batch"""
+        texts = [text for pending in batch for text in pending.texts]
+
+        try:
+            if self.executor is not None:
+                loop = asyncio.get_running_loop()
+                embeddings = await loop.run_in_executor(self.executor, self.encode_fn, texts)
+            else:
+                embeddings = self.encode_fn(texts)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+
+        # Hand each caller its own slice, in submission order
+        offset = 0
+        for pending in batch:
+            count = len(pending.texts)
+            if not pending.future.done():
+                pending.future.set_result(embeddings[offset:offset + count])
+            offset += count
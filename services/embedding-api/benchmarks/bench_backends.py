@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+CPU benchmark and parity check for the inference backends.
+
+For each backend reports cold-start time (construct + first encode),
+steady-state texts/sec, and the lowest cosine similarity against the torch
+baseline on the same texts. Exits non-zero if any backend misses its
+PARITY_TOLERANCE, so it doubles as the parity test.
+
+Usage:
+    python export_onnx.py --output onnx/
+    python benchmarks/bench_backends.py --onnx-dir onnx/ --texts 512
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import BACKENDS, PARITY_TEXTS, PARITY_TOLERANCE, load_backend, normalize  # noqa: E402
+
+WORDS = (
+    "meditation community dome event wellness yoga garden carpool housing ayurveda "
+    "festival music course campus evening morning program group relay channel note"
+).split()
+
+
+def make_corpus(count: int, seed: int = 7) -> list[str]:
+    """Mix of short queries and longer note-like texts"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.choice([4, 12, 40, 120]))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark embedding backends')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--onnx-dir', default=str(Path(__file__).resolve().parent.parent / 'onnx'))
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--texts', type=int, default=512, help='Texts in the throughput corpus')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads')
+
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    corpus = make_corpus(args.texts)
+    texts = PARITY_TEXTS + corpus[:64]
+    reference = None
+    results = []
+
+    # torch first so every other backend can be compared against it
+    for name in sorted(args.backends, key=lambda b: b != "torch"):
+        start = time.perf_counter()
+        backend = load_backend(name, args.model, args.onnx_dir, threads=args.threads)
+        backend.encode(texts[:1])
+        cold_start = time.perf_counter() - start
+
+        vectors = backend.encode(texts)
+        if reference is None:
+            if name != "torch":
+                reference = load_backend("torch", args.model, args.onnx_dir).encode(texts)
+            else:
+                reference = vectors
+        cosine = float(np.min(np.sum(normalize(vectors) * normalize(reference), axis=1)))
+
+        start = time.perf_counter()
+        for i in range(0, len(corpus), args.batch_size):
+            backend.encode(corpus[i:i + args.batch_size])
+        throughput = len(corpus) / (time.perf_counter() - start)
+
+        results.append((name, cold_start, throughput, cosine, cosine >= PARITY_TOLERANCE[name]))
+
+    print(f"\n{len(corpus)} texts, batch size {args.batch_size}, threads {args.threads or 'default'}")
+    print(f"{'backend':<12}{'cold start s':>14}{'texts/s':>10}{'min cosine':>12}{'tolerance':>11}  parity")
+    for name, cold_start, throughput, cosine, ok in results:
+        print(f"{name:<12}{cold_start:>14.2f}{throughput:>10.1f}{cosine:>12.6f}"
+              f"{PARITY_TOLERANCE[name]:>11}  {'OK' if ok else 'FAIL'}")
+
+    return 0 if all(ok for *_, ok in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for /embed micro-batching.
+
+Simulates many concurrent single-text callers against the real model, once
+with every request encoded on its own (batching off) and once through the
+MicroBatcher (batching on), and reports throughput and p50/p99 latency.
+
+Usage:
+    python benchmarks/bench_batching.py --requests 400 --concurrency 40
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batcher import MicroBatcher  # noqa: E402
+
+WORDS = (
+    "meditation community dome event wellness yoga garden carpool housing "
+    "ayurveda festival music course campus evening morning program group"
+).split()
+
+
+def make_queries(count: int, seed: int = 42) -> list[str]:
+    """Short PWA-style search queries of 2-12 words"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(2, 12))) for _ in range(count)]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    return float(np.percentile(np.array(values), pct)) if values else 0.0
+
+
+async def run_load(encode, queries: list[str], concurrency: int) -> dict:
+    """Fire queries with bounded concurrency and time each one"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await encode([text])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": len(queries) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99)
+    }
+
+
+async def bench(model_name: str, requests: int, concurrency: int, max_batch: int, max_wait_ms: float):
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Loading model: {model_name}")
+    model = SentenceTransformer(model_name)
+
+    def encode_texts(texts):
+        return model.encode(texts, convert_to_numpy=True, show_progress_bar=False,
+                            normalize_embeddings=True)
+
+    queries = make_queries(requests)
+    encode_texts(queries[:8])  # warm-up
+
+    async def unbatched(texts):
+        # Mirrors the old handler: one blocking encode per request
+        return encode_texts(texts)
+
+    results = {"off": await run_load(unbatched, queries, concurrency)}
+
+    batcher = MicroBatcher(encode_texts, max_batch_size=max_batch, max_wait_ms=max_wait_ms)
+    batcher.start()
+    results["on"] = await run_load(batcher.encode, queries, concurrency)
+    stats = batcher.stats()
+    await batcher.stop()
+
+    print(f"\n{requests} requests, concurrency {concurrency}, "
+          f"batch <= {max_batch} texts / {max_wait_ms}ms")
+    print(f"{'batching':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['throughput']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print(f"\nAverage batch size with batching on: {stats['avg_batch_size']}")
+    print(f"Speedup: {results['on']['throughput'] / results['off']['throughput']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /embed micro-batching')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--requests', type=int, default=400, help='Total single-text requests')
+    parser.add_argument('--concurrency', type=int, default=40, help='Concurrent callers')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+
+    args = parser.parse_args()
+
+    asyncio.run(bench(args.model, args.requests, args.concurrency,
+                      args.max_batch_size, args.max_wait_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark filtered /search at selectivities from 50% down to 0.1%.
+
+Writes clustered synthetic vectors as an exact index and an HNSW graph plus
+label-ordered filter metadata (scripts/embeddings/note_metadata.py), with
+created_at drawn independently of the vectors. Each selectivity becomes a
+`since` filter matching that fraction of notes, and every strategy answers
+the same queries:
+
+    post-filter   global top-k, then drop non-matching hits (what clients did)
+    brute force   score only the matching vectors, mapped from the graph file
+    hnsw filter   graph walk with a filter callback
+    auto          HnswSearcher's choice by estimated cost
+    exact         the exact index's filtered search
+
+Recall@k is against exact filtered search. The brute force and hnsw filter
+timings calibrate GATHER_COST and FILTER_COST in search_index.py.
+
+Usage:
+    python benchmarks/bench_filtered_search.py --vectors 200000 --dir /tmp/filter-bench
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent.parent / 'scripts' / 'embeddings'))
+
+from bench_search import DIMENSIONS, synthetic_chunks  # noqa: E402
+from search_index import ExactSearcher, FilterColumns, HnswSearcher  # noqa: E402
+
+SELECTIVITIES = [0.5, 0.2, 0.1, 0.05, 0.02, 0.01, 0.005, 0.002, 0.001]
+
+
+def write_corpus(root: Path, args, centers: np.ndarray):
+    import hnswlib
+    from exact_search import ExactIndex
+    from note_metadata import NoteMetadata
+    from quantization import quantize_int8
+
+    root.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(1)
+    quantized = np.empty((args.vectors, DIMENSIONS), dtype=np.int8)
+    hnsw = hnswlib.Index(space='cosine', dim=DIMENSIONS)
+    hnsw.init_index(max_elements=args.vectors, M=args.m, ef_construction=args.ef_construction)
+
+    start = time.perf_counter()
+    offset = 0
+    for rows in synthetic_chunks(rng, centers, args.vectors, 50_000):
+        quantized[offset:offset + len(rows)] = quantize_int8(rows, 'per-vector')[0]
+        hnsw.add_items(rows, np.arange(offset, offset + len(rows)), num_threads=-1)
+        offset += len(rows)
+        print(f"  {offset:,} vectors ({time.perf_counter() - start:.0f}s)", flush=True)
+
+    ExactIndex(quantized, 'per-vector').save(str(root / 'index.bin'))
+    hnsw.save_index(str(root / 'index_hnsw.bin'))
+    metadata = NoteMetadata.empty(args.vectors)
+    metadata.kinds[:] = 1
+    # One second per note, shuffled so time is independent of the vectors
+    metadata.created_at[:] = rng.permutation(args.vectors) + 1
+    metadata.save(str(root / 'index_metadata.npz'))
+
+
+def run(search, queries: np.ndarray, k: int) -> tuple[list, float, float]:
+    found, times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(search(query)[0][:k])
+        times.append((time.perf_counter() - start) * 1000)
+    return found, float(np.percentile(times, 50)), float(np.percentile(times, 99))
+
+
+def recall(found: list, truth: list) -> float:
+    hits = sum(len(set(f.tolist()) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / max(sum(len(t) for t in truth), 1)
+
+
+def bench(args):
+    root = Path(args.dir)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(args.vectors // 150, 1), DIMENSIONS)).astype(np.float32)
+    queries = next(synthetic_chunks(np.random.default_rng(99), centers, args.queries, args.queries))
+
+    if not (root / 'index_metadata.npz').exists():
+        print(f"Writing {args.vectors:,} synthetic vectors to {root}...")
+        write_corpus(root, args, centers)
+
+    columns = FilterColumns(str(root / 'index_metadata.npz'))
+    exact = ExactSearcher(str(root / 'index.bin'))
+    hnsw = HnswSearcher(str(root / 'index_hnsw.bin'), DIMENSIONS, args.vectors, args.ef)
+    k = args.k
+
+    print(f"\n{args.vectors:,} vectors, k={k}, ef={args.ef}, {args.queries} queries; p50/p99 ms and recall@{k}")
+    print(f"{'selectivity':>11}{'matches':>9}  {'strategy':<13}{'p50 ms':>9}{'p99 ms':>9}{'recall':>8}")
+    for selectivity in SELECTIVITIES:
+        since = args.vectors - int(args.vectors * selectivity) + 1
+        start = time.perf_counter()
+        allowed = columns.mask(since=since)
+        mask_ms = (time.perf_counter() - start) * 1000
+        matches = int(allowed.sum())
+        truth = [exact.search(query, k, allowed=allowed)[0] for query in queries]
+
+        def post_filter(query):
+            labels, scores = hnsw.search(query, k)
+            return labels[allowed[labels]], scores
+
+        strategies = {
+            "post-filter": post_filter,
+            "brute force": lambda query: hnsw.search(query, k, allowed=allowed, strategy="brute"),
+            "hnsw filter": lambda query: hnsw.search(query, k, allowed=allowed, strategy="graph"),
+            "auto": lambda query: hnsw.search(query, k, allowed=allowed),
+            "exact": lambda query: exact.search(query, k, allowed=allowed),
+        }
+        for i, (name, search) in enumerate(strategies.items()):
+            found, p50, p99 = run(search, queries, k)
+            label = f"{selectivity:>10.1%}{matches:>10,}" if i == 0 else f"{'':>20}"
+            print(f"{label}  {name:<13}{p50:>9.2f}{p99:>9.2f}{recall(found, truth):>8.3f}")
+        print(f"{'':>20}  (mask {mask_ms:.2f} ms, auto picks {hnsw.strategy(matches, k)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark filtered search strategies by selectivity')
+    parser.add_argument('--vectors', type=int, default=200_000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--ef', type=int, default=64)
+    parser.add_argument('--m', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=100)
+    parser.add_argument('--dir', default='filter-bench', help='Working directory (reused between runs)')
+    bench(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark /health latency while /embed is under load.
+
+Runs the app in-process (real model, real lifespan) and polls /health at a
+fixed rate, first with no other traffic and then while a pool of clients keeps
+/embed saturated. With inference on the dedicated pool the two latency
+distributions should be nearly identical; 429s show admission control kicking in.
+
+Usage:
+    python benchmarks/bench_health_latency.py --duration 15 --embed-clients 32
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def poll_health(client, duration: float, interval: float) -> list[float]:
+    """Hit /health every interval seconds and record latency in ms"""
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def embed_load(client, duration: float, texts_per_request: int, statuses: Counter):
+    """Keep one client busy sending /embed requests until duration elapses"""
+    payload = {"text": ["a moderately long community note about the evening program"] * texts_per_request}
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        response = await client.post("/embed", json=payload)
+        statuses[response.status_code] += 1
+        if response.status_code == 429:
+            await asyncio.sleep(0.05)
+
+
+def summarize(label: str, latencies: list[float]):
+    values = np.array(latencies)
+    print(f"{label:<12}{len(values):>8}{np.percentile(values, 50):>10.2f}"
+          f"{np.percentile(values, 99):>10.2f}{values.max():>10.2f}")
+
+
+async def bench(duration: float, embed_clients: int, texts_per_request: int, interval: float):
+    import httpx
+    import main
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            idle = await poll_health(client, duration / 2, interval)
+
+            statuses = Counter()
+            loaded, *_ = await asyncio.gather(
+                poll_health(client, duration, interval),
+                *(embed_load(client, duration, texts_per_request, statuses) for _ in range(embed_clients))
+            )
+
+    print(f"\n/health latency (ms), {embed_clients} embed clients x {texts_per_request} texts")
+    print(f"{'phase':<12}{'samples':>8}{'p50':>10}{'p99':>10}{'max':>10}")
+    summarize("idle", idle)
+    summarize("under load", loaded)
+    print(f"\n/embed responses: {dict(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /health latency under /embed load')
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds of embed load')
+    parser.add_argument('--embed-clients', type=int, default=32, help='Concurrent /embed clients')
+    parser.add_argument('--texts-per-request', type=int, default=8)
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between /health polls')
+
+    args = parser.parse_args()
+
+    asyncio.run(bench(args.duration, args.embed_clients, args.texts_per_request, args.interval))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark /search index latency and hot swaps at 1M vectors.
+
+Writes a synthetic published layout (manifest.json, v1/index.bin,
+v1/index_mapping.bin) with the scripts/embeddings writers: a memory-mapped
+per-vector int8 exact index and, with --hnsw, an HNSW graph over the same
+vectors. Reports load time and single-query p50/p99 per k and ef (plus HNSW
+recall against the exact index), then publishes version 2 while a thread
+keeps querying and checks that no query fails across the swap.
+
+The model is not involved; embedding cost is covered by bench_backends.py.
+
+Usage:
+    python benchmarks/bench_search.py --vectors 1000000 --hnsw --dir /tmp/search-bench
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent.parent / 'scripts' / 'embeddings'))
+
+from search_index import IndexStore  # noqa: E402
+
+DIMENSIONS = 384
+
+
+def synthetic_chunks(rng, centers: np.ndarray, count: int, chunk: int):
+    """Unit vectors around shared cluster centers, chunk rows at a time"""
+    for start in range(0, count, chunk):
+        rows = centers[rng.integers(0, len(centers), min(chunk, count - start))]
+        rows = rows + 0.6 * rng.standard_normal(rows.shape).astype(np.float32)
+        yield rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def write_version(root: Path, version: int, args, centers: np.ndarray):
+    from exact_search import ExactIndex
+    from label_mapping import write_mapping
+    from quantization import quantize_int8
+
+    target = root / f"v{version}"
+    target.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(version)
+    quantized = np.empty((args.vectors, DIMENSIONS), dtype=np.int8)
+    hnsw = None
+    if args.hnsw:
+        import hnswlib
+        hnsw = hnswlib.Index(space='cosine', dim=DIMENSIONS)
+        hnsw.init_index(max_elements=args.vectors, M=args.m, ef_construction=args.ef_construction)
+
+    start = time.perf_counter()
+    offset = 0
+    for rows in synthetic_chunks(rng, centers, args.vectors, 100_000):
+        quantized[offset:offset + len(rows)] = quantize_int8(rows, 'per-vector')[0]
+        if hnsw is not None:
+            hnsw.add_items(rows, np.arange(offset, offset + len(rows)), num_threads=-1)
+        offset += len(rows)
+        print(f"  v{version}: {offset:,} vectors ({time.perf_counter() - start:.0f}s)", flush=True)
+
+    ExactIndex(quantized, 'per-vector').save(str(target / 'index.bin'))
+    if hnsw is not None:
+        hnsw.save_index(str(target / 'index_hnsw.bin'))
+    write_mapping(str(target / 'index_mapping.bin'), rng.integers(0, 256, (args.vectors, 32), dtype=np.uint8))
+
+
+def publish(root: Path, version: int, index_file: str):
+    manifest = {
+        "version": version,
+        "dimensions": DIMENSIONS,
+        "files": {"index": f"v{version}/{index_file}", "index_mapping": f"v{version}/index_mapping.bin"}
+    }
+    tmp = root / 'manifest.json.tmp'
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, root / 'manifest.json')
+
+
+def latency(store: IndexStore, queries: np.ndarray, k: int, ef: int | None) -> tuple[list, float, float]:
+    index = store.current
+    found, times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(index.search(query, k, ef))
+        times.append((time.perf_counter() - start) * 1000)
+    return found, float(np.percentile(times, 50)), float(np.percentile(times, 99))
+
+
+def recall(found: list, truth: list) -> float:
+    hits = sum(len({r["id"] for r in f} & {r["id"] for r in t}) for f, t in zip(found, truth))
+    return hits / sum(len(t) for t in truth)
+
+
+async def bench(args):
+    root = Path(args.dir)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(args.vectors // 150, 1), DIMENSIONS)).astype(np.float32)
+    queries = next(synthetic_chunks(np.random.default_rng(99), centers, args.queries, args.queries))
+
+    if not (root / 'v1' / 'index_mapping.bin').exists():
+        print(f"Writing {args.vectors:,} synthetic vectors to {root}...")
+        write_version(root, 1, args, centers)
+
+    engines = ['index.bin'] + (['index_hnsw.bin'] if args.hnsw else [])
+    truth = {}
+    print(f"\n{'index':<8}{'k':>5}{'ef':>6}{'p50 ms':>9}{'p99 ms':>9}{'recall':>9}")
+    for index_file in engines:
+        publish(root, 1, index_file)
+        store = IndexStore(str(root))
+        start = time.perf_counter()
+        await store.refresh()
+        load = time.perf_counter() - start
+        kind = store.current.index_type
+        for k in args.k:
+            for ef in ([None] if kind == 'exact' else args.ef):
+                found, p50, p99 = latency(store, queries, k, ef)
+                if kind == 'exact':
+                    truth[k] = found
+                score = f"{recall(found, truth[k]):>9.4f}" if k in truth else f"{'':>9}"
+                print(f"{kind:<8}{k:>5}{ef or '-':>6}{p50:>9.2f}{p99:>9.2f}{score}")
+        print(f"{kind:<8}loaded in {load * 1000:.0f} ms\n")
+
+    # Hot swap under load: v2 links to v1's files, so only the swap itself is measured
+    last = engines[-1]
+    (root / 'v2').mkdir(exist_ok=True)
+    for name in (last, 'index_mapping.bin'):
+        if not (root / 'v2' / name).exists():
+            os.link(root / 'v1' / name, root / 'v2' / name)
+    publish(root, 1, last)
+    store = IndexStore(str(root))
+    await store.refresh()
+
+    stop = threading.Event()
+    counts = {"queries": 0, "errors": 0, "versions": set()}
+
+    def query_loop():
+        i = 0
+        while not stop.is_set():
+            index = store.current
+            try:
+                index.search(queries[i % len(queries)], 10)
+                counts["versions"].add(index.version)
+                counts["queries"] += 1
+            except Exception:
+                counts["errors"] += 1
+            i += 1
+
+    worker = threading.Thread(target=query_loop)
+    worker.start()
+    await asyncio.sleep(1.0)
+    publish(root, 2, last)
+    start = time.perf_counter()
+    swapped = await store.refresh()
+    swap = time.perf_counter() - start
+    await asyncio.sleep(1.0)
+    stop.set()
+    worker.join()
+    print(f"Hot swap ({store.current.index_type}): swapped={swapped} in {swap * 1000:.0f} ms, "
+          f"{counts['queries']} queries across versions {sorted(counts['versions'])}, {counts['errors']} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /search index latency and hot swaps')
+    parser.add_argument('--vectors', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--ef', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--hnsw', action='store_true', help='Also build and benchmark an HNSW graph')
+    parser.add_argument('--m', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=100)
+    parser.add_argument('--dir', default='search-bench', help='Working directory (reused between runs)')
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
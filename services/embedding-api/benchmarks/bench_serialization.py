@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark /embed response serialization: JSON vs binary bodies.
+
+Times only the work done after model.encode() returns, using the exact code
+paths in main.py (EmbedResponse + FastAPI's JSON encoding) and formats.py
+(raw / .npy buffers), and reports payload size for each format.
+
+Usage:
+    python benchmarks/bench_serialization.py --count 100 --repeat 200
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from formats import NPY, OCTET_STREAM, binary_response  # noqa: E402
+
+
+class EmbedResponse(BaseModel):
+    """Same shape as main.EmbedResponse (importing main pulls in torch)"""
+    embeddings: List[List[float]]
+    dimensions: int
+    count: int
+
+
+def json_body(embeddings: np.ndarray) -> bytes:
+    """Serialize the way the JSON path does: tolist -> EmbedResponse -> JSONResponse"""
+    embeddings_list = embeddings.tolist()
+    response = EmbedResponse(
+        embeddings=embeddings_list,
+        dimensions=embeddings.shape[1],
+        count=len(embeddings_list)
+    )
+    return JSONResponse(content=jsonable_encoder(response)).body
+
+
+def time_it(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /embed response serialization')
+    parser.add_argument('--count', type=int, default=100, help='Texts per response')
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--repeat', type=int, default=200)
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((args.count, args.dimensions)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    cases = [("json", lambda: json_body(embeddings))]
+    for media_type, label in ((OCTET_STREAM, "raw"), (NPY, "npy")):
+        for dtype in ("float32", "float16", "int8"):
+            cases.append((
+                f"{label}/{dtype}",
+                lambda m=media_type, d=dtype: binary_response(embeddings, m, d).body
+            ))
+
+    print(f"{args.count} x {args.dimensions} embeddings, median of {args.repeat} runs\n")
+    print(f"{'format':<14}{'ms':>10}{'bytes':>12}{'vs json':>10}")
+
+    baseline_ms = baseline_bytes = None
+    for label, fn in cases:
+        size = len(fn())
+        ms = time_it(fn, args.repeat)
+        if baseline_ms is None:
+            baseline_ms, baseline_bytes = ms, size
+        print(f"{label:<14}{ms:>10.3f}{size:>12,}{baseline_ms / ms:>9.1f}x")
+
+    print(f"\nJSON payload is {baseline_bytes / (args.count * args.dimensions):.1f} bytes per component")
+
+
+if __name__ == '__main__':
+    main()
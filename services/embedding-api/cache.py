@@ -0,0 +1,117 @@
+"""
+Content-addressed LRU cache for embedding vectors.
+
+Search traffic repeats the same queries and pipeline reruns re-embed the same
+note texts. Entries are keyed by a SHA-256 of the model name plus normalized
+text, bounded by a memory budget, and evicted least-recently-used first. The
+cache can optionally be saved to and restored from a local .npz file so a warm
+set survives cold starts when the path is on a persistent volume.
+"""
+
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# Approximate per-entry bookkeeping cost (OrderedDict node, key bytes, array header)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, collapsed whitespace, stripped"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU map from content hash to embedding vector.
+
+    Args:
+        model_name: Included in every key so different models never collide
+        max_bytes: Memory budget for stored vectors plus bookkeeping
+    """
+
+    def __init__(self, model_name: str, max_bytes: int):
+        self.model_name = model_name
+        self.max_bytes = max(0, max_bytes)
+        self._entries: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> bytes:
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalize_text(text).encode('utf-8'))
+        return digest.digest()
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        vector = self._entries.get(key)
+        if vector is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, key: bytes, vector: np.ndarray):
+        cost = vector.nbytes + ENTRY_OVERHEAD_BYTES
+        if cost > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes_used -= previous.nbytes + ENTRY_OVERHEAD_BYTES
+
+        # Own a compact copy so cached rows don't pin whole batch arrays
+        self._entries[key] = np.array(vector, dtype=np.float32, copy=True)
+        self.bytes_used += cost
+
+        while self.bytes_used > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes_used -= evicted.nbytes + ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def lookup(self, texts: List[str]) -> tuple[list[bytes], list[np.ndarray | None]]:
+        """Keys and cached vectors (None for misses) for each text, in order"""
+        keys = [self.key(text) for text in texts]
+        return keys, [self.get(key) for key in keys]
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def save(self, path: str):
+        """Write entries (least to most recently used) to an .npz file"""
+        if not self._entries:
+            return
+        keys = np.frombuffer(b''.join(self._entries.keys()), dtype=np.uint8).reshape(-1, 32)
+        vectors = np.stack(list(self._entries.values()))
+        tmp_path = Path(path).with_suffix('.tmp.npz')
+        np.savez(tmp_path, model=self.model_name, keys=keys, vectors=vectors)
+        tmp_path.replace(path)
+
+    def load(self, path: str) -> int:
+        """Restore entries saved by save(); skips files written for another model"""
+        if not Path(path).exists():
+            return 0
+        data = np.load(path)
+        if str(data['model']) != self.model_name:
+            return 0
+        for key, vector in zip(data['keys'], data['vectors']):
+            self.put(key.tobytes(), vector)
+        return len(self._entries)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Export the embedding model to ONNX (fp32 and dynamic int8) and verify parity.
+
+Run at image build time so the onnx / onnx-int8 backends start without torch
+doing any work. Each exported graph is checked against the torch backend on
+PARITY_TEXTS; the script exits non-zero if any backend falls below its
+PARITY_TOLERANCE, which fails the Docker build instead of shipping bad vectors.
+
+Usage:
+    python export_onnx.py --output onnx/
+"""
+
+import argparse
+import inspect
+import sys
+from pathlib import Path
+
+from backends import ONNX_FILES, PARITY_TEXTS, PARITY_TOLERANCE, OnnxBackend, TorchBackend, parity
+
+
+def export_fp32(reference: TorchBackend, output_path: Path, opset: int = 14):
+    """Export the underlying transformer (token embeddings, before pooling)"""
+    import torch
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Named inputs in, last_hidden_state tensor out (no ModelOutput wrapper)"""
+
+        def __init__(self, transformer, input_names):
+            super().__init__()
+            self.transformer = transformer
+            self.input_names = input_names
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(self.input_names, inputs)))[0]
+
+    tokenizer = reference.model.tokenizer
+    sample = tokenizer(["export sample text", "a second, longer export sample text"],
+                       padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    transformer = TokenEmbeddings(reference.model[0].auto_model.eval(), input_names)
+
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(output_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+            **extra
+        )
+
+
+def export_int8(fp32_path: Path, output_path: Path):
+    """Dynamic (weight-only, per-channel) int8 quantization of the fp32 graph"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(
+        str(fp32_path),
+        str(output_path),
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export embedding model to ONNX and verify parity')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--output', default='onnx', help='Directory for model.onnx / model_int8.onnx')
+    parser.add_argument('--opset', type=int, default=14)
+
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = output_dir / ONNX_FILES["onnx"]
+    int8_path = output_dir / ONNX_FILES["onnx-int8"]
+
+    print(f"Loading torch reference: {args.model}")
+    reference = TorchBackend(args.model)
+    reference_vectors = reference.encode(PARITY_TEXTS)
+
+    print(f"Exporting {fp32_path}...")
+    export_fp32(reference, fp32_path, args.opset)
+    print(f"Quantizing to {int8_path}...")
+    export_int8(fp32_path, int8_path)
+
+    failed = False
+    for name, path in (("onnx", fp32_path), ("onnx-int8", int8_path)):
+        backend = OnnxBackend(args.model, str(path))
+        cosine = parity(backend, reference_vectors)
+        ok = cosine >= PARITY_TOLERANCE[name]
+        failed |= not ok
+        size_mb = path.stat().st_size / 1024 / 1024
+        print(f"  {name:<10} {size_mb:6.1f} MB  min cosine {cosine:.6f} "
+              f"(>= {PARITY_TOLERANCE[name]}) {'OK' if ok else 'FAIL'}")
+
+    if failed:
+        print("Parity check failed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
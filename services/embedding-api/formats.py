@@ -0,0 +1,88 @@
+"""
+Binary response encodings for /embed.
+
+JSON output turns every component into a Python float and then into text,
+which for short inputs costs more CPU than the model itself. Clients that send
+an Accept header of application/octet-stream or application/x-npy get the
+contiguous numpy buffer instead, optionally narrowed to float16 or int8.
+
+Raw buffers are little-endian, row-major, shape (count, dimensions). Shape and
+dtype travel in response headers; int8 output uses the same global min/scale
+scheme as scripts/embeddings/generate_embeddings.py and reports both values so
+clients can dequantize with ((q + 128) / scale) + min.
+"""
+
+import io
+
+import numpy as np
+from fastapi import Response
+
+OCTET_STREAM = "application/octet-stream"
+NPY = "application/x-npy"
+BINARY_MEDIA_TYPES = (OCTET_STREAM, NPY)
+DTYPES = ("float32", "float16", "int8")
+
+# Headers browsers may read on cross-origin responses
+EXPOSED_HEADERS = [
+    "X-Embedding-Shape",
+    "X-Embedding-Dtype",
+    "X-Quantize-Min",
+    "X-Quantize-Scale"
+]
+
+
+def negotiate(accept: str | None) -> str | None:
+    """Pick a binary media type from an Accept header, or None for JSON"""
+    if not accept:
+        return None
+
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media == "application/json" and q >= best_q:
+            # An explicit JSON preference wins ties
+            best, best_q = None, q
+        elif media in BINARY_MEDIA_TYPES and q > best_q:
+            best, best_q = media, q
+    return best
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, float, float]:
+    """Global min/max int8 quantization, the offline pipeline's "global" scheme"""
+    vmin = vectors.min()
+    vmax = vectors.max()
+    scale = 255.0 / (vmax - vmin + 1e-8)
+    quantized = (np.round((vectors - vmin) * scale) - 128).clip(-128, 127).astype(np.int8)
+    return quantized, float(vmin), float(scale)
+
+
+def binary_response(embeddings: np.ndarray, media_type: str, dtype: str = "float32") -> Response:
+    """Serialize embeddings as a raw or .npy buffer without touching pydantic"""
+    headers = {}
+
+    if dtype == "int8":
+        array, vmin, scale = quantize_int8(embeddings)
+        headers["X-Quantize-Min"] = repr(vmin)
+        headers["X-Quantize-Scale"] = repr(scale)
+    else:
+        array = embeddings.astype(np.dtype(dtype).newbyteorder("<"), copy=False)
+
+    array = np.ascontiguousarray(array)
+    headers["X-Embedding-Shape"] = ",".join(str(n) for n in array.shape)
+    headers["X-Embedding-Dtype"] = dtype
+
+    if media_type == NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        body = buffer.getvalue()
+    else:
+        body = array.tobytes()
+
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,77 @@
+"""
+Bounded executor for CPU-bound model inference.
+
+model.encode() holds the CPU for tens to hundreds of milliseconds. Running it
+directly inside an async handler stalls the uvicorn event loop, so /health
+probes and unrelated requests queue behind every forward pass. InferencePool
+runs encode calls on a small dedicated thread pool (torch releases the GIL in
+its kernels) and caps how many requests may wait for it, so overload turns
+into fast 429 responses instead of an ever-growing pile of coroutines.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable
+
+
+class PoolSaturated(Exception):
+    """Raised when too many requests are already waiting for inference"""
+
+
+class InferencePool:
+    """
+    Dedicated thread pool plus admission control for model inference.
+
+    Args:
+        max_workers: Threads running encode calls concurrently
+        torch_threads: torch intra-op thread count (None leaves torch's default)
+        max_pending: Requests allowed to wait for or run inference at once
+    """
+
+    def __init__(self, max_workers: int = 1, torch_threads: int | None = None, max_pending: int = 64):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.torch_threads = torch_threads
+
+        if torch_threads:
+            # Keep workers x intra-op threads within the container's vCPUs
+            import torch
+            torch.set_num_threads(torch_threads)
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference"
+        )
+        self.pending = 0
+        self.rejected = 0
+
+    @contextmanager
+    def admit(self):
+        """Reserve a pending slot for one request or raise PoolSaturated"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated(f"{self.pending} requests already waiting for inference")
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) on the inference threads without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def stats(self) -> dict:
+        """Pool counters for monitoring"""
+        return {
+            "workers": self.max_workers,
+            "torch_threads": self.torch_threads,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
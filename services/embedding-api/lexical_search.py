@@ -0,0 +1,133 @@
+"""
+BM25 lexical search and rank fusion for /search.
+
+Reads the pipeline's lexical.bin (scripts/embeddings/lexical_index.py) through
+one read-only memory map: a query binary-searches the sorted vocabulary and
+decodes only its own terms' varint postings. Like the vector index, the
+file is shared by every worker on the host via the page cache.
+
+Fusion joins semantic and lexical rankings on event id, either by reciprocal
+rank (robust to the two score scales) or by a weighted sum of min-max
+normalized scores.
+"""
+
+import bisect
+import re
+import struct
+
+import numpy as np
+
+# scripts/embeddings/lexical_index.py
+LEXICAL_MAGIC = b'NBLX'
+LEXICAL_HEADER = struct.Struct('<4sHHIIfff4x6Q')
+ID_BYTES = 32
+RRF_K = 60
+
+TOKEN = re.compile(r"\w+(?:-\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Same tokens as the index builder: lowercased words, hyphenated slugs whole and by part"""
+    tokens = []
+    for token in TOKEN.findall(text.casefold()):
+        tokens.append(token)
+        if '-' in token:
+            tokens.extend(token.split('-'))
+    return tokens
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """LEB128 varints (7 bits per byte, high bit = more follows) to int64"""
+    last = data < 0x80
+    group = np.concatenate(([0], np.cumsum(last)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    position = np.arange(len(data)) - starts[group]
+    weights = (data & 0x7F).astype(np.float64) * np.exp2(7.0 * position)
+    return np.bincount(group, weights=weights, minlength=len(starts)).astype(np.int64)
+
+
+class _Terms:
+    """Sequence view of the vocab blob, for bisect"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class LexicalSearcher:
+    """Memory-mapped BM25 index"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            header = f.read(LEXICAL_HEADER.size)
+        magic, version, flags, docs, terms, avg_length, k1, b, *offsets = LEXICAL_HEADER.unpack(header)
+        if magic != LEXICAL_MAGIC:
+            raise ValueError(f"{path} is not a lexical index")
+        ids_at, lengths_at, vocab_at, df_at, postings_at, blob_at = offsets
+
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.docs, self.k1, self.b = docs, k1, b
+        self.avg_length = avg_length or 1.0
+        self.ids = data[ids_at:ids_at + docs * ID_BYTES].reshape(docs, ID_BYTES)
+        self.lengths = data[lengths_at:lengths_at + 2 * docs].view('<u2')
+        vocab_offsets = data[vocab_at:vocab_at + 4 * (terms + 1)].view('<u4')
+        self.terms = _Terms(vocab_offsets, data[vocab_at + vocab_offsets.nbytes:])
+        self.df = data[df_at:df_at + 4 * terms].view('<u4')
+        self.posting_offsets = data[postings_at:postings_at + 8 * (terms + 1)].view('<u8')
+        self.postings = data[blob_at:]
+
+    def search(self, query: str, k: int) -> list[dict]:
+        """Top-k {"id", "score"} hits by BM25, best first"""
+        hits, contributions = [], []
+        for term in set(tokenize(query)):
+            key = term.encode('utf-8')
+            term_id = bisect.bisect_left(self.terms, key)
+            if term_id >= len(self.terms) or self.terms[term_id] != key:
+                continue
+            start, end = self.posting_offsets[term_id], self.posting_offsets[term_id + 1]
+            pairs = decode_varints(self.postings[start:end])
+            docs, tfs = np.cumsum(pairs[0::2]), pairs[1::2]
+            df = float(self.df[term_id])
+            idf = np.log1p((self.docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / self.avg_length)
+            hits.append(docs)
+            contributions.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        if not hits:
+            return []
+
+        docs, slots = np.unique(np.concatenate(hits), return_inverse=True)
+        scores = np.bincount(slots, weights=np.concatenate(contributions))
+        k = min(k, len(docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [{"id": self.ids[docs[i]].tobytes().hex(), "score": round(float(scores[i]), 6)} for i in top]
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], k: int, rrf_k: int = RRF_K) -> list[dict]:
+    """Fuse ranked hit lists by sum of 1 / (rrf_k + rank)"""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1.0 / (rrf_k + rank + 1)
+    fused = sorted(scores.items(), key=lambda item: -item[1])[:k]
+    return [{"id": event_id, "score": round(score, 6)} for event_id, score in fused]
+
+
+def weighted_fusion(rankings: list[list[dict]], weights: list[float], k: int) -> list[dict]:
+    """Fuse hit lists by weighted sum of per-list min-max normalized scores"""
+    scores: dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        low = min(hit["score"] for hit in ranking)
+        span = max(hit["score"] for hit in ranking) - low or 1.0
+        for hit in ranking:
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + weight * (hit["score"] - low) / span
+    fused = sorted(scores.items(), key=lambda item: -item[1])[:k]
+    return [{"id": event_id, "score": round(score, 6)} for event_id, score in fused]
@@ -3,30 +3,123 @@ Cloud Run Embedding API Service
 Generates text embeddings using sentence-transformers all-MiniLM-L6-v2 model (384 dimensions)
 """
 
+import asyncio
 import os
-from typing import List, Union
+from typing import List, Literal, Union
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from sentence_transformers import SentenceTransformer
+from starlette.requests import ClientDisconnect
 import numpy as np
 
+from backends import load_backend
+from batcher import MicroBatcher
+from cache import EmbeddingCache
+from formats import DTYPES, EXPOSED_HEADERS, OCTET_STREAM, binary_response, negotiate
+from inference import InferencePool, PoolSaturated
+from lexical_search import reciprocal_rank_fusion, weighted_fusion
+from search_index import IndexStore
+from streaming import NDJSON, RequestStreamingResponse, binary_frame, ndjson_lines, read_batches, stream_error
+
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Inference backend: torch (default), onnx or onnx-int8
+BACKEND = os.getenv("EMBED_BACKEND", "torch")
+ONNX_DIR = os.getenv("EMBED_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx"))
 
 # Global model instance (loaded once at startup)
 model = None
 
+# Request coalescing: concurrent /embed calls share one forward pass
+BATCHING_ENABLED = os.getenv("EMBED_BATCHING", "true").lower() in ("1", "true", "yes")
+BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+batcher: MicroBatcher | None = None
+
+# Inference runs on a bounded pool so the event loop stays responsive
+INFERENCE_WORKERS = int(os.getenv("EMBED_INFERENCE_WORKERS", "1"))
+TORCH_THREADS = int(os.getenv("EMBED_TORCH_THREADS", "0")) or None
+MAX_PENDING = int(os.getenv("EMBED_MAX_PENDING", "64"))
+pool: InferencePool | None = None
+
+# Content-addressed LRU cache; repeated texts skip the model entirely
+CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "64"))
+CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+cache: EmbeddingCache | None = None
+
+# Bulk NDJSON streaming: input is embedded in batches of this many texts
+STREAM_BATCH_SIZE = int(os.getenv("EMBED_STREAM_BATCH_SIZE", "64"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("EMBED_STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
+# /search: manifest.json and the index files it lists (empty disables search)
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "")
+SEARCH_RELOAD_SECONDS = float(os.getenv("SEARCH_RELOAD_SECONDS", "30"))
+# Hybrid mode fuses this many hits (at least k) from each ranking
+SEARCH_FUSION_DEPTH = int(os.getenv("SEARCH_FUSION_DEPTH", "50"))
+index_store: IndexStore | None = None
+
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """Run the model on a list of texts, returning L2-normalized float32 vectors"""
+    return model.encode(texts)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load model at startup to avoid cold start delays"""
-    global model
-    print("Loading sentence-transformers model...")
-    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    print(f"Model loaded. Embedding dimensions: {model.get_sentence_embedding_dimension()}")
+    global model, batcher, pool, cache, index_store
+    print(f"Loading {BACKEND} backend for {MODEL_NAME}...")
+    model = load_backend(BACKEND, MODEL_NAME, ONNX_DIR, threads=TORCH_THREADS)
+    print(f"Model loaded. Embedding dimensions: {model.dimensions}")
+
+    pool = InferencePool(
+        max_workers=INFERENCE_WORKERS,
+        torch_threads=TORCH_THREADS if BACKEND == "torch" else None,
+        max_pending=MAX_PENDING
+    )
+    print(f"Inference pool: {INFERENCE_WORKERS} worker(s), max {MAX_PENDING} pending requests")
+
+    if CACHE_MAX_MB > 0:
+        cache = EmbeddingCache(MODEL_NAME, max_bytes=int(CACHE_MAX_MB * 1024 * 1024))
+        if CACHE_PATH:
+            restored = cache.load(CACHE_PATH)
+            print(f"Restored {restored} cached embeddings from {CACHE_PATH}")
+
+    if BATCHING_ENABLED:
+        batcher = MicroBatcher(
+            encode_texts,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            executor=pool.executor,
+            max_concurrency=INFERENCE_WORKERS
+        )
+        batcher.start()
+        print(f"Micro-batching enabled (max {BATCH_MAX_SIZE} texts, {BATCH_MAX_WAIT_MS}ms wait)")
+
+    if SEARCH_INDEX_DIR:
+        index_store = IndexStore(SEARCH_INDEX_DIR, poll_seconds=SEARCH_RELOAD_SECONDS)
+        await index_store.refresh()
+        index_store.start()
+        print(f"Search index: {index_store.stats()}")
+
     yield
     # Cleanup (if needed)
+    if index_store is not None:
+        await index_store.stop()
+        index_store = None
+    if cache is not None:
+        if CACHE_PATH:
+            cache.save(CACHE_PATH)
+            print(f"Saved {cache.stats()['entries']} cached embeddings to {CACHE_PATH}")
+        cache = None
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+    pool.shutdown()
+    pool = None
     model = None
 
 
@@ -46,6 +139,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=EXPOSED_HEADERS,
 )
 
 
@@ -73,30 +167,143 @@ class EmbedResponse(BaseModel):
     )
 
 
+async def encode_uncached(texts: List[str]) -> np.ndarray:
+    """
+    Encode texts off the event loop, coalescing with concurrent requests when batching.
+
+    Raises:
+        HTTPException(429) when the inference pool already has too many waiting requests
+    """
+    try:
+        with pool.admit():
+            if batcher is not None:
+                return await batcher.encode(texts)
+            return await pool.run(encode_texts, texts)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=429,
+            detail="Embedding service busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+
+class SearchRequest(BaseModel):
+    """Request model for semantic search"""
+    query: str = Field(..., min_length=1, description="Query text to embed and search for")
+    k: int = Field(10, ge=1, le=100, description="Number of results")
+    ef: int | None = Field(
+        None,
+        ge=1,
+        le=1000,
+        description="HNSW candidate list size (recall vs latency); defaults to the tuned ef, ignored by exact indexes"
+    )
+    mode: Literal["semantic", "lexical", "hybrid"] = Field(
+        "semantic",
+        description="Rank by embedding similarity, BM25 over note text, or both fused"
+    )
+    fusion: Literal["rrf", "weighted"] = Field(
+        "rrf",
+        description="Hybrid fusion: reciprocal rank, or weighted sum of normalized scores"
+    )
+    semantic_weight: float = Field(
+        0.5,
+        ge=0.0,
+        le=1.0,
+        description="Weight of the semantic ranking in weighted fusion (lexical gets the rest)"
+    )
+    kinds: List[int] | None = Field(None, description="Only notes of these kinds (e.g. [1] or [9])")
+    channel: str | None = Field(
+        None,
+        pattern="^[0-9a-f]{64}$",
+        description="Only kind 42 messages in this channel (the channel's root event id)"
+    )
+    pubkey: str | None = Field(None, pattern="^[0-9a-f]{64}$", description="Only notes by this author")
+    since: int | None = Field(None, ge=0, description="Only notes created at or after this unix time")
+    until: int | None = Field(None, ge=0, description="Only notes created at or before this unix time")
+
+    def filters(self) -> dict:
+        return {name: getattr(self, name) for name in ("kinds", "channel", "pubkey", "since", "until")
+                if getattr(self, name) is not None}
+
+
+class SearchHit(BaseModel):
+    id: str = Field(..., description="Nostr event id (hex)")
+    score: float = Field(..., description="Cosine similarity, BM25 score or fused score, depending on mode")
+
+
+class SearchResponse(BaseModel):
+    """Response model for semantic search"""
+    results: List[SearchHit]
+    version: int = Field(..., description="Manifest version of the index that served the query")
+    index_type: str = Field(..., description="exact, hnsw or segments")
+    mode: str = Field(..., description="semantic, lexical or hybrid")
+
+
+async def embed_texts(texts: List[str]) -> np.ndarray:
+    """Serve cached vectors and encode only the misses, preserving request order"""
+    if cache is None:
+        return await encode_uncached(texts)
+
+    keys, vectors = cache.lookup(texts)
+
+    # Deduplicate misses so a batch repeating one text encodes it once
+    missing = {}
+    for key, text, vector in zip(keys, texts, vectors):
+        if vector is None and key not in missing:
+            missing[key] = text
+
+    if missing:
+        fresh = dict(zip(missing, await encode_uncached(list(missing.values()))))
+        for key, vector in fresh.items():
+            cache.put(key, vector)
+        vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+    return np.stack(vectors)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Cloud Run"""
     return {
         "status": "healthy",
         "model_loaded": model is not None,
-        "dimensions": model.get_sentence_embedding_dimension() if model else None
+        "dimensions": model.dimensions if model else None,
+        "backend": BACKEND,
+        "batching": batcher.stats() if batcher else None,
+        "inference": pool.stats() if pool else None,
+        "cache": cache.stats() if cache else None,
+        "search": index_store.stats() if index_store else None
     }
 
 
 @app.post("/embed", response_model=EmbedResponse)
-async def generate_embeddings(request: EmbedRequest):
+async def generate_embeddings(
+    request: EmbedRequest,
+    accept: str | None = Header(None),
+    dtype: str = Query("float32", description="Binary output dtype: float32, float16 or int8")
+):
     """
     Generate embeddings for input text(s)
 
     Args:
         request: EmbedRequest with text (string or list of strings)
+        accept: application/octet-stream or application/x-npy selects a binary body
+        dtype: Element type for binary bodies (JSON is always float32)
 
     Returns:
-        EmbedResponse with embeddings, dimensions, and count
+        EmbedResponse with embeddings, dimensions, and count, or a raw buffer
+        with X-Embedding-Shape / X-Embedding-Dtype headers
     """
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
 
+    media_type = negotiate(accept)
+    if dtype not in DTYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported dtype '{dtype}'. Use one of: {', '.join(DTYPES)}"
+        )
+
     # Normalize input to list
     texts = [request.text] if isinstance(request.text, str) else request.text
 
@@ -110,23 +317,24 @@ async def generate_embeddings(request: EmbedRequest):
         )
 
     try:
-        # Generate embeddings
-        embeddings = model.encode(
-            texts,
-            convert_to_numpy=True,
-            show_progress_bar=False,
-            normalize_embeddings=True  # L2 normalization for cosine similarity
-        )
+        # Generate embeddings off the event loop
+        embeddings = await embed_texts(texts)
+
+        # Binary clients skip Python floats and pydantic entirely
+        if media_type is not None:
+            return binary_response(embeddings, media_type, dtype)
 
         # Convert to list of lists for JSON serialization
         embeddings_list = embeddings.tolist()
 
         return EmbedResponse(
             embeddings=embeddings_list,
-            dimensions=model.get_sentence_embedding_dimension(),
+            dimensions=model.dimensions,
             count=len(embeddings_list)
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -134,17 +342,142 @@ async def generate_embeddings(request: EmbedRequest):
         )
 
 
+@app.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest):
+    """
+    Embed a query and return the nearest notes from the published index
+
+    The index is the one current when the request arrives; a version swap
+    during the query does not affect it. Lexical mode skips the model.
+    Filters (kinds, channel, pubkey, since, until) restrict semantic
+    results to matching notes before ranking, not after.
+
+    Returns:
+        SearchResponse with up to k {"id", "score"} hits, best first
+    """
+    index = index_store.current if index_store else None
+    if index is None:
+        raise HTTPException(status_code=503, detail="Search index not loaded")
+    if request.mode != "semantic" and index.lexical is None:
+        raise HTTPException(status_code=400, detail="No lexical index published for this version")
+    filters = request.filters()
+    if filters and request.mode != "semantic":
+        raise HTTPException(status_code=400, detail="Filters apply to semantic search only")
+    if filters and not index.filterable:
+        raise HTTPException(status_code=400, detail="No filter metadata published for this version")
+    if request.mode != "lexical" and model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    depth = max(request.k, SEARCH_FUSION_DEPTH) if request.mode == "hybrid" else request.k
+    try:
+        semantic = lexical = []
+        if request.mode != "lexical":
+            embedding = (await embed_texts([request.query]))[0]
+            semantic = await asyncio.to_thread(index.search, embedding, depth, request.ef, filters)
+        if request.mode != "semantic":
+            lexical = await asyncio.to_thread(index.lexical.search, request.query, depth)
+
+        if request.mode == "hybrid" and request.fusion == "rrf":
+            results = reciprocal_rank_fusion([semantic, lexical], request.k)
+        elif request.mode == "hybrid":
+            weights = [request.semantic_weight, 1.0 - request.semantic_weight]
+            results = weighted_fusion([semantic, lexical], weights, request.k)
+        else:
+            results = semantic or lexical
+        return SearchResponse(results=results, version=index.version, index_type=index.index_type,
+                              mode=request.mode)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Search failed: {str(e)}"
+        )
+
+
+async def embed_when_ready(texts: List[str]) -> np.ndarray:
+    """Like embed_texts, but waits out a saturated pool instead of returning 429"""
+    if not texts:
+        return np.zeros((0, model.dimensions), dtype=np.float32)
+    while True:
+        try:
+            return await embed_texts(texts)
+        except HTTPException as e:
+            if e.status_code != 429:
+                raise
+            await asyncio.sleep(0.05)
+
+
+@app.post("/embed/stream")
+async def stream_embeddings(
+    request: Request,
+    accept: str | None = Header(None),
+    dtype: str = Query("float32", description="Binary frame dtype: float32, float16 or int8")
+):
+    """
+    Embed an NDJSON body of {"id", "text"} lines of any length
+
+    Input is read and embedded in batches of EMBED_STREAM_BATCH_SIZE texts,
+    and each batch's results are streamed back as soon as it completes, so
+    memory stays bounded regardless of input size. The next batch is parsed
+    while the current one is being encoded.
+
+    Returns:
+        NDJSON lines of {"id", "embedding"} / {"id", "error"}, or length-prefixed
+        binary frames when Accept is application/octet-stream
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if dtype not in DTYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported dtype '{dtype}'. Use one of: {', '.join(DTYPES)}"
+        )
+
+    binary = negotiate(accept) == OCTET_STREAM
+
+    def encode(batch, vectors):
+        return binary_frame(batch, vectors, dtype) if binary else ndjson_lines(batch, vectors)
+
+    async def results():
+        pending = None
+        try:
+            async for batch in read_batches(request.stream(), STREAM_BATCH_SIZE, STREAM_MAX_LINE_BYTES):
+                texts = [record.text for record in batch if record.error is None]
+                task = asyncio.create_task(embed_when_ready(texts))
+                if pending is not None:
+                    yield encode(pending[0], await pending[1])
+                pending = (batch, task)
+            if pending is not None:
+                yield encode(pending[0], await pending[1])
+                pending = None
+        except ClientDisconnect:
+            return
+        except Exception as e:
+            # Headers are already sent; report the failure in-band and end the stream
+            yield stream_error(f"Stream aborted: {e}", binary)
+        finally:
+            if pending is not None:
+                pending[1].cancel()
+
+    return RequestStreamingResponse(results(), media_type=OCTET_STREAM if binary else NDJSON)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
     return {
         "service": "Embedding API",
         "version": "1.0.0",
-        "model": "sentence-transformers/all-MiniLM-L6-v2",
+        "model": MODEL_NAME,
+        "backend": BACKEND,
         "dimensions": 384,
         "endpoints": {
             "health": "/health",
-            "embed": "/embed (POST)"
+            "embed": "/embed (POST)",
+            "embed_stream": "/embed/stream (POST, NDJSON)",
+            "search": "/search (POST)"
         }
     }
 
@@ -0,0 +1,493 @@
+"""
+Semantic search over the published vector index.
+
+The embedding pipeline publishes manifest.json plus versioned index.bin and
+index_mapping.bin files (scripts/embeddings). Point SEARCH_INDEX_DIR at a
+local copy or a mounted bucket laid out the same way and /search serves
+queries from it, so clients no longer need the index locally.
+
+    exact index (NBEX)  rows and norms are np.memmap'd read-only, so every
+                        gunicorn worker on the host shares one copy through
+                        the page cache
+    HNSW index          loaded with hnswlib per worker (hnswlib has no mmap
+                        loader); prefer threads over workers for large graphs
+    mapping (NBLM)      memory-mapped; a label resolves with one 32-byte read
+    lexical (NBLX)      optional BM25 index, memory-mapped (lexical_search.py)
+    metadata (npz)      optional label-ordered kind / pubkey / created_at /
+                        channel columns for filtered search
+    segments            when the manifest lists segments (scripts/embeddings/
+                        segments.py), each is an index + mapping + metadata
+                        with an optional list of deleted labels; a query
+                        fans out to every segment, skipping those outside a
+                        since/until range, and heap-merges their top-k
+
+Filtered search builds a label mask from the metadata columns and picks a
+strategy by its selectivity. The exact index scores only the matching rows
+(or masks a full scan when most rows match). HNSW either brute-forces the
+matches over the graph file's vectors, memory-mapped in place, or walks the
+graph with a filter callback, which visits about ef / selectivity
+candidates; it takes whichever is estimated cheaper
+(benchmarks/bench_filtered_search.py).
+
+Hot swap: a background task polls the manifest and, when its version
+changes, loads the new files off the event loop and replaces the current
+LoadedIndex in one assignment. Requests take a reference to the index they
+started with, so in-flight queries finish against the old version and its
+maps are released once the last of them completes.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from lexical_search import LexicalSearcher
+
+# scripts/embeddings/exact_search.py
+EXACT_MAGIC = b'NBEX'
+EXACT_HEADER = struct.Struct('<4sHHIIff8x')
+FLAG_FLOAT16 = 1
+FLAG_PER_DIM = 2
+FLAG_PER_VECTOR = 4
+
+# scripts/embeddings/label_mapping.py
+MAPPING_MAGIC = b'NBLM'
+MAPPING_HEADER = struct.Struct('<4sHHIIQQ')
+ID_BYTES = 32
+
+DEFAULT_EF = 50
+# hnswlib 0.8 saveIndex header; level 0 holds each element's links, float32 vector and u64 label
+HNSW_HEADER = struct.Struct('<QQQQQQiIQQQdQ')
+# Microseconds per scored vector (brute force) and per result-list candidate of a filtered
+# graph walk, which sees about ef / selectivity of them (benchmarks/bench_filtered_search.py)
+GATHER_COST = 0.4
+FILTER_COST = 4.0
+# Above this fraction of rows matching, the exact index masks a full scan instead of gathering rows
+GATHER_MAX_FRACTION = 0.25
+
+
+def fit_mask(allowed: np.ndarray, size: int) -> np.ndarray:
+    """allowed truncated or padded with False to size labels"""
+    if len(allowed) == size:
+        return allowed
+    fitted = np.zeros(size, dtype=bool)
+    fitted[:min(size, len(allowed))] = allowed[:size]
+    return fitted
+
+
+def top_k(labels: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Best k (label, score) pairs, best first"""
+    k = min(k, len(scores))
+    if k == 0:
+        return labels[:0].astype(np.int64), scores[:0]
+    part = np.argpartition(-scores, k - 1)[:k]
+    order = part[np.argsort(-scores[part], kind='stable')]
+    return labels[order].astype(np.int64), scores[order]
+
+
+class ExactSearcher:
+    """Chunked brute-force cosine search over a memory-mapped exact index"""
+
+    def __init__(self, path: str, chunk_rows: int = 16384):
+        with open(path, 'rb') as f:
+            magic, version, flags, count, dims, vmin, scale = EXACT_HEADER.unpack(f.read(EXACT_HEADER.size))
+        if magic != EXACT_MAGIC:
+            raise ValueError(f"{path} is not an exact index")
+
+        offset = EXACT_HEADER.size + 4 * count
+        if flags & FLAG_PER_DIM:
+            params = np.fromfile(path, dtype='<f4', count=2 * dims, offset=offset)
+            vmin, scale = params[:dims], params[dims:]
+            offset += params.nbytes
+
+        # Stored values map back to vectors as a * q + b (the per-row scale cancels in cosine)
+        if flags & (FLAG_FLOAT16 | FLAG_PER_VECTOR):
+            self.a, self.b = 1.0, 0.0
+        else:
+            self.a, self.b = 1.0 / scale, vmin + 128.0 / scale
+
+        dtype = np.float16 if flags & FLAG_FLOAT16 else np.int8
+        self.norms = np.memmap(path, dtype='<f4', mode='r', offset=EXACT_HEADER.size, shape=(count,)) \
+            if count else np.zeros(0, dtype=np.float32)
+        self.vectors = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count, dims)) \
+            if count else np.zeros((0, dims), dtype=dtype)
+        self.live = int(np.count_nonzero(self.norms))
+        self.chunk_rows = chunk_rows
+
+    def search(self, query: np.ndarray, k: int, ef: int | None = None,
+               allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k labels and cosine similarities, among allowed labels if a mask is given; ef is ignored"""
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scaled = (query * self.a).astype(np.float32)
+        offset = float(query @ self.b) if np.ndim(self.b) else self.b * float(query.sum())
+        k = min(k, self.live)
+        if allowed is not None:
+            allowed = fit_mask(allowed, len(self.vectors)) & (self.norms > 0)
+            matches = np.flatnonzero(allowed)
+            k = min(k, len(matches))
+            if len(matches) <= GATHER_MAX_FRACTION * len(self.vectors):
+                return self._search_rows(matches, scaled, offset, k)
+        best_labels = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+
+        for start in range(0, len(self.vectors), self.chunk_rows):
+            norms = self.norms[start:start + self.chunk_rows]
+            scores = self.vectors[start:start + self.chunk_rows].astype(np.float32) @ scaled + offset
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(norms > 0, scores / norms, -np.inf)
+            if allowed is not None:
+                scores = np.where(allowed[start:start + self.chunk_rows], scores, -np.inf)
+            if k == 0:
+                break
+            take = min(k, len(scores))
+            part = np.argpartition(-scores, take - 1)[:take]
+            best_labels = np.concatenate([best_labels, part + start])
+            best_scores = np.concatenate([best_scores, scores[part]])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_labels, best_scores = best_labels[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores, kind='stable')
+        return best_labels[order], best_scores[order]
+
+    def mark_deleted(self, labels: np.ndarray):
+        """Drop labels from results (a segment's deletes list); the file stays read-only"""
+        self.norms = np.array(self.norms)
+        self.norms[labels[labels < len(self.norms)]] = 0
+        self.live = int(np.count_nonzero(self.norms))
+
+    def _search_rows(self, rows: np.ndarray, scaled: np.ndarray, offset: float,
+                     k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Score only the given rows (pre-filtered brute force)"""
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.chunk_rows):
+            chunk = rows[start:start + self.chunk_rows]
+            scores[start:start + len(chunk)] = (self.vectors[chunk].astype(np.float32) @ scaled + offset) \
+                / self.norms[chunk]
+        return top_k(rows, scores, k)
+
+
+class HnswSearcher:
+    """hnswlib index; ef is per index in hnswlib, so set_ef and the query run under a lock"""
+
+    def __init__(self, path: str, dimensions: int, live: int, default_ef: int = DEFAULT_EF):
+        import hnswlib
+
+        self.index = hnswlib.Index(space='cosine', dim=dimensions)
+        self.index.load_index(path)
+        # element_count includes deleted labels; asking for more hits than live ones raises
+        self.live = live
+        self.default_ef = default_ef
+        self._lock = threading.Lock()
+        self.vectors, self.rows = self._map_vectors(path, dimensions)
+
+    def _map_vectors(self, path: str, dimensions: int) -> tuple[np.ndarray, np.ndarray]:
+        """Strided memory map of the saved unit vectors plus label -> row, for pre-filtered brute force
+
+        hnswlib's get_items copies through Python lists (~45 us a vector), too slow to score thousands.
+        """
+        with open(path, 'rb') as f:
+            level0, _, count, row_bytes, label_at, data_at, *_ = HNSW_HEADER.unpack(f.read(HNSW_HEADER.size))
+        if level0 != 0 or data_at + 4 * dimensions > row_bytes or label_at + 8 > row_bytes:
+            raise ValueError(f"{path} is not an hnswlib 0.8 index")
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=HNSW_HEADER.size, shape=(count, row_bytes)) \
+            if count else np.zeros((0, row_bytes), dtype=np.uint8)
+        labels = data[:, label_at:label_at + 8].view('<u8')[:, 0].astype(np.int64)
+        rows = np.full(self.index.get_max_elements(), -1, dtype=np.int64)
+        rows[labels] = np.arange(count)
+        return data[:, data_at:data_at + 4 * dimensions].view('<f4'), rows
+
+    def mark_deleted(self, labels: np.ndarray):
+        """Drop labels from results (a segment's deletes list)"""
+        labels = labels[(labels < len(self.rows))]
+        labels = labels[self.rows[labels] >= 0]
+        for label in labels.tolist():
+            self.index.mark_deleted(label)
+        self.rows[labels] = -1
+        self.live -= len(labels)
+
+    def strategy(self, matches: int, k: int, ef: int | None = None) -> str:
+        """"brute" or "graph" for a filter matching this many labels, by estimated cost"""
+        candidates = max(ef or self.default_ef, k) * self.live / max(matches, 1)
+        return "brute" if matches * GATHER_COST <= candidates * FILTER_COST else "graph"
+
+    def search(self, query: np.ndarray, k: int, ef: int | None = None, allowed: np.ndarray | None = None,
+               strategy: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k labels and cosine similarities, among allowed labels if a mask is given
+
+        strategy forces "brute" or "graph" for a filtered search instead of choosing by selectivity.
+        """
+        if allowed is None:
+            with self._lock:
+                self.index.set_ef(max(ef or self.default_ef, k))
+                labels, distances = self.index.knn_query(query, k=min(k, self.live), num_threads=1)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+
+        allowed = fit_mask(allowed, len(self.rows)) & (self.rows >= 0)
+        matches = np.flatnonzero(allowed)
+        if (strategy or self.strategy(len(matches), k, ef)) == "brute":
+            # Stored vectors are unit length in the cosine space, so a dot product is the similarity
+            query = (query / max(float(np.linalg.norm(query)), 1e-12)).astype(np.float32)
+            return top_k(matches, self.vectors[self.rows[matches]] @ query, k)
+
+        # Only allowed labels enter the result list, so the walk widens until ef of them are found
+        with self._lock:
+            self.index.set_ef(max(ef or self.default_ef, k))
+            labels, distances = self.index.knn_query(query, k=min(k, len(matches)), num_threads=1,
+                                                     filter=lambda label: bool(allowed[label]))
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+
+class LabelMapping:
+    """Memory-mapped label -> event id table from index_mapping.bin"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            magic, version, flags, count, live, ids_offset, _ = MAPPING_HEADER.unpack(f.read(MAPPING_HEADER.size))
+        if magic != MAPPING_MAGIC:
+            raise ValueError(f"{path} is not a label mapping")
+        self.live = live
+        self.ids = np.memmap(path, dtype=np.uint8, mode='r', offset=ids_offset, shape=(count, ID_BYTES)) \
+            if count else np.zeros((0, ID_BYTES), dtype=np.uint8)
+
+    def event_id(self, label: int) -> str | None:
+        if not 0 <= label < len(self.ids):
+            return None
+        row = self.ids[label]
+        return row.tobytes().hex() if row.any() else None
+
+
+class FilterColumns:
+    """Label-ordered filter metadata from index_metadata.npz"""
+
+    # scripts/embeddings/note_metadata.py; kind 0 marks free labels and notes with unknown metadata
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            self.kinds = data['kinds']
+            self.created_at = data['created_at']
+            self.pubkey_codes = data['pubkey_codes']
+            self.pubkeys = data['pubkeys'].reshape(-1, ID_BYTES)
+            self.channel_codes = data['channel_codes']
+            self.channels = data['channels'].reshape(-1, ID_BYTES)
+
+    @staticmethod
+    def _code(table: np.ndarray, event_id: str) -> int:
+        try:
+            raw = np.frombuffer(bytes.fromhex(event_id), dtype=np.uint8)
+        except ValueError:
+            return -2
+        found = np.flatnonzero((table == raw).all(axis=1)) if len(raw) == ID_BYTES else []
+        # -2 matches nothing (codes are >= -1)
+        return int(found[0]) if len(found) else -2
+
+    def mask(self, kinds: list[int] | None = None, channel: str | None = None, pubkey: str | None = None,
+             since: int | None = None, until: int | None = None) -> np.ndarray:
+        """Boolean mask over labels of notes matching every given filter"""
+        allowed = self.kinds != 0
+        if kinds:
+            allowed &= np.isin(self.kinds, kinds)
+        if channel is not None:
+            allowed &= self.channel_codes == self._code(self.channels, channel)
+        if pubkey is not None:
+            allowed &= self.pubkey_codes == self._code(self.pubkeys, pubkey)
+        if since is not None:
+            allowed &= self.created_at >= since
+        if until is not None:
+            allowed &= self.created_at <= until
+        return allowed
+
+
+class IndexPart:
+    """One index with its mapping, filter columns and created_at range: a whole index or a segment"""
+
+    def __init__(self, searcher, mapping: LabelMapping, filters: FilterColumns | None = None,
+                 created_range: tuple[int, int] | None = None):
+        self.searcher = searcher
+        self.mapping = mapping
+        self.filters = filters
+        self.created_range = created_range
+
+    def outside_range(self, since: int | None, until: int | None) -> bool:
+        """True if no note in this part was created within [since, until] (0 is a real bound)"""
+        first, last = self.created_range
+        return (since is not None and since > last) or (until is not None and until < first)
+
+    def search(self, query: np.ndarray, k: int, ef: int | None = None, filters: dict | None = None) -> list[dict]:
+        """Top-k hits as {"id", "score"}, best first, skipping unmapped labels"""
+        allowed = None
+        if filters:
+            if self.filters is None:
+                raise ValueError("No filter metadata published for this version")
+            if self.created_range is not None and self.outside_range(filters.get("since"), filters.get("until")):
+                return []
+            allowed = self.filters.mask(**filters)
+            if not allowed.any():
+                return []
+        labels, scores = self.searcher.search(query, k, ef, allowed)
+        results = []
+        for label, score in zip(labels.tolist(), scores.tolist()):
+            event_id = self.mapping.event_id(label)
+            if event_id is not None:
+                results.append({"id": event_id, "score": round(score, 6)})
+        return results
+
+
+class LoadedIndex:
+    """One manifest version's index parts (the index, or one per segment) and lexical index"""
+
+    def __init__(self, version: int, index_type: str, parts: list[IndexPart],
+                 lexical: LexicalSearcher | None = None):
+        self.version = version
+        self.index_type = index_type
+        self.parts = parts
+        self.lexical = lexical
+
+    @property
+    def live(self) -> int:
+        return sum(part.searcher.live for part in self.parts)
+
+    @property
+    def filterable(self) -> bool:
+        return bool(self.parts) and all(part.filters is not None for part in self.parts)
+
+    def search(self, query: np.ndarray, k: int, ef: int | None = None, filters: dict | None = None) -> list[dict]:
+        """Top-k hits as {"id", "score"} (cosine similarity) across every part
+
+        Each part returns its own top-k best first and a heap merge of those
+        lists gives the global top-k. filters holds FilterColumns.mask()
+        arguments; it needs the metadata files (ValueError otherwise), and
+        segments whose created_at range misses since/until are skipped.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        ranked = [part.search(query, k, ef, filters) for part in self.parts]
+        if len(ranked) == 1:
+            return ranked[0]
+        return list(itertools.islice(heapq.merge(*ranked, key=lambda hit: -hit["score"]), k))
+
+
+def read_manifest(root: Path) -> dict:
+    with open(root / 'manifest.json') as f:
+        return json.load(f)
+
+
+def open_part(root: Path, files: dict, dimensions: int, ef: int = DEFAULT_EF,
+              created_range: tuple[int, int] | None = None) -> IndexPart:
+    """Open an index with its mapping, optional filter metadata and optional deleted labels
+
+    files holds root-relative "index", "mapping" and optionally "metadata" and "deletes" paths.
+    """
+    metadata_path = root / files["metadata"] if files.get("metadata") else None
+    filters = FilterColumns(str(metadata_path)) if metadata_path and metadata_path.exists() else None
+    mapping = LabelMapping(str(root / files["mapping"]))
+    index_path = root / files["index"]
+    with open(index_path, 'rb') as f:
+        exact = f.read(4) == EXACT_MAGIC
+    if exact:
+        searcher = ExactSearcher(str(index_path))
+    else:
+        searcher = HnswSearcher(str(index_path), dimensions, mapping.live, ef)
+    if files.get("deletes"):
+        searcher.mark_deleted(np.load(root / files["deletes"]).astype(np.int64))
+    return IndexPart(searcher, mapping, filters, created_range)
+
+
+def load_version(root: Path, manifest: dict) -> LoadedIndex:
+    """Open the segments, or else the index, a manifest points at (falling back to root/index.bin)
+
+    Segment files are immutable and uniquely named (scripts/embeddings/segments.py),
+    so the manifest lists them by root-relative path rather than per version.
+    """
+    version = int(manifest.get("version", 0))
+    dimensions = int(manifest.get("dimensions", 0))
+    ef = manifest.get("hnsw_tuning", {}).get("recommended", {}).get("ef", DEFAULT_EF)
+    files = manifest.get("files", {})
+    lexical_path = root / files["lexical"] if "lexical" in files else None
+    if lexical_path is None or not lexical_path.exists():
+        lexical_path = root / "lexical.bin"
+    lexical = LexicalSearcher(str(lexical_path)) if lexical_path.exists() else None
+
+    if manifest.get("segments"):
+        parts = [open_part(root, segment["files"], dimensions, ef,
+                           (segment["min_created_at"], segment["max_created_at"]))
+                 for segment in manifest["segments"]]
+        return LoadedIndex(version, "segments", parts, lexical)
+
+    index_files = {
+        "index": files.get("index", "index.bin"),
+        "mapping": files.get("index_mapping", "index_mapping.bin"),
+        "metadata": files.get("index_metadata"),
+    }
+    if not (root / index_files["index"]).exists():
+        index_files = {"index": "index.bin", "mapping": "index_mapping.bin", "metadata": "index_metadata.npz"}
+    part = open_part(root, index_files, dimensions, ef)
+    return LoadedIndex(version, "exact" if isinstance(part.searcher, ExactSearcher) else "hnsw", [part], lexical)
+
+
+class IndexStore:
+    """
+    Holds the current LoadedIndex and swaps in new manifest versions.
+
+    Args:
+        root: Directory with manifest.json and the files it lists
+        poll_seconds: How often watch() re-reads the manifest
+    """
+
+    def __init__(self, root: str, poll_seconds: float = 30.0):
+        self.root = Path(root)
+        self.poll_seconds = poll_seconds
+        self.current: LoadedIndex | None = None
+        self.swaps = 0
+        self.last_error: str | None = None
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self) -> bool:
+        """Load the manifest's version if it differs from the current one; True on swap"""
+        try:
+            manifest = await asyncio.to_thread(read_manifest, self.root)
+            version = int(manifest.get("version", 0))
+            if self.current is not None and self.current.version == version:
+                return False
+            loaded = await asyncio.to_thread(load_version, self.root, manifest)
+        except Exception as e:
+            # Keep serving the version we have
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        self.current = loaded
+        self.swaps += 1
+        self.last_error = None
+        return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            await self.refresh()
+
+    def start(self):
+        self._task = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        current = self.current
+        return {
+            "version": current.version if current else None,
+            "index_type": current.index_type if current else None,
+            "vectors": current.live if current else 0,
+            "segments": len(current.parts) if current and current.index_type == "segments" else 0,
+            "lexical_docs": current.lexical.docs if current and current.lexical else 0,
+            "filters": bool(current and current.filterable),
+            "swaps": self.swaps,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,157 @@
+"""
+NDJSON streaming helpers for /embed/stream.
+
+Bulk clients send one {"id": ..., "text": ...} object per line, of any length.
+The request body is parsed incrementally into fixed-size batches, so memory is
+bounded by the batch size and the longest line, never by the input size.
+
+Results are written as each batch completes, either as NDJSON:
+
+    {"id": "abc", "embedding": [0.01, ...]}
+    {"id": "def", "error": "missing text"}
+
+or, for Accept: application/octet-stream, as binary frames:
+
+    <uint32 LE header length><JSON header><raw little-endian vectors>
+
+where the header is {"ids": [...], "shape": [n, dims], "dtype": "float32"}
+(plus "quantize_min"/"quantize_scale" for int8) and the vectors are row-major.
+"""
+
+import json
+import struct
+from typing import AsyncIterator, List
+
+import numpy as np
+from starlette.responses import StreamingResponse
+
+from formats import quantize_int8
+
+NDJSON = "application/x-ndjson"
+
+
+class LineTooLong(ValueError):
+    """Raised when a single NDJSON line exceeds the configured limit"""
+
+
+class StreamRecord:
+    """One parsed input line: an id plus either text or an error"""
+
+    __slots__ = ("id", "text", "error")
+
+    def __init__(self, id, text: str | None = None, error: str | None = None):
+        self.id = id
+        self.text = text
+        self.error = error
+
+
+def parse_line(line: bytes, line_number: int) -> StreamRecord:
+    """Decode one NDJSON line; bad lines become error records instead of failing the stream"""
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return StreamRecord(line_number, error="invalid JSON")
+
+    if not isinstance(item, dict):
+        return StreamRecord(line_number, error="expected an object")
+
+    record_id = item.get("id", line_number)
+    text = item.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return StreamRecord(record_id, error="missing text")
+    return StreamRecord(record_id, text=text)
+
+
+async def read_records(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[StreamRecord]:
+    """Split a byte stream into NDJSON records without buffering the whole body"""
+    buffer = b""
+    line_number = 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise LineTooLong(f"line {line_number} exceeds {max_line_bytes} bytes")
+            if line.strip():
+                yield parse_line(line, line_number)
+        # The unfinished line must not grow past the limit either
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(f"line {line_number + 1} exceeds {max_line_bytes} bytes")
+
+    if buffer.strip():
+        yield parse_line(buffer, line_number + 1)
+
+
+async def read_batches(
+    chunks: AsyncIterator[bytes],
+    batch_size: int,
+    max_line_bytes: int
+) -> AsyncIterator[List[StreamRecord]]:
+    """Group records into batches of at most batch_size texts (errors ride along)"""
+    batch = []
+    texts = 0
+    async for record in read_records(chunks, max_line_bytes):
+        batch.append(record)
+        if record.text is not None:
+            texts += 1
+        if texts >= batch_size:
+            yield batch
+            batch, texts = [], 0
+    if batch:
+        yield batch
+
+
+def ndjson_lines(batch: List[StreamRecord], vectors: np.ndarray) -> bytes:
+    """Serialize one batch as NDJSON, keeping input order"""
+    rows = iter(vectors.tolist())
+    out = []
+    for record in batch:
+        if record.error is not None:
+            out.append(json.dumps({"id": record.id, "error": record.error}))
+        else:
+            out.append(json.dumps({"id": record.id, "embedding": next(rows)}))
+    return ("\n".join(out) + "\n").encode("utf-8")
+
+
+def binary_frame(batch: List[StreamRecord], vectors: np.ndarray, dtype: str) -> bytes:
+    """Serialize one batch as a length-prefixed JSON header plus raw vectors"""
+    header = {
+        "ids": [record.id for record in batch if record.error is None],
+        "errors": [{"id": record.id, "error": record.error} for record in batch if record.error is not None],
+        "dtype": dtype
+    }
+
+    if dtype == "int8":
+        array, vmin, scale = quantize_int8(vectors) if len(vectors) else (vectors.astype(np.int8), 0.0, 1.0)
+        header["quantize_min"] = vmin
+        header["quantize_scale"] = scale
+    else:
+        array = vectors.astype(np.dtype(dtype).newbyteorder("<"), copy=False)
+
+    array = np.ascontiguousarray(array)
+    header["shape"] = list(array.shape)
+    header_bytes = json.dumps(header).encode("utf-8")
+    return struct.pack("<I", len(header_bytes)) + header_bytes + array.tobytes()
+
+
+def stream_error(message: str, binary: bool) -> bytes:
+    """Final record reporting why a stream stopped early"""
+    if binary:
+        header_bytes = json.dumps({"error": message, "ids": [], "shape": [0, 0]}).encode("utf-8")
+        return struct.pack("<I", len(header_bytes)) + header_bytes
+    return (json.dumps({"error": message}) + "\n").encode("utf-8")
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body generator reads the request body itself.
+
+    The stock implementation listens for client disconnects by calling
+    receive() concurrently, which would swallow request body chunks. Disconnects
+    still surface here as ClientDisconnect from request.stream().
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
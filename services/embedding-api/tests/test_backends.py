@@ -0,0 +1,55 @@
+"""
+Parity of the ONNX backends with the torch reference (backends.py).
+
+Skipped unless onnxruntime and sentence-transformers are installed, the model
+can be loaded, and export_onnx.py has written the graphs to EMBED_ONNX_DIR
+(default ./onnx).
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+SERVICE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE))
+
+from backends import ONNX_FILES, PARITY_TEXTS, PARITY_TOLERANCE, TorchBackend, load_backend, parity  # noqa: E402
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_DIR = os.getenv("EMBED_ONNX_DIR", str(SERVICE / "onnx"))
+
+
+@pytest.fixture(scope="module")
+def reference() -> np.ndarray:
+    try:
+        return TorchBackend(MODEL_NAME).encode(PARITY_TEXTS)
+    except OSError as e:
+        pytest.skip(f"{MODEL_NAME} not available: {e}")
+
+
+@pytest.fixture(scope="module", params=list(ONNX_FILES))
+def backend(request):
+    if not Path(ONNX_DIR, ONNX_FILES[request.param]).exists():
+        pytest.skip(f"{ONNX_FILES[request.param]} not exported to {ONNX_DIR}")
+    return load_backend(request.param, MODEL_NAME, ONNX_DIR)
+
+
+def test_parity(backend, reference):
+    assert parity(backend, reference) >= PARITY_TOLERANCE[backend.name]
+
+
+def test_concurrent_encode(backend):
+    """Inference threads encoding at once get the same vectors as one thread"""
+    batches = [PARITY_TEXTS[i:] + PARITY_TEXTS[:i] for i in range(len(PARITY_TEXTS))] * 4
+    expected = [backend.encode(batch) for batch in batches]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(backend.encode, batches))
+    for vectors, serial in zip(results, expected):
+        np.testing.assert_allclose(vectors, serial, atol=1e-5)
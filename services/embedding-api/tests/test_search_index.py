@@ -0,0 +1,25 @@
+"""Segment pruning by created_at range (search_index.py)."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search_index import IndexPart  # noqa: E402
+
+
+@pytest.mark.parametrize("since, until, outside", [
+    (None, None, False),
+    (None, 0, True),  # 0 is a bound, not "no bound"
+    (0, None, False),
+    (0, 99, True),
+    (0, 100, False),
+    (200, None, False),
+    (201, None, True),
+    (150, 150, False),
+])
+def test_outside_range(since, until, outside):
+    part = IndexPart(searcher=None, mapping=None, created_range=(100, 200))
+    assert part.outside_range(since, until) is outside
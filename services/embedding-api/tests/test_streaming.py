@@ -0,0 +1,46 @@
+"""NDJSON parsing for /embed/stream (streaming.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from streaming import LineTooLong, read_records  # noqa: E402
+
+
+async def _chunks(parts: list[bytes]):
+    for part in parts:
+        yield part
+
+
+def records(parts: list[bytes], max_line_bytes: int = 32) -> list:
+    async def collect():
+        return [(record.id, record.text, record.error) async for record in read_records(_chunks(parts), max_line_bytes)]
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks():
+    assert records([b'{"id": "a", "te', b'xt": "one"}\n\n{"text"', b': "two"}']) == [
+        ("a", "one", None), (3, "two", None)]
+
+
+def test_bad_lines_become_errors():
+    assert records([b'not json\n[1]\n{"id": "x"}\n']) == [
+        (1, None, "invalid JSON"), (2, None, "expected an object"), ("x", None, "missing text")]
+
+
+@pytest.mark.parametrize("parts", [
+    [b'{"text": "ok"}\n{"text": "' + b"x" * 40 + b'"}\n{"text": "after"}\n'],  # complete line inside one chunk
+    [b'{"text": "ok"}\n{"text": "', b"x" * 40],  # unfinished line still growing
+])
+def test_overlong_line(parts):
+    seen = []
+    with pytest.raises(LineTooLong, match="line 2 exceeds 32 bytes"):
+        async def collect():
+            async for record in read_records(_chunks(parts), 32):
+                seen.append(record.text)
+        asyncio.run(collect())
+    assert seen == ["ok"]
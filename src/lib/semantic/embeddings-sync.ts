@@ -16,14 +16,50 @@ export interface EmbeddingManifest {
   dimensions: number;
   model: string;
   quantize_type: 'int8' | 'float32';
-  index_size_bytes: number;
+  quantize_scheme?: 'global' | 'per-dim' | 'per-vector';
+  compact_codes?: { type: 'binary' | 'pq'; bytes_per_vector: number };
+  // Single-index fields; the nightly workflow publishes segments instead
+  index_size_bytes?: number;
+  index_type?: 'hnsw' | 'exact';
   embeddings_size_bytes: number;
   latest: {
-    index: string;
-    index_mapping: string;
+    index?: string;
+    index_mapping?: string;
     embeddings: string;
     manifest: string;
   };
+  // Written by scripts/embeddings/tune_index.py
+  hnsw_tuning?: {
+    recommended: { m: number; ef_construction: number; ef: number; recall: number };
+  };
+  // Written by scripts/embeddings/build_segments.py; segment file names are immutable,
+  // so a client fetches only names it has not seen and drops segments no longer listed
+  segments?: EmbeddingSegment[];
+  segments_size_bytes?: number;
+  segments_tombstone_ratio?: number;
+}
+
+export interface EmbeddingSegment {
+  name: string;
+  level: number;
+  index_type: 'hnsw' | 'exact';
+  count: number;
+  live: number;
+  min_created_at: number;
+  max_created_at: number;
+  files: { index: string; mapping: string; metadata: string; deletes?: string };
+  bytes: number;
+}
+
+// Synced segments: the list goes in the metadata table, each file in the embeddings table
+export const SEGMENTS_KEY = 'index_segments';
+export const SEGMENT_KEY_PREFIX = 'segment:';
+
+export interface StoredSegments {
+  version: number;
+  dimensions: number;
+  ef?: number;
+  segments: Pick<EmbeddingSegment, 'name' | 'index_type' | 'files'>[];
 }
 
 interface SyncState {
@@ -124,7 +160,12 @@ async function saveSyncState(state: SyncState): Promise<void> {
  */
 async function downloadIndex(manifest: EmbeddingManifest): Promise<boolean> {
   try {
-    console.log(`Downloading HNSW index (${(manifest.index_size_bytes / 1024 / 1024).toFixed(1)} MB)...`);
+    if (!manifest.latest.index || !manifest.latest.index_mapping) {
+      throw new Error('Manifest lists no index');
+    }
+
+    const megabytes = (manifest.index_size_bytes ?? 0) / 1024 / 1024;
+    console.log(`Downloading HNSW index (${megabytes.toFixed(1)} MB)...`);
 
     // Download index.bin
     const indexResponse = await fetch(`${GCS_BASE_URL}/${manifest.latest.index}`);
@@ -140,7 +181,8 @@ async function downloadIndex(manifest: EmbeddingManifest): Promise<boolean> {
     await db.table('embeddings').put({
       key: 'hnsw_index',
       data: indexBuffer,
-      version: manifest.version
+      version: manifest.version,
+      ef: manifest.hnsw_tuning?.recommended.ef
     });
 
     await db.table('embeddings').put({
@@ -157,6 +199,62 @@ async function downloadIndex(manifest: EmbeddingManifest): Promise<boolean> {
   }
 }
 
+/**
+ * Files a client needs to search a segment (metadata is only used for server-side filters)
+ */
+function segmentFiles(segment: EmbeddingSegment): string[] {
+  const { index, mapping, deletes } = segment.files;
+  return deletes ? [index, mapping, deletes] : [index, mapping];
+}
+
+/**
+ * Download the segment files not yet in IndexedDB and drop those no longer listed
+ */
+async function downloadSegments(manifest: EmbeddingManifest): Promise<boolean> {
+  try {
+    const segments = manifest.segments ?? [];
+    const listed = segments.flatMap(segmentFiles);
+    const storedKeys = (await db
+      .table('embeddings')
+      .where('key')
+      .startsWith(SEGMENT_KEY_PREFIX)
+      .primaryKeys()) as string[];
+    const stored = new Set(storedKeys);
+    const missing = listed.filter((path) => !stored.has(SEGMENT_KEY_PREFIX + path));
+
+    // Segment file names are immutable, so only new segments and grown deletes lists download
+    console.log(`Downloading ${missing.length} of ${listed.length} segment files...`);
+    for (const path of missing) {
+      const response = await fetch(`${GCS_BASE_URL}/${path}`);
+      if (!response.ok) throw new Error(`Failed to download ${path}`);
+      await db.table('embeddings').put({
+        key: SEGMENT_KEY_PREFIX + path,
+        data: await response.arrayBuffer(),
+        version: manifest.version
+      });
+    }
+
+    const list: StoredSegments = {
+      version: manifest.version,
+      dimensions: manifest.dimensions,
+      ef: manifest.hnsw_tuning?.recommended.ef,
+      segments: segments.map(({ name, index_type, files }) => ({ name, index_type, files }))
+    };
+    await db.table('metadata').put({ key: SEGMENTS_KEY, value: list });
+
+    // Merged and rewritten segments, superseded deletes lists and any single index
+    const keep = new Set(listed.map((path) => SEGMENT_KEY_PREFIX + path));
+    const stale = storedKeys.filter((key) => !keep.has(key));
+    await db.table('embeddings').bulkDelete([...stale, 'hnsw_index', 'index_mapping']);
+
+    console.log(`Stored ${segments.length} segments, removed ${stale.length} stale files`);
+    return true;
+  } catch (error) {
+    console.error('Error downloading segments:', error);
+    return false;
+  }
+}
+
 /**
  * Main sync function - checks and downloads new embeddings
  */
@@ -185,8 +283,10 @@ export async function syncEmbeddings(force = false): Promise<{ synced: boolean;
 
   console.log(`Updating embeddings: v${localVersion} -> v${manifest.version}`);
 
-  // Download new index
-  const success = await downloadIndex(manifest);
+  // Download new segments, or the single index for manifests without them
+  const success = manifest.segments?.length
+    ? await downloadSegments(manifest)
+    : await downloadIndex(manifest);
 
   if (success) {
     // Update local state
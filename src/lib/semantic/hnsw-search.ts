@@ -4,23 +4,56 @@
  */
 
 import { db } from '$lib/db';
-import type { EmbeddingManifest } from './embeddings-sync';
+import { SEGMENTS_KEY, SEGMENT_KEY_PREFIX, type StoredSegments } from './embeddings-sync';
 
-// Types for hnswlib-wasm
+// A searchable index: an HNSW segment opened with hnswlib-wasm, or an exact index
 interface HnswIndex {
+  // Labels in the index, deleted ones included; searchKnn takes at most this many
+  readonly count: number;
   searchKnn(query: number[], k: number): { neighbors: number[]; distances: number[] };
-  setEf(ef: number): void;
+  markDelete?(label: number): void;
+}
+
+// Types for hnswlib-wasm
+interface WasmHnswIndex {
+  readIndex(filename: string, maxElements: number): Promise<boolean>;
+  setEfSearch(ef: number): void;
+  getCurrentCount(): number;
+  searchKnn(
+    query: number[],
+    k: number,
+    filter: ((label: number) => boolean) | undefined
+  ): { neighbors: number[]; distances: number[] };
+  markDelete(label: number): void;
 }
 
 interface HnswLib {
-  HierarchicalNSW: new (space: string, dim: number) => HnswIndex;
+  HierarchicalNSW: new (space: string, dim: number, autoSaveFilename: string) => WasmHnswIndex;
+  // Emscripten's in-memory file system, which readIndex reads from
+  FS: {
+    writeFile(path: string, data: Uint8Array): void;
+    unlink(path: string): void;
+  };
+}
+
+// Label -> note ID lookup (a Map for legacy JSON mappings)
+interface LabelLookup {
+  get(label: number): string | undefined;
+  readonly size: number;
+}
+
+// One searchable index: the single index.bin, or one per segment
+interface SearchPart {
+  index: HnswIndex;
+  mapping: LabelLookup;
+  live: number;
 }
 
 // eslint-disable-next-line @typescript-eslint/no-explicit-any
 let hnswLib: HnswLib | any = null;
-let searchIndex: HnswIndex | null = null;
-let labelMapping: Map<number, string> | null = null;
+let searchParts: SearchPart[] | null = null;
 let indexDimensions = 384;
+const DEFAULT_EF = 50;
 
 /**
  * Load hnswlib-wasm dynamically
@@ -40,8 +73,45 @@ async function loadHnswLib(): Promise<HnswLib> {
   }
 }
 
+let openedIndexes = 0;
+
+/**
+ * Open an HNSW index (hnswlib's save_index format) from its stored bytes.
+ * hnswlib-wasm only reads indexes from its file system, so the bytes are
+ * written there, read into memory, then removed.
+ */
+async function openHnswIndex(
+  data: ArrayBuffer,
+  dimensions: number,
+  maxElements: number,
+  ef?: number
+): Promise<HnswIndex> {
+  const lib = await loadHnswLib();
+
+  // No auto-save file: the index is only ever read
+  const index = new lib.HierarchicalNSW('cosine', dimensions, '');
+  const path = `/hnsw-${openedIndexes++}.bin`;
+  lib.FS.writeFile(path, new Uint8Array(data));
+  try {
+    if (!(await index.readIndex(path, Math.max(maxElements, 1)))) {
+      throw new Error('Failed to read HNSW index');
+    }
+  } finally {
+    lib.FS.unlink(path);
+  }
+
+  // Search ef: the tuned value from the manifest when present
+  index.setEfSearch(ef ?? DEFAULT_EF);
+  const count = index.getCurrentCount();
+  return {
+    count,
+    searchKnn: (query, k) => index.searchKnn(query, k, undefined),
+    markDelete: (label) => index.markDelete(label)
+  };
+}
+
 /**
- * Load index from IndexedDB into memory
+ * Load index from IndexedDB into memory: the single index.bin, or else the synced segments
  */
 export async function loadIndex(): Promise<boolean> {
   try {
@@ -50,53 +120,269 @@ export async function loadIndex(): Promise<boolean> {
     const mappingData = await db.table('embeddings').get('index_mapping');
 
     if (!indexData?.data || !mappingData?.data) {
-      console.log('No index data in IndexedDB');
+      return await loadSegments();
+    }
+
+    // Small corpora ship an exact (brute-force) index instead of an HNSW graph
+    const exactIndex = parseExactIndex(new Uint8Array(indexData.data));
+    if (exactIndex) {
+      const mapping = parseMapping(new Uint8Array(mappingData.data));
+      searchParts = [{ index: exactIndex, mapping, live: mapping.size }];
+      console.log(`Exact index loaded with ${mapping.size} vectors`);
+      return true;
+    }
+
+    // Parse mapping (binary index_mapping.bin, or legacy JSON)
+    const mapping = parseMapping(new Uint8Array(mappingData.data));
+    const index = await openHnswIndex(indexData.data, indexDimensions, mapping.size, indexData.ef);
+    searchParts = [{ index, mapping, live: mapping.size }];
+
+    console.log(`Index loaded with ${mapping.size} vectors`);
+    return true;
+  } catch (error) {
+    console.error('Failed to load HNSW index:', error);
+    return false;
+  }
+}
+
+/**
+ * Read one synced segment file from IndexedDB
+ */
+async function segmentFile(path: string): Promise<ArrayBuffer | undefined> {
+  return (await db.table('embeddings').get(SEGMENT_KEY_PREFIX + path))?.data;
+}
+
+/**
+ * Load every synced segment, dropping the labels in its deletes list
+ */
+async function loadSegments(): Promise<boolean> {
+  const stored = (await db.table('metadata').get(SEGMENTS_KEY))?.value as StoredSegments | undefined;
+  if (!stored?.segments?.length) {
+    console.log('No index data in IndexedDB');
+    return false;
+  }
+
+  const parts: SearchPart[] = [];
+  for (const segment of stored.segments) {
+    const indexData = await segmentFile(segment.files.index);
+    const mappingData = await segmentFile(segment.files.mapping);
+    const deletesData = segment.files.deletes ? await segmentFile(segment.files.deletes) : undefined;
+    if (!indexData || !mappingData || (segment.files.deletes && !deletesData)) {
+      console.log(`Segment ${segment.name} missing from IndexedDB`);
       return false;
     }
 
-    // Load HNSW library
-    const lib = await loadHnswLib();
+    const mapping = parseMapping(new Uint8Array(mappingData));
+    const index =
+      parseExactIndex(new Uint8Array(indexData)) ??
+      (await openHnswIndex(indexData, stored.dimensions, mapping.size, stored.ef));
+    const deleted = deletesData ? parseDeletes(new Uint8Array(deletesData)) : new Uint32Array(0);
+    deleted.forEach((label) => index.markDelete?.(label));
+    parts.push({ index, mapping, live: mapping.size - deleted.length });
+  }
+
+  searchParts = parts;
+  const live = parts.reduce((sum, part) => sum + part.live, 0);
+  console.log(`Loaded ${parts.length} segments with ${live} vectors`);
+  return true;
+}
 
-    // Create index and load from binary
-    searchIndex = new lib.HierarchicalNSW('cosine', indexDimensions);
+// A segment's deletes list (see scripts/embeddings/segments.py) is a NumPy .npy
+// file holding one little-endian u32 label per deleted row
+const NPY_MAGIC = 'NUMPY';
 
-    // Load index from ArrayBuffer
-    // Note: hnswlib-wasm expects a specific format
-    // This may need adjustment based on actual library API
-    const indexBlob = new Blob([indexData.data]);
-    const indexUrl = URL.createObjectURL(indexBlob);
+/**
+ * Read the labels in a segment's deletes list
+ */
+export function parseDeletes(data: Uint8Array): Uint32Array {
+  const magic = new TextDecoder().decode(data.subarray(1, 6));
+  if (data.byteLength < 10 || data[0] !== 0x93 || magic !== NPY_MAGIC) {
+    throw new Error('Invalid deletes list');
+  }
 
-    try {
-      // Parse mapping (NPZ format - simplified parsing)
-      const mappingArray = new Uint8Array(mappingData.data);
-      labelMapping = parseNpzMapping(mappingArray);
+  const view = new DataView(data.buffer, data.byteOffset, data.byteLength);
+  const major = data[6];
+  const headerBytes = major === 1 ? view.getUint16(8, true) : view.getUint32(8, true);
+  const start = (major === 1 ? 10 : 12) + headerBytes;
+  const header = new TextDecoder().decode(data.subarray(major === 1 ? 10 : 12, start));
+  if (!header.includes("'<u4'") || start > data.byteLength) {
+    throw new Error('Invalid deletes list');
+  }
 
-      // Set search ef parameter
-      searchIndex.setEf(50);
+  const labels = new Uint32Array((data.byteLength - start) >> 2);
+  for (let i = 0; i < labels.length; i++) labels[i] = view.getUint32(start + i * 4, true);
+  return labels;
+}
 
-      console.log(`Index loaded with ${labelMapping.size} vectors`);
-      return true;
-    } finally {
-      // Fix memory leak: always revoke Blob URL
-      URL.revokeObjectURL(indexUrl);
+// index.bin in exact mode (see scripts/embeddings/exact_search.py): 32-byte
+// header, one f32 norm per label (0 = free), per-dim min/scale for FLAG_PER_DIM,
+// then int8 or float16 rows
+const EXACT_MAGIC = 0x5845424e; // "NBEX" read as little-endian u32
+const EXACT_VERSION = 1;
+const EXACT_FLAG_FLOAT16 = 1;
+const EXACT_FLAG_PER_DIM = 2;
+const EXACT_FLAG_PER_VECTOR = 4;
+const EXACT_HEADER_BYTES = 32;
+
+function halfToFloat(bits: number): number {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x3ff;
+  if (exponent === 0) return sign * fraction * 2 ** -24;
+  if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+  return sign * (1 + fraction / 1024) * 2 ** (exponent - 15);
+}
+
+/**
+ * Wrap an exact index: cosine top-k over every row, with the HnswIndex interface.
+ * int8 rows are used in place. global and per-dim values map back to floats as
+ * a * q + b; per-vector rows are compared int8 x int8, their scale cancels.
+ */
+export function parseExactIndex(data: Uint8Array): HnswIndex | null {
+  if (data.byteLength < EXACT_HEADER_BYTES) return null;
+
+  const view = new DataView(data.buffer, data.byteOffset, data.byteLength);
+  if (view.getUint32(0, true) !== EXACT_MAGIC || view.getUint16(4, true) !== EXACT_VERSION) {
+    return null;
+  }
+
+  const flags = view.getUint16(6, true);
+  const float16 = (flags & EXACT_FLAG_FLOAT16) !== 0;
+  const perDim = (flags & EXACT_FLAG_PER_DIM) !== 0;
+  const perVector = (flags & EXACT_FLAG_PER_VECTOR) !== 0;
+  const count = view.getUint32(8, true);
+  const dims = view.getUint32(12, true);
+  const paramsOffset = EXACT_HEADER_BYTES + count * 4;
+  const rowsOffset = paramsOffset + (perDim ? dims * 8 : 0);
+  if (rowsOffset + count * dims * (float16 ? 2 : 1) > data.byteLength) return null;
+
+  const norms = new Float32Array(count);
+  for (let i = 0; i < count; i++) norms[i] = view.getFloat32(EXACT_HEADER_BYTES + i * 4, true);
+
+  // Stored value -> float: a[j] * q + b[j]
+  const a = new Float32Array(dims).fill(1);
+  const b = new Float32Array(dims);
+  if (!float16 && !perVector) {
+    for (let j = 0; j < dims; j++) {
+      const min = perDim ? view.getFloat32(paramsOffset + j * 4, true) : view.getFloat32(16, true);
+      const scale = perDim ? view.getFloat32(paramsOffset + (dims + j) * 4, true) : view.getFloat32(20, true);
+      a[j] = 1 / scale;
+      b[j] = min + 128 / scale;
     }
-  } catch (error) {
-    console.error('Failed to load HNSW index:', error);
-    return false;
   }
+
+  let rows: Int8Array | Float32Array;
+  if (float16) {
+    rows = new Float32Array(count * dims);
+    for (let i = 0; i < rows.length; i++) rows[i] = halfToFloat(view.getUint16(rowsOffset + i * 2, true));
+  } else {
+    rows = new Int8Array(data.buffer, data.byteOffset + rowsOffset, count * dims);
+  }
+
+  return {
+    count,
+    markDelete(label: number): void {
+      // A zero norm marks a free label, which searchKnn skips
+      if (label < count) norms[label] = 0;
+    },
+    searchKnn(query: number[], k: number) {
+      // Fold a into the query and b into one offset; per-vector queries are quantized like the rows
+      let peak = 0;
+      for (let j = 0; j < dims; j++) peak = Math.max(peak, Math.abs(query[j]));
+      const scaled = perVector ? new Int8Array(dims) : new Float32Array(dims);
+      let offset = 0;
+      let queryNorm = 0;
+      for (let j = 0; j < dims; j++) {
+        scaled[j] = perVector ? Math.round((query[j] * 127) / (peak || 1)) : query[j] * a[j];
+        offset += query[j] * b[j];
+        queryNorm += perVector ? scaled[j] * scaled[j] : query[j] * query[j];
+      }
+      queryNorm = Math.sqrt(queryNorm) || 1;
+
+      // Best k so far, kept sorted by descending similarity
+      const labels: number[] = [];
+      const scores: number[] = [];
+      for (let label = 0; label < count; label++) {
+        if (norms[label] === 0) continue;
+        let dot = 0;
+        const start = label * dims;
+        if (perVector) {
+          // int8 x int8 with an int32 accumulator
+          for (let j = 0; j < dims; j++) dot = (dot + rows[start + j] * scaled[j]) | 0;
+        } else {
+          for (let j = 0; j < dims; j++) dot += rows[start + j] * scaled[j];
+        }
+        const score = (dot + offset) / (norms[label] * queryNorm);
+        if (scores.length === k && score <= scores[k - 1]) continue;
+
+        let at = scores.length;
+        while (at > 0 && scores[at - 1] < score) at--;
+        scores.splice(at, 0, score);
+        labels.splice(at, 0, label);
+        if (scores.length > k) {
+          scores.pop();
+          labels.pop();
+        }
+      }
+      return { neighbors: labels, distances: scores.map((score) => 1 - score) };
+    }
+  };
 }
 
+// index_mapping.bin layout (see scripts/embeddings/label_mapping.py):
+// 32-byte header, then one raw 32-byte event ID per label
+const MAPPING_MAGIC = 0x4d4c424e; // "NBLM" read as little-endian u32
+const MAPPING_VERSION = 1;
+const MAPPING_HEADER_BYTES = 32;
+const EVENT_ID_BYTES = 32;
+const HEX_BYTES = Array.from({ length: 256 }, (_, i) => i.toString(16).padStart(2, '0'));
+
 /**
- * Parse NPZ mapping file (simplified)
- * In production, use a proper NPZ parser
+ * Wrap a binary label mapping without copying it.
+ * Labels resolve on demand by reading 32 bytes at a fixed offset.
  */
-function parseNpzMapping(data: Uint8Array): Map<number, string> {
+function parseBinaryMapping(data: Uint8Array): LabelLookup | null {
+  if (data.byteLength < MAPPING_HEADER_BYTES) return null;
+
+  const view = new DataView(data.buffer, data.byteOffset, data.byteLength);
+  if (view.getUint32(0, true) !== MAPPING_MAGIC || view.getUint16(4, true) !== MAPPING_VERSION) {
+    return null;
+  }
+
+  const count = view.getUint32(8, true);
+  const live = view.getUint32(12, true);
+  const idsOffset = Number(view.getBigUint64(16, true));
+  if (idsOffset + count * EVENT_ID_BYTES > data.byteLength) return null;
+
+  return {
+    size: live,
+    get(label: number): string | undefined {
+      if (!Number.isInteger(label) || label < 0 || label >= count) return undefined;
+
+      const start = idsOffset + label * EVENT_ID_BYTES;
+      let hex = '';
+      let used = false;
+      for (let i = start; i < start + EVENT_ID_BYTES; i++) {
+        used = used || data[i] !== 0;
+        hex += HEX_BYTES[data[i]];
+      }
+      // All-zero rows are labels freed by deleted notes
+      return used ? hex : undefined;
+    }
+  };
+}
+
+/**
+ * Parse mapping file: binary index_mapping.bin, falling back to legacy JSON
+ */
+function parseMapping(data: Uint8Array): LabelLookup {
+  const binary = parseBinaryMapping(data);
+  if (binary) return binary;
+
   const mapping = new Map<number, string>();
 
   try {
-    // NPZ files are ZIP archives
-    // For simplicity, we'll store mapping as JSON instead
-    // This should be updated when the Python scripts output JSON mapping
+    // Legacy index_mapping.json: { labels: [...], ids: [...] }
     const text = new TextDecoder().decode(data);
     const parsed = JSON.parse(text);
 
@@ -201,7 +487,7 @@ export async function searchSimilar(
   minScore: number = 0.5
 ): Promise<SearchResult[]> {
   // Ensure index is loaded
-  if (!searchIndex || !labelMapping) {
+  if (!searchParts) {
     const loaded = await loadIndex();
     if (!loaded) {
       throw new Error('HNSW index not available');
@@ -211,50 +497,54 @@ export async function searchSimilar(
   // Generate query embedding
   const queryVector = await embedQuery(query);
 
-  // Search HNSW index
-  const { neighbors, distances } = searchIndex!.searchKnn(queryVector, k);
-
-  // Convert to results with note IDs
+  // Search each part (one per segment) for its own top-k, then keep the best k overall
   const results: SearchResult[] = [];
 
-  for (let i = 0; i < neighbors.length; i++) {
-    const label = neighbors[i];
-    const distance = distances[i];
-
-    // Convert cosine distance to similarity score
-    const score = 1 - distance;
-
-    if (score >= minScore) {
-      const noteId = labelMapping!.get(label) || String(label);
-      results.push({
-        noteId,
-        score,
-        distance
-      });
+  for (const part of searchParts!) {
+    // hnswlib rejects k above the number of labels in the index
+    const limit = Math.min(k, part.index.count);
+    if (limit === 0) continue;
+    const { neighbors, distances } = part.index.searchKnn(queryVector, limit);
+
+    for (let i = 0; i < neighbors.length; i++) {
+      const label = neighbors[i];
+      const distance = distances[i];
+
+      // Convert cosine distance to similarity score
+      const score = 1 - distance;
+
+      if (score >= minScore) {
+        const noteId = part.mapping.get(label) || String(label);
+        results.push({
+          noteId,
+          score,
+          distance
+        });
+      }
     }
   }
 
   // Sort by score descending
   results.sort((a, b) => b.score - a.score);
 
-  return results;
+  return results.slice(0, k);
 }
 
 /**
  * Check if semantic search is available
  */
 export function isSearchAvailable(): boolean {
-  return searchIndex !== null && labelMapping !== null;
+  return searchParts !== null;
 }
 
 /**
  * Get search statistics
  */
 export function getSearchStats(): { vectorCount: number; dimensions: number } | null {
-  if (!labelMapping) return null;
+  if (!searchParts) return null;
 
   return {
-    vectorCount: labelMapping.size,
+    vectorCount: searchParts.reduce((sum, part) => sum + part.live, 0),
     dimensions: indexDimensions
   };
 }
@@ -263,15 +553,13 @@ export function getSearchStats(): { vectorCount: number; dimensions: number } |
  * Unload index to free memory
  */
 export function unloadIndex(): void {
-  searchIndex = null;
-  labelMapping = null;
+  searchParts = null;
 }
 
 /**
  * Reset all module state (for testing)
  */
 export function resetHnswState(): void {
-  searchIndex = null;
-  labelMapping = null;
+  searchParts = null;
   hnswLib = null;
 }
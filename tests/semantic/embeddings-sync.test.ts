@@ -5,7 +5,9 @@ import {
   getLocalSyncState,
   syncEmbeddings,
   initEmbeddingSync,
-  type EmbeddingManifest
+  SEGMENTS_KEY,
+  type EmbeddingManifest,
+  type EmbeddingSegment
 } from '$lib/semantic/embeddings-sync';
 import { db } from '$lib/db';
 
@@ -511,6 +513,152 @@ describe('Embeddings Sync Service', () => {
     });
   });
 
+  describe('syncEmbeddings with segments', () => {
+    const segment = (name: string, deletes?: string): EmbeddingSegment => ({
+      name,
+      level: 0,
+      index_type: 'exact',
+      count: 10,
+      live: deletes ? 9 : 10,
+      min_created_at: 0,
+      max_created_at: 0,
+      files: {
+        index: `segments/${name}.bin`,
+        mapping: `segments/${name}_mapping.bin`,
+        metadata: `segments/${name}_metadata.npz`,
+        ...(deletes ? { deletes: `segments/${deletes}` } : {})
+      },
+      bytes: 1000
+    });
+
+    const mockManifest: EmbeddingManifest = {
+      version: 3,
+      updated_at: '2025-12-14T00:00:00Z',
+      total_vectors: 19,
+      dimensions: 384,
+      model: 'all-minilm-l6-v2',
+      quantize_type: 'int8',
+      embeddings_size_bytes: 2048000,
+      latest: {
+        embeddings: 'latest/embeddings.npz',
+        manifest: 'latest/manifest.json'
+      },
+      segments: [segment('L1-a', 'L1-a_deletes_1.npy'), segment('L0-b')]
+    };
+
+    function mockDb(storedKeys: string[]) {
+      const mockPut = vi.fn().mockResolvedValue(undefined);
+      const mockBulkDelete = vi.fn().mockResolvedValue(undefined);
+      const mockStartsWith = vi.fn().mockReturnValue({
+        primaryKeys: vi.fn().mockResolvedValue(storedKeys)
+      });
+      const mockTable = vi.fn().mockReturnValue({
+        get: vi.fn().mockResolvedValue({ value: { version: 2 } }),
+        put: mockPut,
+        where: vi.fn().mockReturnValue({ startsWith: mockStartsWith }),
+        bulkDelete: mockBulkDelete
+      });
+      (db.table as any) = mockTable;
+      return { mockPut, mockBulkDelete, mockStartsWith };
+    }
+
+    beforeEach(() => {
+      Object.defineProperty(global.navigator, 'connection', {
+        value: { type: 'wifi' },
+        writable: true,
+        configurable: true
+      });
+    });
+
+    it('downloads only segment files not yet stored', async () => {
+      const { mockPut, mockStartsWith } = mockDb([
+        'segment:segments/L1-a.bin',
+        'segment:segments/L1-a_mapping.bin'
+      ]);
+
+      (global.fetch as any)
+        .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+        .mockResolvedValue({ ok: true, arrayBuffer: async () => new ArrayBuffer(10) });
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const result = await syncEmbeddings();
+
+      expect(result).toEqual({ synced: true, version: 3 });
+      expect(mockStartsWith).toHaveBeenCalledWith('segment:');
+
+      // The deletes list and segment L0-b; metadata files are never fetched
+      const fetched = (global.fetch as any).mock.calls.slice(1).map((call: string[]) => call[0]);
+      expect(fetched).toEqual([
+        expect.stringContaining('/segments/L1-a_deletes_1.npy'),
+        expect.stringContaining('/segments/L0-b.bin'),
+        expect.stringContaining('/segments/L0-b_mapping.bin')
+      ]);
+      expect(mockPut).toHaveBeenCalledWith({
+        key: 'segment:segments/L0-b.bin',
+        data: expect.any(ArrayBuffer),
+        version: 3
+      });
+      expect(mockPut).toHaveBeenCalledWith({
+        key: SEGMENTS_KEY,
+        value: expect.objectContaining({
+          version: 3,
+          dimensions: 384,
+          segments: [
+            expect.objectContaining({ name: 'L1-a', files: mockManifest.segments![0].files }),
+            expect.objectContaining({ name: 'L0-b' })
+          ]
+        })
+      });
+
+      consoleLogSpy.mockRestore();
+    });
+
+    it('removes segment files no longer listed and the single index', async () => {
+      const { mockBulkDelete } = mockDb([
+        'segment:segments/L1-a.bin',
+        'segment:segments/L1-a_mapping.bin',
+        'segment:segments/L1-a_deletes_0.npy',
+        'segment:segments/L0-merged.bin'
+      ]);
+
+      (global.fetch as any)
+        .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+        .mockResolvedValue({ ok: true, arrayBuffer: async () => new ArrayBuffer(10) });
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      await syncEmbeddings();
+
+      expect(mockBulkDelete).toHaveBeenCalledWith([
+        'segment:segments/L1-a_deletes_0.npy',
+        'segment:segments/L0-merged.bin',
+        'hnsw_index',
+        'index_mapping'
+      ]);
+
+      consoleLogSpy.mockRestore();
+    });
+
+    it('keeps the previous segments when a download fails', async () => {
+      const { mockPut, mockBulkDelete } = mockDb([]);
+
+      (global.fetch as any)
+        .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+        .mockResolvedValueOnce({ ok: false, status: 500 });
+
+      const consoleErrorSpy = vi.spyOn(console, 'error').mockImplementation(() => {});
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const result = await syncEmbeddings();
+
+      expect(result).toEqual({ synced: false, version: 2 });
+      expect(mockPut).not.toHaveBeenCalledWith(expect.objectContaining({ key: SEGMENTS_KEY }));
+      expect(mockBulkDelete).not.toHaveBeenCalled();
+      expect(consoleErrorSpy).toHaveBeenCalledWith('Error downloading segments:', expect.any(Error));
+
+      consoleErrorSpy.mockRestore();
+      consoleLogSpy.mockRestore();
+    });
+  });
+
   describe('initEmbeddingSync', () => {
     it('schedules background sync', async () => {
       vi.useFakeTimers();
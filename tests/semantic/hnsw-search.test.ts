@@ -5,7 +5,8 @@ import {
   isSearchAvailable,
   getSearchStats,
   unloadIndex,
-  resetHnswState
+  resetHnswState,
+  parseDeletes
 } from '$lib/semantic/hnsw-search';
 import { db } from '$lib/db';
 
@@ -19,39 +20,134 @@ vi.mock('$lib/db', () => ({
 }));
 
 // Use vi.hoisted to ensure mocks are available when vi.mock runs
-const { mockSearchKnn, mockSetEf, mockAddPoint, mockHnswIndex, mockHierarchicalNSW, mockLoadHnswlib } = vi.hoisted(() => {
+const {
+  mockSearchKnn,
+  mockSetEfSearch,
+  mockReadIndex,
+  mockGetCurrentCount,
+  mockWriteFile,
+  mockUnlink,
+  mockHnswIndex,
+  mockHierarchicalNSW,
+  mockLoadHnswlib
+} = vi.hoisted(() => {
   const mockSearchKnn = vi.fn();
-  const mockSetEf = vi.fn();
-  const mockAddPoint = vi.fn();
+  const mockSetEfSearch = vi.fn();
+  const mockReadIndex = vi.fn().mockResolvedValue(true);
+  const mockGetCurrentCount = vi.fn().mockReturnValue(100);
+  const mockWriteFile = vi.fn();
+  const mockUnlink = vi.fn();
   const mockHnswIndex = {
     searchKnn: mockSearchKnn,
-    setEf: mockSetEf,
-    addPoint: mockAddPoint
+    setEfSearch: mockSetEfSearch,
+    readIndex: mockReadIndex,
+    getCurrentCount: mockGetCurrentCount,
+    markDelete: vi.fn()
   };
 
   const mockHierarchicalNSW = vi.fn().mockReturnValue(mockHnswIndex);
   const mockLoadHnswlib = vi.fn().mockResolvedValue({
-    HierarchicalNSW: mockHierarchicalNSW
+    HierarchicalNSW: mockHierarchicalNSW,
+    FS: { writeFile: mockWriteFile, unlink: mockUnlink }
   });
 
-  return { mockSearchKnn, mockSetEf, mockAddPoint, mockHnswIndex, mockHierarchicalNSW, mockLoadHnswlib };
+  return {
+    mockSearchKnn,
+    mockSetEfSearch,
+    mockReadIndex,
+    mockGetCurrentCount,
+    mockWriteFile,
+    mockUnlink,
+    mockHnswIndex,
+    mockHierarchicalNSW,
+    mockLoadHnswlib
+  };
 });
 
 vi.mock('hnswlib-wasm', () => ({
   loadHnswlib: () => mockLoadHnswlib()
 }));
 
+// Build an index_mapping.bin buffer; null entries are free labels
+function binaryMapping(ids: (string | null)[]): ArrayBuffer {
+  const buffer = new ArrayBuffer(32 + ids.length * 32);
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  bytes.set(new TextEncoder().encode('NBLM'), 0);
+  view.setUint16(4, 1, true);
+  view.setUint32(8, ids.length, true);
+  view.setUint32(12, ids.filter((id) => id !== null).length, true);
+  view.setBigUint64(16, 32n, true);
+  ids.forEach((id, label) => {
+    if (id === null) return;
+    for (let i = 0; i < 32; i++) {
+      bytes[32 + label * 32 + i] = parseInt(id.slice(i * 2, i * 2 + 2), 16);
+    }
+  });
+  return buffer;
+}
+
+// Build an exact-mode index.bin with int8 rows; null rows are free labels
+function exactIndex(rows: (number[] | null)[], vmin: number, scale: number): ArrayBuffer {
+  const dims = rows.find((row) => row !== null)!.length;
+  const buffer = new ArrayBuffer(32 + rows.length * 4 + rows.length * dims);
+  const view = new DataView(buffer);
+  new Uint8Array(buffer).set(new TextEncoder().encode('NBEX'), 0);
+  view.setUint16(4, 1, true);
+  view.setUint32(8, rows.length, true);
+  view.setUint32(12, dims, true);
+  view.setFloat32(16, vmin, true);
+  view.setFloat32(20, scale, true);
+  rows.forEach((row, label) => {
+    if (row === null) return;
+    const values = row.map((q) => (q + 128) / scale + vmin);
+    view.setFloat32(32 + label * 4, Math.sqrt(values.reduce((sum, v) => sum + v * v, 0)), true);
+    row.forEach((q, j) => view.setInt8(32 + rows.length * 4 + label * dims + j, q));
+  });
+  return buffer;
+}
+
+// Build a segment deletes list: a NumPy .npy file of little-endian u32 labels
+function deletesList(labels: number[]): ArrayBuffer {
+  let header = `{'descr': '<u4', 'fortran_order': False, 'shape': (${labels.length},), }`;
+  header = header.padEnd(Math.ceil((10 + header.length + 1) / 64) * 64 - 11) + '\n';
+  const buffer = new ArrayBuffer(10 + header.length + labels.length * 4);
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  bytes[0] = 0x93;
+  bytes.set(new TextEncoder().encode('NUMPY'), 1);
+  bytes[6] = 1;
+  view.setUint16(8, header.length, true);
+  bytes.set(new TextEncoder().encode(header), 10);
+  labels.forEach((label, i) => view.setUint32(10 + header.length + i * 4, label, true));
+  return buffer;
+}
+
+// IndexedDB with the given segment list and files, keyed like embeddings-sync.ts stores them
+function storedSegments(files: Record<string, ArrayBuffer>, segments: object[]) {
+  const mockGet = vi.fn(async (key: string) => {
+    if (key === 'index_segments') return { value: { version: 3, dimensions: 384, segments } };
+    const data = files[key.replace(/^segment:/, '')];
+    return key.startsWith('segment:') && data ? { data, version: 3 } : undefined;
+  });
+  (db.table as any) = vi.fn().mockReturnValue({ get: mockGet });
+}
+
+const plus = new Array(384).fill(127);
+const minus = new Array(384).fill(-128);
+
 describe('HNSW Search Service', () => {
   beforeEach(() => {
     vi.clearAllMocks();
     // Reset all module state before each test (including hnswLib cache)
     resetHnswState();
-    // Reset URL mock
-    global.URL.createObjectURL = vi.fn().mockReturnValue('blob:mock-url');
     // Re-setup mock implementations after clearAllMocks
     mockHierarchicalNSW.mockReturnValue(mockHnswIndex);
+    mockReadIndex.mockResolvedValue(true);
+    mockGetCurrentCount.mockReturnValue(100);
     mockLoadHnswlib.mockResolvedValue({
-      HierarchicalNSW: mockHierarchicalNSW
+      HierarchicalNSW: mockHierarchicalNSW,
+      FS: { writeFile: mockWriteFile, unlink: mockUnlink }
     });
   });
 
@@ -85,13 +181,41 @@ describe('HNSW Search Service', () => {
       expect(mockGet).toHaveBeenCalledWith('hnsw_index');
       expect(mockGet).toHaveBeenCalledWith('index_mapping');
       expect(mockLoadHnswlib).toHaveBeenCalled();
-      expect(mockHierarchicalNSW).toHaveBeenCalledWith('cosine', 384);
-      expect(mockSetEf).toHaveBeenCalledWith(50);
+      expect(mockHierarchicalNSW).toHaveBeenCalledWith('cosine', 384, '');
+      // The stored bytes go through the wasm file system into readIndex, before ef is set
+      const [path, bytes] = mockWriteFile.mock.calls[0];
+      expect(bytes).toEqual(new Uint8Array(indexBuffer));
+      expect(mockReadIndex).toHaveBeenCalledWith(path, 3);
+      expect(mockUnlink).toHaveBeenCalledWith(path);
+      expect(mockReadIndex.mock.invocationCallOrder[0]).toBeLessThan(
+        mockSetEfSearch.mock.invocationCallOrder[0]
+      );
+      expect(mockSetEfSearch).toHaveBeenCalledWith(50);
       expect(consoleLogSpy).toHaveBeenCalledWith('Index loaded with 3 vectors');
 
       consoleLogSpy.mockRestore();
     });
 
+    it('returns false when hnswlib cannot read the index', async () => {
+      mockReadIndex.mockResolvedValueOnce(false);
+
+      const mockGet = vi
+        .fn()
+        .mockResolvedValueOnce({ data: new ArrayBuffer(100), version: 1 })
+        .mockResolvedValueOnce({ data: binaryMapping(['ab'.repeat(32)]), version: 1 });
+      (db.table as any) = vi.fn().mockReturnValue({ get: mockGet });
+
+      const consoleErrorSpy = vi.spyOn(console, 'error').mockImplementation(() => {});
+      const result = await loadIndex();
+
+      expect(result).toBe(false);
+      expect(isSearchAvailable()).toBe(false);
+      // The file is removed from the wasm file system either way
+      expect(mockUnlink).toHaveBeenCalledWith(mockWriteFile.mock.calls[0][0]);
+
+      consoleErrorSpy.mockRestore();
+    });
+
     it('returns false when no index data in IndexedDB', async () => {
       const mockGet = vi.fn().mockResolvedValue(undefined);
       const mockTable = vi.fn().mockReturnValue({ get: mockGet });
@@ -173,7 +297,8 @@ describe('HNSW Search Service', () => {
       consoleErrorSpy.mockRestore();
       // Reset for other tests
       mockLoadHnswlib.mockResolvedValue({
-        HierarchicalNSW: mockHierarchicalNSW
+        HierarchicalNSW: mockHierarchicalNSW,
+        FS: { writeFile: mockWriteFile, unlink: mockUnlink }
       });
     });
 
@@ -253,6 +378,29 @@ describe('HNSW Search Service', () => {
       consoleLogSpy.mockRestore();
     });
 
+    it('parses binary index_mapping.bin', async () => {
+      const indexBuffer = new ArrayBuffer(100);
+      const mappingBuffer = binaryMapping(['ab'.repeat(32), null, '0f'.repeat(32)]);
+
+      const mockGet = vi
+        .fn()
+        .mockResolvedValueOnce({ data: indexBuffer, version: 1 })
+        .mockResolvedValueOnce({ data: mappingBuffer, version: 1 });
+
+      const mockTable = vi.fn().mockReturnValue({ get: mockGet });
+      (db.table as any) = mockTable;
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const result = await loadIndex();
+
+      expect(result).toBe(true);
+      // Free labels are not counted
+      expect(consoleLogSpy).toHaveBeenCalledWith('Index loaded with 2 vectors');
+      expect(getSearchStats()?.vectorCount).toBe(2);
+
+      consoleLogSpy.mockRestore();
+    });
+
     it('handles empty mapping arrays', async () => {
       const indexBuffer = new ArrayBuffer(100);
       const mapping = {
@@ -405,6 +553,63 @@ describe('HNSW Search Service', () => {
       consoleLogSpy.mockRestore();
     });
 
+    it('resolves note IDs from a binary mapping', async () => {
+      unloadIndex();
+
+      const indexBuffer = new ArrayBuffer(100);
+      const mappingBuffer = binaryMapping(['ab'.repeat(32), null, '0f'.repeat(32)]);
+
+      const mockGet = vi
+        .fn()
+        .mockResolvedValueOnce({ data: indexBuffer, version: 1 })
+        .mockResolvedValueOnce({ data: mappingBuffer, version: 1 });
+
+      const mockTable = vi.fn().mockReturnValue({ get: mockGet });
+      (db.table as any) = mockTable;
+
+      mockSearchKnn.mockReturnValue({
+        neighbors: [2, 1, 0],
+        distances: [0.1, 0.2, 0.3]
+      });
+
+      const consoleWarnSpy = vi.spyOn(console, 'warn').mockImplementation(() => {});
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const results = await searchSimilar('test query', 3, 0.5);
+
+      expect(results.map((r) => r.noteId)).toEqual(['0f'.repeat(32), '1', 'ab'.repeat(32)]);
+
+      consoleWarnSpy.mockRestore();
+      consoleLogSpy.mockRestore();
+    });
+
+    it('searches an exact index without loading hnswlib', async () => {
+      unloadIndex();
+
+      // Rows of all +1 and all -1 after dequantization; label 1 is free
+      const indexBuffer = exactIndex([new Array(384).fill(127), null, new Array(384).fill(-128)], -1, 127.5);
+      const mappingBuffer = binaryMapping(['ab'.repeat(32), null, '0f'.repeat(32)]);
+
+      const mockGet = vi
+        .fn()
+        .mockResolvedValueOnce({ data: indexBuffer, version: 1 })
+        .mockResolvedValueOnce({ data: mappingBuffer, version: 1 });
+
+      const mockTable = vi.fn().mockReturnValue({ get: mockGet });
+      (db.table as any) = mockTable;
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const consoleErrorSpy = vi.spyOn(console, 'error').mockImplementation(() => {});
+      const results = await searchSimilar('test query', 3, -1);
+
+      expect(mockLoadHnswlib).not.toHaveBeenCalled();
+      expect(results.map((r) => r.noteId)).toEqual(['ab'.repeat(32), '0f'.repeat(32)]);
+      expect(results[0].score).toBeGreaterThan(0);
+      expect(results[1].score).toBeLessThan(0);
+
+      consoleLogSpy.mockRestore();
+      consoleErrorSpy.mockRestore();
+    });
+
     it('throws error when index cannot be loaded', async () => {
       unloadIndex();
 
@@ -428,13 +633,40 @@ describe('HNSW Search Service', () => {
 
       expect(mockSearchKnn).toHaveBeenCalledWith(
         expect.any(Array),
-        10 // Default k
+        10, // Default k
+        undefined
       );
       expect(results).toHaveLength(2);
 
       consoleWarnSpy.mockRestore();
     });
 
+    it('asks an index for no more neighbours than it holds', async () => {
+      unloadIndex();
+      mockGetCurrentCount.mockReturnValue(2);
+
+      const mockGet = vi
+        .fn()
+        .mockResolvedValueOnce({ data: new ArrayBuffer(100), version: 1 })
+        .mockResolvedValueOnce({ data: binaryMapping(['ab'.repeat(32), '0f'.repeat(32)]), version: 1 });
+      (db.table as any) = vi.fn().mockReturnValue({ get: mockGet });
+
+      mockSearchKnn.mockReturnValue({
+        neighbors: [1, 0],
+        distances: [0.1, 0.2]
+      });
+
+      const consoleWarnSpy = vi.spyOn(console, 'warn').mockImplementation(() => {});
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const results = await searchSimilar('test query', 10, 0.5);
+
+      expect(mockSearchKnn).toHaveBeenCalledWith(expect.any(Array), 2, undefined);
+      expect(results.map((r) => r.noteId)).toEqual(['0f'.repeat(32), 'ab'.repeat(32)]);
+
+      consoleWarnSpy.mockRestore();
+      consoleLogSpy.mockRestore();
+    });
+
     it('returns results with correct structure', async () => {
       mockSearchKnn.mockReturnValue({
         neighbors: [0],
@@ -455,6 +687,76 @@ describe('HNSW Search Service', () => {
     });
   });
 
+  describe('segments', () => {
+    const segmentA = {
+      name: 'L1-a',
+      index_type: 'exact',
+      files: { index: 'segments/a.bin', mapping: 'segments/a_mapping.bin', deletes: 'segments/a_deletes_1.npy' }
+    };
+    const segmentB = {
+      name: 'L0-b',
+      index_type: 'exact',
+      files: { index: 'segments/b.bin', mapping: 'segments/b_mapping.bin' }
+    };
+    const files = {
+      'segments/a.bin': exactIndex([plus, minus], -1, 127.5),
+      'segments/a_mapping.bin': binaryMapping(['aa'.repeat(32), 'bb'.repeat(32)]),
+      'segments/a_deletes_1.npy': deletesList([0]),
+      'segments/b.bin': exactIndex([plus], -1, 127.5),
+      'segments/b_mapping.bin': binaryMapping(['cc'.repeat(32)])
+    };
+
+    it('reads a deletes list', () => {
+      expect(Array.from(parseDeletes(new Uint8Array(deletesList([3, 70000]))))).toEqual([3, 70000]);
+      expect(() => parseDeletes(new Uint8Array(binaryMapping([null])))).toThrow('Invalid deletes list');
+    });
+
+    it('loads every segment when there is no single index', async () => {
+      storedSegments(files, [segmentA, segmentB]);
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const result = await loadIndex();
+
+      expect(result).toBe(true);
+      expect(mockLoadHnswlib).not.toHaveBeenCalled();
+      // Label 0 of segment A is in its deletes list
+      expect(consoleLogSpy).toHaveBeenCalledWith('Loaded 2 segments with 2 vectors');
+      expect(getSearchStats()?.vectorCount).toBe(2);
+
+      consoleLogSpy.mockRestore();
+    });
+
+    it('merges results across segments and skips deleted labels', async () => {
+      storedSegments(files, [segmentA, segmentB]);
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const consoleErrorSpy = vi.spyOn(console, 'error').mockImplementation(() => {});
+      const results = await searchSimilar('test query', 3, -1);
+
+      expect(results.map((r) => r.noteId)).toEqual(['cc'.repeat(32), 'bb'.repeat(32)]);
+      expect(results[0].score).toBeGreaterThan(results[1].score);
+
+      consoleLogSpy.mockRestore();
+      consoleErrorSpy.mockRestore();
+    });
+
+    it('returns false when a listed segment file is missing', async () => {
+      storedSegments({ ...files, 'segments/a_deletes_1.npy': undefined as unknown as ArrayBuffer }, [
+        segmentA,
+        segmentB
+      ]);
+
+      const consoleLogSpy = vi.spyOn(console, 'log').mockImplementation(() => {});
+      const result = await loadIndex();
+
+      expect(result).toBe(false);
+      expect(consoleLogSpy).toHaveBeenCalledWith('Segment L1-a missing from IndexedDB');
+      expect(isSearchAvailable()).toBe(false);
+
+      consoleLogSpy.mockRestore();
+    });
+  });
+
   describe('isSearchAvailable', () => {
     it('returns false when index is not loaded', () => {
       unloadIndex();
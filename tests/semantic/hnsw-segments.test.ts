@@ -0,0 +1,108 @@
+// @vitest-environment node
+import { describe, it, expect, vi, beforeEach, afterEach } from 'vitest';
+import { readFileSync } from 'fs';
+import path from 'path';
+import { loadIndex, searchSimilar, resetHnswState } from '$lib/semantic/hnsw-search';
+import { db } from '$lib/db';
+
+// Unlike hnsw-search.test.ts, hnswlib-wasm is not mocked here: these tests read
+// a segment the pipeline wrote with Python hnswlib (scripts/embeddings/segments.py,
+// 16 rows of 8 dimensions, label i mapped to event ID byte i repeated)
+vi.mock('$lib/db', () => ({
+  db: {
+    table: vi.fn(() => ({
+      get: vi.fn()
+    }))
+  }
+}));
+
+const FIXTURES = path.resolve(__dirname, 'fixtures');
+
+function fixture(name: string): ArrayBuffer {
+  const bytes = readFileSync(path.join(FIXTURES, name));
+  return bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.byteLength) as ArrayBuffer;
+}
+
+// Build a segment deletes list: a NumPy .npy file of little-endian u32 labels
+function deletesList(labels: number[]): ArrayBuffer {
+  let header = `{'descr': '<u4', 'fortran_order': False, 'shape': (${labels.length},), }`;
+  header = header.padEnd(Math.ceil((10 + header.length + 1) / 64) * 64 - 11) + '\n';
+  const buffer = new ArrayBuffer(10 + header.length + labels.length * 4);
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  bytes[0] = 0x93;
+  bytes.set(new TextEncoder().encode('NUMPY'), 1);
+  bytes[6] = 1;
+  view.setUint16(8, header.length, true);
+  bytes.set(new TextEncoder().encode(header), 10);
+  labels.forEach((label, i) => view.setUint32(10 + header.length + i * 4, label, true));
+  return buffer;
+}
+
+// IndexedDB holding the fixture as the only synced segment
+function storedSegment(deletes?: number[]) {
+  const files: Record<string, ArrayBuffer> = {
+    'segments/hnsw.bin': fixture('hnsw-segment.bin'),
+    'segments/hnsw_mapping.bin': fixture('hnsw-segment_mapping.bin')
+  };
+  const segment = {
+    name: 'L0-hnsw',
+    index_type: 'hnsw',
+    files: { index: 'segments/hnsw.bin', mapping: 'segments/hnsw_mapping.bin' } as Record<string, string>
+  };
+  if (deletes) {
+    files['segments/hnsw_deletes_1.npy'] = deletesList(deletes);
+    segment.files.deletes = 'segments/hnsw_deletes_1.npy';
+  }
+
+  const mockGet = vi.fn(async (key: string) => {
+    if (key === 'index_segments') return { value: { version: 1, dimensions: 8, segments: [segment] } };
+    const data = files[key.replace(/^segment:/, '')];
+    return key.startsWith('segment:') && data ? { data, version: 1 } : undefined;
+  });
+  (db.table as any) = vi.fn().mockReturnValue({ get: mockGet });
+}
+
+// The stored vector of label 5, returned by the embedding API as the query embedding
+const LABEL_5 = [-1.26, 1.51, 1.35, 0.78, 0.26, -0.31, 1.46, 1.96];
+const noteId = (label: number) => label.toString(16).padStart(2, '0').repeat(32);
+
+describe('HNSW segments with hnswlib-wasm', () => {
+  beforeEach(() => {
+    resetHnswState();
+    vi.spyOn(console, 'log').mockImplementation(() => {});
+    vi.stubGlobal(
+      'fetch',
+      vi.fn().mockResolvedValue({
+        ok: true,
+        json: async () => ({ embeddings: [LABEL_5], dimensions: 8 })
+      })
+    );
+  });
+
+  afterEach(() => {
+    vi.unstubAllGlobals();
+    vi.restoreAllMocks();
+  });
+
+  it('loads a segment written by the pipeline and finds its nearest notes', async () => {
+    storedSegment();
+
+    expect(await loadIndex()).toBe(true);
+    // k above the 16 rows in the segment is clamped
+    const results = await searchSimilar('query', 50, -1);
+
+    expect(results).toHaveLength(16);
+    expect(results[0].noteId).toBe(noteId(5));
+    expect(results[0].score).toBeCloseTo(1, 5);
+    expect(results.slice(1, 3).map((r) => r.noteId)).toEqual([noteId(4), noteId(11)]);
+  });
+
+  it('skips labels in the segment deletes list', async () => {
+    storedSegment([5]);
+
+    const results = await searchSimilar('query', 3, -1);
+
+    expect(results.map((r) => r.noteId)).toEqual([noteId(4), noteId(11), noteId(0)]);
+  });
+});